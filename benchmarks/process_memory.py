@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Measure the memory footprint of processes that are parked in the WAITING state.
+
+Usage: python benchmarks/process_memory.py [num_processes] [budget_bytes]
+
+Exits with a non-zero status if the average footprint per process exceeds the budget.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+import gc
+import sys
+import tracemalloc
+
+import plumpy
+
+# The number of bytes a parked process is allowed to take up
+DEFAULT_BUDGET = 2048
+
+
+class ParkedProcess(plumpy.Process):
+    """A process that waits until it is told to carry on"""
+
+    def run(self):
+        return plumpy.Wait(self.finish)
+
+    def finish(self):
+        pass
+
+
+def measure(num_processes):
+    """
+    Create processes, drive them into the WAITING state and return the average number of bytes
+    allocated per process
+    """
+    loop = plumpy.new_event_loop()
+    processes = []
+
+    # Warm up any caches so that they don't count towards the first process
+    warm_up = ParkedProcess(loop=loop)
+    loop.run_sync(warm_up.step)
+    loop.run_sync(warm_up.step)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    for _ in range(num_processes):
+        process = ParkedProcess(loop=loop)
+        processes.append(process)
+        # CREATED -> RUNNING -> WAITING
+        loop.run_sync(process.step)
+        loop.run_sync(process.step)
+
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    assert all(process.state == plumpy.ProcessState.WAITING for process in processes)
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return allocated / float(num_processes)
+
+
+def main(argv):
+    num_processes = int(argv[1]) if len(argv) > 1 else 10000
+    budget = int(argv[2]) if len(argv) > 2 else DEFAULT_BUDGET
+
+    per_process = measure(num_processes)
+    print('{} parked processes: {:.0f} bytes per process (budget {})'.format(num_processes, per_process, budget))
+    return 0 if per_process <= budget else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Measure the time it takes to build the specs of a library of process classes.
+
+Usage: python benchmarks/spec_building.py [num_classes] [budget_seconds]
+
+Each of the classes has a number of inputs, some in nested namespaces, and is exposed twice by
+another class.  Exits with a non-zero status if the average time per pair of classes exceeds the budget.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+import sys
+import timeit
+
+import plumpy
+
+# The number of seconds building the specs of a pair of classes, and creating a process, may take
+DEFAULT_BUDGET = 0.002
+
+NUM_PORTS = 30
+
+
+def create_classes(index):
+    """Create a process class and a work chain that exposes its inputs twice"""
+
+    def define_process(cls, spec):
+        super(process_class, cls).define(spec)
+        spec.input_namespace('nested', required=False)
+        spec.input_namespace('nested.namespace', required=False)
+        for port in range(NUM_PORTS):
+            spec.input('nested.namespace.port_{}'.format(port) if port % 3 == 0 else 'port_{}'.format(port),
+                       valid_type=int, default=port, help='input port {}'.format(port))
+        spec.output('result', valid_type=int)
+
+    process_class = type('Process{}'.format(index), (plumpy.Process,), {'define': classmethod(define_process)})
+
+    def define_workchain(cls, spec):
+        super(workchain_class, cls).define(spec)
+        spec.expose_inputs(process_class, namespace='first', namespace_options={'required': False})
+        spec.expose_inputs(
+            process_class, namespace='second', exclude=('port_1',), namespace_options={'required': False})
+        spec.outline(cls.run_process)
+
+    workchain_class = type('WorkChain{}'.format(index), (plumpy.WorkChain,), {
+        'define': classmethod(define_workchain),
+        'run_process': lambda self: None,
+    })
+
+    return process_class, workchain_class
+
+
+def measure(num_classes):
+    """
+    Build the specs of the given number of pairs of classes, create a process of each work chain and
+    return the average number of seconds per pair
+    """
+    classes = [create_classes(index) for index in range(num_classes)]
+
+    def build():
+        for _, workchain_class in classes:
+            workchain_class()
+
+    return timeit.timeit(build, number=1) / num_classes
+
+
+def main(argv):
+    num_classes = int(argv[1]) if len(argv) > 1 else 300
+    budget = float(argv[2]) if len(argv) > 2 else DEFAULT_BUDGET
+
+    per_class = measure(num_classes)
+    print('{} pairs of process classes: {:.2f} ms per pair (budget {:.2f} ms)'.format(
+        num_classes, per_class * 1000, budget * 1000))
+    return 0 if per_class <= budget else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
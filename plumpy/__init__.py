@@ -12,14 +12,21 @@ from .processes import *
 from .process_states import *
 from .process_comms import *
 from .process_listener import *
+from .scheduling import *
+from .hibernation import *
+from .reducers import *
+from .blobs import *
+from .timers import *
 from .mixins import *
 from .utils import *
 from .version import *
 from .workchains import *
+from .worker_pool import *
 
 __all__ = (events.__all__ + exceptions.__all__ + processes.__all__ + utils.__all__ + futures.__all__ + mixins.__all__ +
            persistence.__all__ + communications.__all__ + process_comms.__all__ + version.__all__,
-           process_listener.__all__ + workchains.__all__ + loaders.__all__ + ports.__all__ + process_states.__all__)
+           process_listener.__all__ + workchains.__all__ + loaders.__all__ + ports.__all__ + process_states.__all__ + worker_pool.__all__ +
+           scheduling.__all__ + hibernation.__all__ + reducers.__all__ + blobs.__all__ + timers.__all__)
 
 
 # Do this se we don't get the "No handlers could be found..." warnings that will be produced
@@ -65,11 +65,14 @@ def event(from_states='*', to_states='*'):
             from_states = (from_states,)
         if not all(issubclass(state, State) for state in from_states):
             raise TypeError()
+        # A tuple lets isinstance check all the states in one go
+        from_states = tuple(from_states)
     if to_states != '*':
         if inspect.isclass(to_states):
             to_states = (to_states,)
         if not all(issubclass(state, State) for state in to_states):
             raise TypeError()
+        to_states = tuple(to_states)
 
     def wrapper(wrapped):
         evt_label = wrapped.__name__
@@ -78,16 +81,12 @@ def event(from_states='*', to_states='*'):
         def transition(self, *a, **kw):
             initial = self._state
 
-            if from_states != '*' and \
-                    not any(isinstance(self._state, state)
-                            for state in from_states):
+            if from_states != '*' and not isinstance(initial, from_states):
                 raise EventError(evt_label, "Event {} invalid in state {}".format(evt_label, initial.LABEL))
 
             result = wrapped(self, *a, **kw)
             if not (result is False or isinstance(result, plumpy.Future)):
-                if to_states != '*' and not \
-                        any(isinstance(self._state, state)
-                            for state in to_states):
+                if to_states != '*' and not isinstance(self._state, to_states):
                     if self._state == initial:
                         raise EventError(evt_label, "Machine did not transition")
                     else:
@@ -106,6 +105,8 @@ def event(from_states='*', to_states='*'):
 
 
 class State(object):
+    __slots__ = ('state_machine', 'in_state')
+
     LABEL = None
     # A set containing the labels of states that can be entered
     # from this one
@@ -191,10 +192,21 @@ class StateMachineMeta(type):
 
 class StateMachine(with_metaclass(StateMachineMeta, object)):
     STATES = None
+    # The names of methods that should be called with the state on a particular state event hook,
+    # these are called before any of the callbacks that were added to the instance
+    STATE_EVENT_METHODS = {}
+
     _STATES_MAP = None
+    # These are compiled from the states for each class when it is first used, see `__ensure_built`
+    _STATE_INDEX = None  # The index of each state label
+    _STATE_LOOKUP = None  # The state class by label and by the class itself
+    _TRANSITIONS = None  # Whether a transition is allowed as _TRANSITIONS[from index][to index]
+    _STATE_EVENT_DISPATCH = None  # The functions to call for each hook
 
     _transitioning = False
     _transition_failing = False
+    # Created when the first callback is added, most state machines never have any
+    _event_callbacks = None
 
     @classmethod
     def get_states_map(cls):
@@ -238,6 +250,14 @@ class StateMachine(with_metaclass(StateMachineMeta, object)):
             assert label not in cls._STATES_MAP, "Duplicate label '{}'".format(label)
             cls._STATES_MAP[label] = state_cls
 
+        # Compile the tables used when transitioning
+        cls._STATE_INDEX = {state_cls.LABEL: index for index, state_cls in enumerate(cls.STATES)}
+        cls._STATE_LOOKUP = dict(cls._STATES_MAP)
+        cls._STATE_LOOKUP.update((state_cls, state_cls) for state_cls in cls.STATES)
+        cls._TRANSITIONS = tuple(
+            tuple(to_state.LABEL in from_state.ALLOWED for to_state in cls.STATES) for from_state in cls.STATES)
+        cls._STATE_EVENT_DISPATCH = {hook: getattr(cls, name) for hook, name in cls.STATE_EVENT_METHODS.items()}
+
         cls.sealed = True
 
     def __init__(self):
@@ -247,7 +267,6 @@ class StateMachine(with_metaclass(StateMachineMeta, object)):
         self._exception_handler = None
         self.set_debug((not sys.flags.ignore_environment and bool(os.environ.get('PYTHONSMDEBUG'))))
         self._transitioning = False
-        self._event_callbacks = {}
 
     @super_check
     def init(self):
@@ -274,17 +293,24 @@ class StateMachine(with_metaclass(StateMachineMeta, object)):
         :param hook: The state event hook
         :param callback: The callback function
         """
+        if self._event_callbacks is None:
+            self._event_callbacks = {}
         self._event_callbacks.setdefault(hook, []).append(callback)
 
     def remove_state_event_callback(self, hook, callback):
         try:
             self._event_callbacks[hook].remove(callback)
-        except (KeyError, ValueError):
+        except (KeyError, TypeError, ValueError):
             raise ValueError("Callback not set for hook '{}'".format(hook))
 
     def _fire_state_event(self, hook, state):
-        for callback in self._event_callbacks.get(hook, []):
-            callback(self, hook, state)
+        method = self._STATE_EVENT_DISPATCH.get(hook, None)
+        if method is not None:
+            method(self, state)
+
+        if self._event_callbacks:
+            for callback in self._event_callbacks.get(hook, ()):
+                callback(self, hook, state)
 
     def on_terminated(self):
         """ Called when a terminal state is entered """
@@ -358,7 +384,7 @@ class StateMachine(with_metaclass(StateMachineMeta, object)):
                 raise RuntimeError("Cannot enter state '{}' as the initial state".format(next_state))
             return  # Nothing to exit
 
-        if next_state.LABEL not in self._state.ALLOWED:
+        if not self._is_transition_allowed(self._state, next_state):
             raise RuntimeError("Cannot transition from {} to {}".format(self._state.LABEL, next_state.label))
         self._fire_state_event(StateEventHook.EXITING_STATE, next_state)
         self._state.do_exit()
@@ -371,13 +397,23 @@ class StateMachine(with_metaclass(StateMachineMeta, object)):
         self._state = next_state
         self._fire_state_event(StateEventHook.ENTERED_STATE, last_state)
 
+    def _is_transition_allowed(self, from_state, to_state):
+        try:
+            return self._TRANSITIONS[self._STATE_INDEX[from_state.LABEL]][self._STATE_INDEX[to_state.LABEL]]
+        except KeyError:
+            # One of the states is not one of ours, so fall back to what it says
+            return to_state.LABEL in from_state.ALLOWED
+
     def _create_state_instance(self, state, *args, **kwargs):
         if isinstance(state, State):
             # It's already a state instance
             return state
 
         # OK, have to create it
-        state_cls = self._ensure_state_class(state)
+        try:
+            state_cls = self._STATE_LOOKUP[state]
+        except (KeyError, TypeError):
+            state_cls = self._ensure_state_class(state)
         return state_cls(self, *args, **kwargs)
 
     def _ensure_state_class(self, state):
@@ -1,6 +1,24 @@
-import contextlib
+from .. import settings
 
-__all__ = ['super_check', 'call_with_super_check']
+__all__ = ['super_check', 'call_with_super_check', 'verify_super_calls']
+
+SUPER_CHECK_RUNTIME = 'runtime'
+SUPER_CHECK_CLASS = 'class'
+SUPER_CHECK_OFF = 'off'
+
+if settings.super_check_mode not in (SUPER_CHECK_RUNTIME, SUPER_CHECK_CLASS, SUPER_CHECK_OFF):
+    raise ValueError("Unknown super check mode '{}'".format(settings.super_check_mode))
+
+# The mode is fixed at import time as it decides whether super_check wraps the functions or not
+_MODE = settings.super_check_mode
+# The (class, method name) pairs that have been verified
+_VERIFIED = set()
+# The number of super checked calls in progress, keyed on the id of the object.  These are kept
+# here rather than on the objects themselves so that objects with __slots__ can be checked too
+_CALL_COUNTS = {}
+
+_NOT_CALLED_MSG = "Base '{}' was not called from '{}'\n" \
+                  "Hint: Did you forget to call the superclass method?"
 
 
 def super_check(fn):
@@ -8,26 +26,107 @@ def super_check(fn):
     Decorator to add a super check to a function to be used with
     call_with_super_check
     """
+    if _MODE != SUPER_CHECK_RUNTIME:
+        # Nothing to do when called, the overrides are verified per class instead (if at all)
+        fn.super_checked = True
+        return fn
 
     def new_fn(self, *args, **kwargs):
-        assert getattr(self, '_called', 0) >= 1, \
+        assert _CALL_COUNTS.get(id(self), 0) >= 1, \
             "The function '{}' was not called through " \
             "call_with_super_check".format(fn.__name__)
-        fn(self, *args, **kwargs)
-        self._called -= 1
+        result = fn(self, *args, **kwargs)
+        _CALL_COUNTS[id(self)] -= 1
+        return result
 
+    new_fn.super_checked = True
     return new_fn
 
 
 def call_with_super_check(fn, *args, **kwargs):
     """
     Call a class method checking that all subclasses called super along the way
+
+    :return: what the method returns
     """
     self = fn.__self__
-    call_count = getattr(self, '_called', 0)
-    self._called = call_count + 1
-    fn(*args, **kwargs)
-    assert self._called == call_count, \
-        "Base '{}' was not called from '{}'\n" \
-        "Hint: Did you forget to call the " \
-        "superclass method?".format(fn.__name__, self.__class__)
+
+    if _MODE == SUPER_CHECK_CLASS:
+        key = (self.__class__, fn.__name__)
+        if key not in _VERIFIED:
+            verify_super_calls(*key)
+            _VERIFIED.add(key)
+        return fn(*args, **kwargs)
+    elif _MODE == SUPER_CHECK_OFF:
+        return fn(*args, **kwargs)
+
+    key = id(self)
+    call_count = _CALL_COUNTS.get(key, 0)
+    _CALL_COUNTS[key] = call_count + 1
+    try:
+        result = fn(*args, **kwargs)
+        assert _CALL_COUNTS[key] == call_count, _NOT_CALLED_MSG.format(fn.__name__, self.__class__)
+        return result
+    finally:
+        # Don't leave anything behind, the id may be reused by another object
+        if call_count:
+            _CALL_COUNTS[key] = call_count
+        else:
+            del _CALL_COUNTS[key]
+
+
+def verify_super_calls(cls, name):
+    """
+    Check, without calling anything, that all the overrides of a super checked method in the
+    hierarchy of a class call the superclass method.  An override is taken to call it if it
+    refers to an attribute with the name of the method, as in `super(Cls, self).method()`.
+
+    :param cls: the class to check
+    :param name: the name of the super checked method
+    :raises: AssertionError if an override does not call the superclass method
+    """
+    for klass in cls.__mro__:
+        try:
+            func = klass.__dict__[name]
+        except KeyError:
+            continue
+
+        if getattr(func, 'super_checked', False):
+            return
+
+        if not _refers_to(func, name, set()):
+            raise AssertionError(_NOT_CALLED_MSG.format(name, klass))
+
+    raise AssertionError("'{}' of '{}' is not a super checked method".format(name, cls))
+
+
+def _refers_to(func, name, seen):
+    """
+    Whether a function, or a function that it wraps, refers to an attribute with the given name.
+    Decorated functions are looked through using `__wrapped__` or, as `functools.wraps` does not
+    set that on Python 2, the functions in the closure of the wrapper.
+    """
+    if id(func) in seen:
+        return False
+    seen.add(id(func))
+
+    wrapped = getattr(func, '__wrapped__', None)
+    if wrapped is not None:
+        return _refers_to(wrapped, name, seen)
+
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return False
+    if name in code.co_names:
+        return True
+
+    for cell in getattr(func, '__closure__', None) or ():
+        try:
+            contents = cell.cell_contents
+        except ValueError:
+            # An empty cell
+            continue
+        if hasattr(contents, '__code__') and _refers_to(contents, name, seen):
+            return True
+
+    return False
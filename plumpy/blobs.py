@@ -0,0 +1,518 @@
+# -*- coding: utf-8 -*-
+"""
+Offloading of large context values to a blob store.
+
+Set the :attr:`plumpy.ContextMixin.CONTEXT_OFFLOADER` of a work chain class to a
+:class:`ContextOffloader` and, after each step of the work chain, any context values that changed
+and are larger than a threshold are written to the blob store and replaced in the context by a
+:class:`BlobHandle`.  Other users of :class:`plumpy.ContextMixin` call
+:meth:`plumpy.ContextMixin.offload_context` themselves.  Handles load their value the first time it
+is accessed through the context and the loaded values are kept in a cache with a limited size,
+evicting the least recently used ones when it is full.
+
+Work chains store the values of each process under a namespace of their own, which is deleted from
+the store once the process terminates.  Blobs are not deleted before that because checkpoints may
+still refer to them, and after it only the values that happened to be loaded can still be got.
+
+A value that is got from the context may be changed in place, so its handle is held in the cache
+until the next offload, which pickles the value again and stores it anew if it changed.  Replacing
+or deleting an offloaded value takes its handle out of the cache.
+"""
+
+from __future__ import absolute_import
+import abc
+import collections
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import threading
+
+import six
+
+from .utils import TrackedAttributesDict
+
+__all__ = ['BlobStore', 'DirectoryBlobStore', 'BlobHandle', 'BlobCache', 'ContextOffloader', 'OffloadingAttributesDict']
+
+_SCALAR_TYPES = (type(None), bool, float, complex) + six.integer_types
+
+
+class BlobCache(object):
+    """Keeps the values of the most recently used blob handles loaded, up to a total size"""
+
+    def __init__(self, max_size=256 * 1024 * 1024):
+        """
+        :param max_size: the maximum total size, in bytes, of the values to keep loaded
+        """
+        self._max_size = max_size
+        self._size = 0
+        self._loaded = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        """The total size, in bytes, of the values that are loaded"""
+        return self._size
+
+    def used(self, handle):
+        """Note that a handle has been used, loading it may cause others to be evicted"""
+        with self._lock:
+            key = id(handle)
+            if key in self._loaded:
+                self._loaded[key] = self._loaded.pop(key)
+                return
+
+            self._loaded[key] = handle
+            self._size += handle.size
+            if self._size > self._max_size:
+                self._evict(keep=handle)
+
+    def _evict(self, keep):
+        # The least recently used go first, held handles may have been changed so they stay loaded
+        for key, loaded in list(self._loaded.items()):
+            if self._size <= self._max_size:
+                break
+            if loaded is keep or loaded.held:
+                continue
+            del self._loaded[key]
+            self._size -= loaded.size
+            loaded.evict()
+
+    def forget(self, handle):
+        """Stop keeping track of a handle, e.g. because it is no longer used"""
+        with self._lock:
+            if self._loaded.pop(id(handle), None) is not None:
+                self._size -= handle.size
+
+
+class BlobStore(six.with_metaclass(abc.ABCMeta, object)):
+    """
+    A store of write-once blobs of bytes
+
+    Stores are pickled as their :attr:`locator`, so handles loaded in the same interpreter share
+    the store, and its cache, that wrote them or that was created for them first.
+    """
+
+    def __init__(self, cache=None):
+        """
+        :param cache: the cache of loaded values of the handles of this store
+        :type cache: :class:`BlobCache`
+        """
+        self._cache = cache if cache is not None else BlobCache()
+
+    def __reduce__(self):
+        return _get_store, (self.locator,)
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @abc.abstractproperty
+    def locator(self):
+        """
+        A picklable ``(factory, args)`` tuple that identifies the store, calling the factory with the
+        args should give a store of the same blobs
+        """
+        pass
+
+    def store(self, value, data=None, namespace=None):
+        """
+        Store a value
+
+        :param value: the value, it has to be picklable
+        :param data: the value already pickled, if available
+        :param namespace: the namespace to store the value in, see :meth:`delete_namespace`
+        :return: the handle to the stored value
+        :rtype: :class:`BlobHandle`
+        """
+        if data is None:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        blob_id = self.get_blob_id(data, namespace)
+        _register_store(self)
+        if not self.has_blob(blob_id):
+            self.put_blob(blob_id, data)
+
+        # Keep the value loaded for now, it will be evicted when the cache fills up
+        handle = BlobHandle(self, blob_id, len(data))
+        handle._value = value  # pylint: disable=protected-access
+        self._cache.used(handle)
+        return handle
+
+    def load(self, blob_id):
+        return pickle.loads(self.get_blob(blob_id))
+
+    @staticmethod
+    def get_blob_id(data, namespace=None):
+        """
+        :param data: the bytes of a blob
+        :param namespace: the namespace of the blob
+        :return: the id the blob is stored under
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if namespace is None:
+            return digest
+        return '{}/{}'.format(namespace, digest)
+
+    @abc.abstractmethod
+    def has_blob(self, blob_id):
+        """
+        :param blob_id: the blob id
+        :return: True if the store has the blob, False otherwise
+        """
+        pass
+
+    @abc.abstractmethod
+    def put_blob(self, blob_id, data):
+        """
+        Write a blob, this should be atomic so that the blob is either there completely or not at all
+
+        :param blob_id: the blob id
+        :param data: the bytes of the blob
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_blob(self, blob_id):
+        """
+        :param blob_id: the blob id
+        :return: the bytes of the blob
+        """
+        pass
+
+    @abc.abstractmethod
+    def delete_blob(self, blob_id):
+        """
+        Delete a blob, no error is raised if it does not exist
+
+        :param blob_id: the blob id
+        """
+        pass
+
+    @abc.abstractmethod
+    def delete_namespace(self, namespace):
+        """
+        Delete all the blobs in a namespace, no error is raised if there are none
+
+        :param namespace: the namespace
+        """
+        pass
+
+
+class DirectoryBlobStore(BlobStore):
+    """A blob store that keeps each blob in a file in a directory, and each namespace in a subdirectory"""
+
+    def __init__(self, directory, cache=None):
+        super(DirectoryBlobStore, self).__init__(cache)
+        self._directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @property
+    def locator(self):
+        return type(self), (os.path.abspath(self._directory),)
+
+    def has_blob(self, blob_id):
+        return os.path.exists(self._path(blob_id))
+
+    def put_blob(self, blob_id, data):
+        path = self._path(blob_id)
+        if not os.path.isdir(os.path.dirname(path)):
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError:
+                # Another process may have created it in the meantime
+                if not os.path.isdir(os.path.dirname(path)):
+                    raise
+        # Write to a temporary file first so that a blob is either there completely or not at all
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temporary, 'wb') as handle:
+            handle.write(data)
+        os.rename(temporary, path)
+
+    def get_blob(self, blob_id):
+        with open(self._path(blob_id), 'rb') as handle:
+            return handle.read()
+
+    def delete_blob(self, blob_id):
+        try:
+            os.remove(self._path(blob_id))
+        except OSError:
+            pass
+
+    def delete_namespace(self, namespace):
+        shutil.rmtree(os.path.join(self._directory, namespace), ignore_errors=True)
+
+    def _path(self, blob_id):
+        return os.path.join(self._directory, blob_id)
+
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def _register_store(store):
+    with _STORES_LOCK:
+        _STORES.setdefault(store.locator, store)
+
+
+def _get_store(locator):
+    with _STORES_LOCK:
+        try:
+            return _STORES[locator]
+        except KeyError:
+            factory, args = locator
+            store = _STORES[locator] = factory(*args)
+            return store
+
+
+class BlobHandle(object):
+    """A lightweight stand in for a value in a blob store, the value is loaded when first needed"""
+    __slots__ = ('_store', '_blob_id', '_size', '_value', '_held', '__weakref__')
+
+    _NOT_LOADED = object()
+
+    def __init__(self, store, blob_id, size):
+        self._store = store
+        self._blob_id = blob_id
+        self._size = size
+        self._value = self._NOT_LOADED
+        self._held = False
+
+    def __reduce__(self):
+        # Only the reference to the blob is saved, never the value, and the store is saved as its locator
+        return BlobHandle, (self._store, self._blob_id, self._size)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return 'BlobHandle({}, {} bytes)'.format(self._blob_id, self._size)
+
+    @property
+    def blob_id(self):
+        return self._blob_id
+
+    @property
+    def size(self):
+        """The size of the pickled value in bytes"""
+        return self._size
+
+    @property
+    def loaded(self):
+        return self._value is not self._NOT_LOADED
+
+    @property
+    def held(self):
+        return self._held
+
+    def hold(self):
+        """Keep the value loaded, even when the cache is full, until :meth:`unhold` is called"""
+        self._held = True
+
+    def unhold(self):
+        self._held = False
+
+    @property
+    def value(self):
+        """The value, loading it if necessary"""
+        value = self._value
+        if value is self._NOT_LOADED:
+            value = self._value = self._store.load(self._blob_id)
+        self._store.cache.used(self)
+        return value
+
+    def evict(self):
+        """Let go of the loaded value, it will be loaded again when needed"""
+        self._value = self._NOT_LOADED
+
+    def release(self):
+        """Let go of the loaded value and take it out of the cache, e.g. because the handle is no longer used"""
+        self._held = False
+        self._store.cache.forget(self)
+        self.evict()
+
+
+class ContextOffloader(object):
+    """A policy for offloading large context values to a blob store"""
+
+    def __init__(self, store, threshold=1024 * 1024):
+        """
+        :param store: the blob store
+        :type store: :class:`BlobStore`
+        :param threshold: the size, in bytes, of the pickled value above which it is offloaded
+        """
+        self._store = store
+        self._threshold = threshold
+
+    def offload(self, context, keys=None, namespace=None):
+        """
+        Offload those values of the context that are too large
+
+        :param context: the context
+        :type context: :class:`OffloadingAttributesDict`
+        :param keys: the keys to consider, by default those that were set or got since the last time
+        :param namespace: the namespace to store the values in
+        """
+        if keys is None:
+            keys = context.take_pending()
+        values = context.__dict__
+        for key in list(keys):
+            value = values.get(key, None)
+            if isinstance(value, BlobHandle):
+                if value.held:
+                    self._offload_held(context, key, value, namespace)
+                continue
+            if value is None:
+                continue
+
+            # Only pickle the values that may be large enough, to not pickle everything on every step
+            estimate = self._estimate_size(context, key, value)
+            if estimate is not None and estimate <= self._threshold // 2:
+                continue
+
+            try:
+                data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            except Exception:  # pylint: disable=broad-except
+                # Leave it to the persister to deal with
+                continue
+
+            if len(data) > self._threshold:
+                handle = self._store.store(value, data, namespace)
+                context[key] = handle
+            else:
+                try:
+                    context.sizes[key] = type(value), len(data), len(value)
+                except TypeError:
+                    pass
+
+    def delete(self, namespace):
+        """
+        Delete the values that were offloaded in a namespace
+
+        :param namespace: the namespace
+        """
+        self._store.delete_namespace(namespace)
+
+    @staticmethod
+    def _estimate_size(context, key, value):
+        """
+        Estimate the size of a value once pickled, containers are assumed to grow in proportion to
+        their length since they were last measured
+
+        :return: the estimated size in bytes, or None if there is no estimate
+        """
+        if isinstance(value, _SCALAR_TYPES):
+            return sys.getsizeof(value)
+        if isinstance(value, bytes):
+            return len(value)
+        if isinstance(value, six.text_type):
+            # Encoded as UTF-8, which takes up to four bytes per character
+            return 4 * len(value)
+
+        try:
+            value_type, size, length = context.sizes[key]
+        except KeyError:
+            return None
+        if type(value) is not value_type or not length:  # pylint: disable=unidiomatic-typecheck
+            return None
+        return size * len(value) // length
+
+    def _offload_held(self, context, key, handle, namespace):
+        # The value was got from the context, so it may have been changed in place since it was stored
+        value = handle.value
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if self._store.get_blob_id(data, namespace) == handle.blob_id:
+            handle.unhold()
+        elif len(data) > self._threshold:
+            context[key] = self._store.store(value, data, namespace)
+        else:
+            context[key] = value
+
+
+class OffloadingAttributesDict(TrackedAttributesDict):
+    """
+    A :class:`plumpy.utils.TrackedAttributesDict` that can hold :class:`BlobHandle` instances in
+    place of values, the values are loaded when they are accessed.
+    """
+    __slots__ = ('_pending', '_sizes')
+
+    def __init__(self, **kwargs):
+        super(OffloadingAttributesDict, self).__init__(**kwargs)
+        object.__setattr__(self, '_pending', set())
+        object.__setattr__(self, '_sizes', {})
+
+    def __getattribute__(self, name):
+        value = object.__getattribute__(self, name)
+        if type(value) is BlobHandle:  # pylint: disable=unidiomatic-typecheck
+            return self._get_value(name, value)
+        return value
+
+    def __setattr__(self, key, value):
+        previous = self.__dict__.get(key, None)
+        super(OffloadingAttributesDict, self).__setattr__(key, value)
+        if isinstance(value, BlobHandle):
+            self._pending.discard(key)
+            self._sizes.pop(key, None)
+        else:
+            self._pending.add(key)
+        if isinstance(previous, BlobHandle) and previous is not value:
+            previous.release()
+
+    def __delattr__(self, key):
+        previous = self.__dict__.get(key, None)
+        super(OffloadingAttributesDict, self).__delattr__(key)
+        self._pending.discard(key)
+        self._sizes.pop(key, None)
+        if isinstance(previous, BlobHandle):
+            previous.release()
+
+    def get(self, key, default=None):
+        value = self.__dict__.get(key, default)
+        if type(value) is BlobHandle:  # pylint: disable=unidiomatic-typecheck
+            return self._get_value(key, value)
+        return value
+
+    def setdefault(self, key, value):
+        if key not in self.__dict__:
+            self[key] = value
+        return self[key]
+
+    @property
+    def sizes(self):
+        """
+        The ``(type, size, length)`` of the values that were last measured by the offloader and not offloaded,
+        by key
+
+        :rtype: dict
+        """
+        return self._sizes
+
+    def touch(self, key):
+        super(OffloadingAttributesDict, self).touch(key)
+        self._pending.add(key)
+
+    def _get_value(self, key, handle):
+        # The value may be changed in place, so keep it loaded and check it at the next offload
+        handle.hold()
+        self._pending.add(key)
+        return handle.value
+
+    def _is_tracked(self, value):
+        # A handle is replaced by the offloader if its value changed in place
+        return isinstance(value, BlobHandle) or super(OffloadingAttributesDict, self)._is_tracked(value)
+
+    def take_pending(self):
+        """
+        Get the keys that were set since the last time this was called, these are the ones that may
+        have to be offloaded
+
+        :return: the keys
+        :rtype: set
+        """
+        pending = self._pending
+        object.__setattr__(self, '_pending', set())
+        return pending
@@ -2,6 +2,9 @@
 
 from __future__ import absolute_import
 import functools
+import logging
+import sys
+import uuid
 
 import kiwipy
 from tornado import concurrent, ioloop
@@ -10,7 +13,7 @@ from . import futures
 
 __all__ = [
     'Communicator', 'RemoteException', 'DeliveryFailed', 'TaskRejected', 'kiwi_to_plum_future', 'plum_to_kiwi_future',
-    'wrap_communicator'
+    'wrap_communicator', 'InProcessCommunicator'
 ]
 
 RemoteException = kiwipy.RemoteException
@@ -18,6 +21,8 @@ DeliveryFailed = kiwipy.DeliveryFailed
 TaskRejected = kiwipy.TaskRejected
 Communicator = kiwipy.Communicator
 
+_LOGGER = logging.getLogger(__name__)
+
 
 def plum_to_kiwi_future(plum_future):
     """
@@ -35,7 +40,8 @@ def plum_to_kiwi_future(plum_future):
 
 def kiwi_to_plum_future(kiwi_future, loop=None):
     """
-    Return a plum future that resolves to the outcome of the kiwi future
+    Return a plum future that resolves to the outcome of the kiwi future.  If the future already
+    is a tornado future, e.g. one returned by an :class:`InProcessCommunicator`, it is returned as is.
 
     :param kiwi_future: the kiwi future
     :type kiwi_future: :class:`kiwipy.Future`
@@ -44,6 +50,9 @@ def kiwi_to_plum_future(kiwi_future, loop=None):
     :return: the tornado future
     :rtype: :class:`plumpy.Future`
     """
+    if isinstance(kiwi_future, concurrent.Future):
+        return kiwi_future
+
     loop = loop or ioloop.IOLoop.current()
 
     tornado_future = futures.Future()
@@ -100,8 +109,8 @@ def wrap_communicator(communicator, loop=None):
     Wrap a communicator such that all callbacks made to any subscribers are scheduled on the
     given event loop.
 
-    If the communicator is already an equivalent communicator wrapper then it will not be
-    wrapped again.
+    If the communicator is already an equivalent communicator wrapper, or an in-process communicator
+    for the same loop, then it will not be wrapped.
 
     :param communicator: the communicator to wrap
     :type communicator: :class:`kiwipy.Communicator`
@@ -110,7 +119,7 @@ def wrap_communicator(communicator, loop=None):
     :return: a communicator wrapper
     :rtype: :class:`plumpy.LoopCommunicator`
     """
-    if isinstance(communicator, LoopCommunicator) and communicator.loop() is loop:
+    if isinstance(communicator, (LoopCommunicator, InProcessCommunicator)) and communicator.loop() is loop:
         return communicator
 
     return LoopCommunicator(communicator, loop)
@@ -172,3 +181,154 @@ class LoopCommunicator(kiwipy.Communicator):
 
     def wait_for(self, future, timeout=None):
         return self._communicator.wait_for(future, timeout)
+
+
+class InProcessCommunicator(kiwipy.Communicator):
+    """
+    A communicator for subscribers that live in the same interpreter and on the same event loop as the
+    senders.  Messages are not serialized, the subscribers are simply called on the loop and whatever
+    they return is handed back to the sender.
+
+    The futures returned by the send methods follow the same convention as the other communicators
+    i.e. they resolve to a future of the response, so they can be used with a
+    :class:`plumpy.RemoteProcessController`.  Processes using this communicator on its own loop will
+    not wrap it, so there is no conversion between kiwipy and tornado futures along the way.
+    """
+
+    def __init__(self, loop=None):
+        """
+        :param loop: The tornado event loop to deliver messages on
+        :type loop: :class:`tornado.ioloop.IOLoop`
+        """
+        self._loop = loop or ioloop.IOLoop.current()
+        self._task_subscribers = []
+        self._rpc_subscribers = {}
+        self._broadcast_subscribers = {}
+
+    def loop(self):
+        return self._loop
+
+    def add_rpc_subscriber(self, subscriber, identifier=None):
+        identifier = str(identifier or uuid.uuid4())
+        self._rpc_subscribers[identifier] = subscriber
+        return identifier
+
+    def remove_rpc_subscriber(self, identifier):
+        try:
+            self._rpc_subscribers.pop(str(identifier))
+        except KeyError:
+            raise ValueError("Unknown subscriber '{}'".format(identifier))
+
+    def add_task_subscriber(self, subscriber):
+        self._task_subscribers.append(subscriber)
+
+    def remove_task_subscriber(self, subscriber):
+        try:
+            self._task_subscribers.remove(subscriber)
+        except ValueError:
+            raise ValueError("Unknown subscriber: '{}'".format(subscriber))
+
+    def add_broadcast_subscriber(self, subscriber, identifier=None):
+        identifier = identifier or str(uuid.uuid4())
+        self._broadcast_subscribers[identifier] = subscriber
+        return identifier
+
+    def remove_broadcast_subscriber(self, identifier):
+        try:
+            del self._broadcast_subscribers[identifier]
+        except KeyError:
+            raise ValueError("Broadcast subscriber '{}' unknown".format(identifier))
+
+    def task_send(self, task, no_reply=False):
+        """
+        Send a task to the first subscriber that does not reject it
+
+        :param task: The task message
+        :param no_reply: Do not return a future for the outcome
+        :return: A future that resolves to a future of the outcome of the task
+        :rtype: :class:`plumpy.Future`
+        """
+        outcome = futures.Future()
+        self._loop.add_callback(self._deliver_task, task, outcome, 0)
+        if no_reply:
+            return None
+        return outcome
+
+    def rpc_send(self, recipient_id, msg):
+        """
+        Call the RPC subscriber with the given identifier
+
+        :param recipient_id: The recipient identifier
+        :param msg: The body of the message
+        :return: A future that resolves to a future of the response
+        :rtype: :class:`plumpy.Future`
+        """
+        outcome = futures.Future()
+        self._loop.add_callback(self._deliver_rpc, recipient_id, msg, outcome)
+        return outcome
+
+    def broadcast_send(self, body, sender=None, subject=None, correlation_id=None):
+        self._loop.add_callback(self._deliver_broadcast, body, sender, subject, correlation_id)
+        return True
+
+    def _deliver_task(self, task, outcome, first):
+        for index in range(first, len(self._task_subscribers)):
+            try:
+                result = self._task_subscribers[index](self, task)
+            except kiwipy.TaskRejected:
+                continue
+            except Exception:  # pylint: disable=broad-except
+                # The task was delivered but failed, just as when a coroutine subscriber fails
+                outcome.set_result(_failed_future(sys.exc_info()))
+                return
+
+            if not concurrent.is_future(result):
+                outcome.set_result(_done_future(result))
+                return
+
+            def task_done(task_future, next_subscriber=index + 1):
+                # A coroutine subscriber can still reject the task, in which case we move on to the next one
+                if isinstance(task_future.exception(), kiwipy.TaskRejected):
+                    self._deliver_task(task, outcome, next_subscriber)
+                else:
+                    outcome.set_result(task_future)
+
+            self._loop.add_future(result, task_done)
+            return
+
+        outcome.set_exception(kiwipy.TaskRejected('Rejected by all subscribers'))
+
+    def _deliver_rpc(self, recipient_id, msg, outcome):
+        try:
+            # Identifiers are routing keys, so a pid can be used directly to address a process
+            subscriber = self._rpc_subscribers[str(recipient_id)]
+        except KeyError:
+            outcome.set_exception(kiwipy.UnroutableError("Unknown rpc recipient '{}'".format(recipient_id)))
+            return
+
+        try:
+            result = subscriber(self, msg)
+        except Exception:  # pylint: disable=broad-except
+            outcome.set_result(_failed_future(sys.exc_info()))
+        else:
+            outcome.set_result(result if concurrent.is_future(result) else _done_future(result))
+
+    def _deliver_broadcast(self, body, sender, subject, correlation_id):
+        for subscriber in list(self._broadcast_subscribers.values()):
+            try:
+                subscriber(self, body=body, sender=sender, subject=subject, correlation_id=correlation_id)
+            except Exception:  # pylint: disable=broad-except
+                # One failing subscriber should not stop the others from getting the message
+                _LOGGER.exception('Exception in broadcast subscriber %s', subscriber)
+
+
+def _done_future(result):
+    future = futures.Future()
+    future.set_result(result)
+    return future
+
+
+def _failed_future(exc_info):
+    future = futures.Future()
+    future.set_exc_info(exc_info)
+    return future
@@ -3,10 +3,13 @@ Module containing future related methods and classes
 """
 
 from __future__ import absolute_import
+import functools
+import sys
+
 import kiwipy
 from tornado import concurrent, gen, ioloop
 
-__all__ = ['Future', 'gather', 'chain', 'copy_future', 'CancelledError', 'create_task']
+__all__ = ['Future', 'Barrier', 'gather', 'chain', 'copy_future', 'CancelledError', 'create_task']
 
 CancelledError = kiwipy.CancelledError
 
@@ -34,6 +37,77 @@ class Future(concurrent.Future):
         self._callbacks.remove(callback)
 
 
+class Barrier(Future):
+    """
+    A future that resolves once all of a number of awaitables are done, or to the exception of the
+    first one that fails.
+
+    Each awaitable gets a single done callback which does a constant amount of work when it fires.
+    Closing the barrier is also constant time: instead of removing the callbacks from every one of
+    the awaitables, those that are left behind simply do nothing when they fire.
+    """
+
+    def __init__(self, awaitables, callback=None):
+        """
+        :param awaitables: the awaitables to wait for, as (key, awaitable) pairs
+        :param callback: an optional callable that is called with the key and the awaitable as each
+            one is done, if it raises the barrier resolves to the exception.  It can return further
+            (key, awaitable) pairs for the barrier to wait for.
+        """
+        super(Barrier, self).__init__()
+        awaitables = list(awaitables)
+        self._callback = callback
+        self._remaining = len(awaitables)
+        self._open = True
+
+        if not awaitables:
+            self._close()
+            self.set_result(None)
+
+        for key, awaitable in awaitables:
+            awaitable.add_done_callback(functools.partial(self._awaitable_done, key))
+
+    @property
+    def remaining(self):
+        """The number of awaitables that are yet to be done"""
+        return self._remaining
+
+    def close(self):
+        """Stop waiting, the barrier will not resolve"""
+        self._close()
+
+    def _close(self):
+        self._open = False
+        self._callback = None
+
+    def _awaitable_done(self, key, awaitable):
+        if not self._open:
+            return
+
+        self._remaining -= 1
+        more = None
+        try:
+            if self._callback is not None:
+                more = self._callback(key, awaitable)
+            else:
+                awaitable.result()
+        except Exception:  # pylint: disable=broad-except
+            self._close()
+            self.set_exc_info(sys.exc_info())
+            return
+
+        for more_key, more_awaitable in more or ():
+            if not self._open:
+                # Already resolved by one of the awaitables that was done already
+                return
+            self._remaining += 1
+            more_awaitable.add_done_callback(functools.partial(self._awaitable_done, more_key))
+
+        if self._open and self._remaining == 0:
+            self._close()
+            self.set_result(None)
+
+
 class CancellableAction(Future):
 
     def __init__(self, action, cookie=None):
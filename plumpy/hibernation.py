@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in hibernation of processes that sit idle in the WAITING state.
+
+A :class:`Hibernator` runs processes much like a process launcher does but, when a process has
+been waiting for longer than a given time, or when there are too many processes resident in
+memory, it checkpoints the process and lets go of it.  All that is kept is a small record with
+the RPC subscription of the process and the futures it was waiting for.  As soon as one of these
+futures completes, an RPC message arrives for the process, or it is asked for explicitly using
+:meth:`Hibernator.wake`, the process is loaded back from its checkpoint and carries on.
+"""
+
+from __future__ import absolute_import
+import logging
+import sys
+import time
+
+from tornado import concurrent, gen, ioloop
+
+from . import communications
+from . import futures
+from . import persistence
+from . import process_states
+
+__all__ = ['Hibernator']
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _Record(object):
+    """What the hibernator knows about one of its processes"""
+    __slots__ = ('pid', 'process', 'future', 'waiting_since', 'evicting', 'awaitables', 'woken', 'wake_callback')
+
+    def __init__(self, process):
+        self.pid = process.pid
+        self.process = process  # None while hibernating
+        self.future = futures.Future()  # The outcome of the process
+        self.waiting_since = None  # When the process started waiting, if it is waiting in a step
+        self.evicting = None  # The pause future while the process is being paused for eviction
+        self.awaitables = ()  # The awaitables the process was waiting on when it was evicted
+        self.woken = None  # A future resolved with the rehydrated process
+        self.wake_callback = None
+
+
+class Hibernator(object):
+    """
+    Runs processes and evicts those that are idle in the WAITING state to a persister, bringing
+    them back transparently when they are needed again.
+
+    Processes are only evicted while the hibernator is stepping them and they are waiting, so
+    run them using :meth:`run`.  Once a process has been evicted any references to it that are
+    held elsewhere are stale, use :meth:`wake` to get hold of the current instance.
+    """
+
+    def __init__(self,
+                 persister,
+                 loop=None,
+                 load_context=None,
+                 idle_timeout=None,
+                 max_resident=None,
+                 check_interval=1.):
+        """
+        :param persister: the persister to checkpoint the hibernating processes with
+        :type persister: :class:`plumpy.Persister`
+        :param loop: the event loop the processes run on
+        :param load_context: the context used to load the processes again, should contain the communicator if there is one
+        :type load_context: :class:`plumpy.LoadSaveContext`
+        :param idle_timeout: the number of seconds a process can wait for before it is evicted
+        :param max_resident: the maximum number of waiting processes to keep in memory
+        :param check_interval: the number of seconds between checks of the eviction policy
+        """
+        self._persister = persister
+        self._loop = loop or ioloop.IOLoop.current()
+        self._load_context = load_context if load_context is not None else persistence.LoadSaveContext()
+        if 'loop' not in self._load_context:
+            self._load_context = self._load_context.copyextend(loop=self._loop)
+        self._idle_timeout = idle_timeout
+        self._max_resident = max_resident
+        self._check_interval = check_interval
+
+        self._communicator = None
+        if getattr(self._load_context, 'communicator', None) is not None:
+            self._communicator = communications.wrap_communicator(self._load_context.communicator, self._loop)
+
+        self._records = {}
+        self._periodic = None
+
+    def loop(self):
+        return self._loop
+
+    @property
+    def num_resident(self):
+        """The number of processes being run that are in memory"""
+        return sum(1 for record in self._records.values() if record.process is not None)
+
+    @property
+    def num_hibernating(self):
+        """The number of processes being run that are currently evicted from memory"""
+        return len(self._records) - self.num_resident
+
+    def is_hibernating(self, pid):
+        return self._records[pid].process is None
+
+    def start(self):
+        """Start applying the eviction policy periodically"""
+        if self._periodic is None:
+            self._periodic = ioloop.PeriodicCallback(self.collect, self._check_interval * 1000., io_loop=self._loop)
+            self._periodic.start()
+
+    def stop(self):
+        """Stop applying the eviction policy"""
+        if self._periodic is not None:
+            self._periodic.stop()
+            self._periodic = None
+
+    def run(self, process):
+        """
+        Run a process to completion, hibernating it when it idles
+
+        :param process: the process to run
+        :type process: :class:`plumpy.Process`
+        :return: a future that resolves to the outputs of the process
+        :rtype: :class:`plumpy.Future`
+        """
+        record = _Record(process)
+        self._records[record.pid] = record
+        self._loop.add_callback(self._drive, record)
+        return record.future
+
+    def collect(self):
+        """
+        Apply the eviction policy now, evicting processes that have been waiting for too long and
+        then, if there are still too many waiting processes in memory, the ones that have been
+        waiting for the longest.
+
+        :return: the number of processes that are being evicted
+        """
+        now = time.time()
+        resident = self.num_resident
+        waiting = sorted((record.waiting_since, pid)
+                         for pid, record in self._records.items()
+                         if record.waiting_since is not None and record.evicting is None)
+
+        evicting = 0
+        for waiting_since, pid in waiting:
+            timed_out = self._idle_timeout is not None and now - waiting_since >= self._idle_timeout
+            too_many = self._max_resident is not None and resident - evicting > self._max_resident
+            if (timed_out or too_many) and self.hibernate(pid) is not None:
+                evicting += 1
+
+        return evicting
+
+    def hibernate(self, pid):
+        """
+        Evict a process that is waiting
+
+        :param pid: the process id
+        :return: a future that resolves once the process has been evicted or None if it cannot be evicted now
+        """
+        record = self._records[pid]
+        process = record.process
+        if process is None or record.evicting is not None or record.waiting_since is None or process.paused:
+            return None
+
+        pausing = process.pause()
+        if not concurrent.is_future(pausing):
+            return None
+
+        record.evicting = pausing
+        return pausing
+
+    def wake(self, pid):
+        """
+        Get a process that is being run, loading it back into memory if it is hibernating
+
+        :param pid: the process id
+        :return: the process
+        :rtype: :class:`plumpy.Process`
+        """
+        record = self._records[pid]
+        if record.process is not None:
+            return record.process
+
+        saved_state = self._persister.load_checkpoint(pid)
+
+        if self._communicator is not None:
+            self._communicator.remove_rpc_subscriber(str(pid))
+        for awaitable in record.awaitables:
+            if not awaitable.done():
+                awaitable.remove_done_callback(record.wake_callback)
+
+        process = saved_state.unbundle(self._load_context)
+        process._state.attach(record.awaitables)  # pylint: disable=protected-access
+        process.play()
+
+        record.process = process
+        record.awaitables = ()
+        record.wake_callback = None
+        record.woken.set_result(process)
+        record.woken = None
+        return process
+
+    @gen.coroutine
+    def _drive(self, record):
+        process = record.process
+        try:
+            while not process.has_terminated():
+                if process.state == process_states.ProcessState.WAITING:
+                    record.waiting_since = time.time()
+                try:
+                    yield process.step()
+                finally:
+                    record.waiting_since = None
+
+                if record.evicting is not None:
+                    record.evicting = None
+                    if process.paused and not process.has_terminated():
+                        self._evict(record)
+                        process = None
+                        process = yield record.woken
+        except Exception:  # pylint: disable=broad-except
+            record.future.set_exc_info(sys.exc_info())
+        else:
+            concurrent.chain_future(process.future(), record.future)
+        finally:
+            del self._records[record.pid]
+
+    def _evict(self, record):
+        process = record.process
+        record.awaitables = tuple(process._state.detach())  # pylint: disable=protected-access
+        self._persister.save_checkpoint(process)
+        process.close()
+
+        record.woken = futures.Future()
+        record.wake_callback = lambda _awaitable: self._wake_soon(record.pid)
+        for awaitable in record.awaitables:
+            awaitable.add_done_callback(record.wake_callback)
+
+        if self._communicator is not None:
+            self._communicator.add_rpc_subscriber(
+                lambda comm, msg: self._stub_receive(record.pid, comm, msg), identifier=str(record.pid))
+
+        record.process = None
+        _LOGGER.debug('Process<%s> hibernated', record.pid)
+
+    def _wake_soon(self, pid):
+        # Don't load the process from within the callback of the future that woke it
+        self._loop.add_callback(self._wake_if_hibernating, pid)
+
+    def _wake_if_hibernating(self, pid):
+        record = self._records.get(pid, None)
+        if record is not None and record.process is None:
+            self.wake(pid)
+
+    def _stub_receive(self, pid, communicator, msg):
+        """Take the place of the RPC subscriber of a hibernating process, waking it to deal with the message"""
+        return self.wake(pid).message_receive(communicator, msg)
+
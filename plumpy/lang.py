@@ -5,6 +5,64 @@ Python language utilities and tools.
 from __future__ import absolute_import
 import functools
 import inspect
+import sys
+import weakref
+
+
+def _function_codes(func):
+    """Get the code object of a function and of all the functions and lambdas defined within it"""
+    while hasattr(func, '__wrapped__'):
+        func = func.__wrapped__
+
+    codes = []
+    code = getattr(func, '__code__', None)
+    pending = [code] if code is not None else []
+    while pending:
+        code = pending.pop()
+        codes.append(code)
+        pending.extend(const for const in code.co_consts if inspect.iscode(const))
+
+    return codes
+
+
+def _class_codes(cls):
+    """Get the code objects of everything defined in the hierarchy of a class"""
+    codes = set()
+    for klass in cls.__mro__:
+        if klass is object:
+            continue
+        for member in vars(klass).values():
+            if isinstance(member, (staticmethod, classmethod)):
+                member = member.__func__
+            if isinstance(member, property):
+                functions = (member.fget, member.fset, member.fdel)
+            else:
+                functions = (member,)
+            for function in functions:
+                if function is not None:
+                    codes.update(_function_codes(function))
+
+    return frozenset(codes)
+
+
+# The code objects in the hierarchy of each class seen by a protected check, keyed on the class
+_CLASS_CODES = weakref.WeakKeyDictionary()
+
+
+def _called_from_hierarchy(obj, frame):
+    """Check if the code running in the frame belongs to the class hierarchy of the given object"""
+    cls = type(obj)
+    try:
+        codes = _CLASS_CODES[cls]
+    except KeyError:
+        codes = _CLASS_CODES[cls] = _class_codes(cls)
+
+    if frame.f_code in codes:
+        return True
+
+    # Slow path for code that was not there when the class was analysed, e.g. methods patched
+    # in afterwards, where we fall back to checking that the caller is the same object
+    return frame.f_locals.get('self', None) is obj
 
 
 def protected(check=False):
@@ -23,10 +81,7 @@ def protected(check=False):
 
             @functools.wraps(func)
             def wrapped_fn(self, *args, **kwargs):
-                try:
-                    calling_class = inspect.stack()[1][0].f_locals['self']
-                    assert self is calling_class
-                except (KeyError, AssertionError):
+                if not _called_from_hierarchy(self, sys._getframe(1)):  # pylint: disable=protected-access
                     raise RuntimeError("Cannot access protected function {} from outside"
                                        " class hierarchy".format(func.__name__))
 
@@ -39,6 +94,60 @@ def protected(check=False):
     return wrap
 
 
+def _runtime_override_check(func, owner=None):
+    """
+    Wrap a function such that it checks that it overrides a superclass method the first time it
+    is called on an instance of a particular class.  This is needed for mixins, whose superclass
+    method is only known once they are mixed in.
+    """
+    verified = set()
+
+    @functools.wraps(func)
+    def wrapped_fn(self, *args, **kwargs):
+        cls = type(self)
+        if cls not in verified:
+            mro = cls.__mro__
+            # Look in the classes that come after the one that defines the function
+            defining_class = owner if owner is not None and owner in mro else _defining_class(mro, func)
+            if not any(func.__name__ in vars(klass) for klass in mro[mro.index(defining_class) + 1:]):
+                raise RuntimeError("Function {} does not override a superclass method".format(func))
+            verified.add(cls)
+
+        return func(self, *args, **kwargs)
+
+    wrapped_fn.__wrapped__ = func  # Python 2 functools.wraps doesn't set this
+    return wrapped_fn
+
+
+def _defining_class(mro, func):
+    for klass in mro:
+        member = vars(klass).get(func.__name__, None)
+        if member is not None and getattr(member, '__wrapped__', member) is func:
+            return klass
+    return mro[0]
+
+
+class _OverrideCheck(object):
+    """
+    Placeholder for a method decorated with a checked override.  When the class is created it checks
+    that the method overrides one of a base class and then replaces itself with the method, so
+    there is nothing left to check when the method is called.
+    """
+
+    def __init__(self, func):
+        self._func = func
+
+    def __set_name__(self, owner, name):
+        if any(name in vars(klass) for klass in owner.__mro__[1:]):
+            setattr(owner, name, self._func)
+        else:
+            # May be a mixin, so we can only tell once we know the class of the instance
+            setattr(owner, name, _runtime_override_check(self._func, owner))
+
+    def __get__(self, instance, owner=None):
+        return self._func.__get__(instance, owner)
+
+
 def override(check=False):
 
     def wrap(func):
@@ -49,20 +158,14 @@ def override(check=False):
         if len(args) == 0:
             raise RuntimeError("Can only use the override decorator on member functions")
 
-        if check:
-
-            @functools.wraps(func)
-            def wrapped_fn(self, *args, **kwargs):
-                try:
-                    getattr(super(self.__class__, self), func.__name__)
-                except AttributeError:
-                    raise RuntimeError("Function {} does not override a superclass method".format(func))
+        if not check:
+            return func
 
-                return func(self, *args, **kwargs)
-        else:
-            wrapped_fn = func
+        if sys.version_info >= (3, 6):
+            return _OverrideCheck(func)
 
-        return wrapped_fn
+        # Class creation can't tell us about the method before python 3.6, so check when it is called
+        return _runtime_override_check(func)
 
     return wrap
 
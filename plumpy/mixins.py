@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
-from .utils import AttributesDict
+from .utils import TrackedAttributesDict
 
+from . import blobs
 from . import persistence
 
 __all__ = ['ContextMixin']
@@ -11,25 +12,58 @@ class ContextMixin(persistence.Savable):
     """
     Add a context to a Process.  The contents of the context will be saved
     in the instance state unlike standard instance variables.
+
+    The context keeps track of what changed since it was last marked as saved, see
+    :class:`plumpy.utils.TrackedAttributesDict`, so that persisters can write only the changes.
+
+    Large values can be offloaded from the context to a blob store by setting
+    :attr:`CONTEXT_OFFLOADER` to a :class:`plumpy.ContextOffloader` and calling :meth:`offload_context`,
+    see :mod:`plumpy.blobs`.  Saving the context never offloads anything by itself.
     """
     CONTEXT = '_context'
+    CONTEXT_OFFLOADER = None
 
     def __init__(self, *args, **kwargs):
         super(ContextMixin, self).__init__(*args, **kwargs)
-        self._context = AttributesDict()
+        self._context = self._create_context()
 
     @property
     def ctx(self):
         return self._context
 
+    def offload_context(self, namespace=None):
+        """
+        Offload the large values that were put in the context since the last time, if there is an offloader
+
+        :param namespace: the namespace to store the values in, see :meth:`delete_offloaded_context`
+        """
+        if self.CONTEXT_OFFLOADER is not None and self._context is not None:
+            self.CONTEXT_OFFLOADER.offload(self._context, namespace=namespace)
+
+    def delete_offloaded_context(self, namespace):
+        """
+        Delete the values that were offloaded in a namespace, if there is an offloader.  Those values
+        that are not loaded can no longer be got from the context afterwards.
+
+        :param namespace: the namespace
+        """
+        if self.CONTEXT_OFFLOADER is not None:
+            self.CONTEXT_OFFLOADER.delete(namespace)
+
     def save_instance_state(self, out_state, save_context):
         super(ContextMixin, self).save_instance_state(out_state, save_context)
-        if self._context is not None:
+        # A persister that writes the context by itself asks for it to be left out
+        if self._context is not None and not getattr(save_context, 'exclude_context', False):
             out_state[self.CONTEXT] = self._context.__dict__
 
     def load_instance_state(self, saved_state, load_context):
         super(ContextMixin, self).load_instance_state(saved_state, load_context)
         try:
-            self._context = AttributesDict(**saved_state[self.CONTEXT])
+            self._context = self._create_context(**saved_state[self.CONTEXT])
         except KeyError:
             pass
+
+    def _create_context(self, **kwargs):
+        if self.CONTEXT_OFFLOADER is None:
+            return TrackedAttributesDict(**kwargs)
+        return blobs.OffloadingAttributesDict(**kwargs)
@@ -7,6 +7,7 @@ import fnmatch
 import inspect
 import os
 import pickle
+import weakref
 from future.utils import with_metaclass
 
 from . import loaders
@@ -130,13 +131,21 @@ class Persister(with_metaclass(ABCMeta, object)):
 
 PersistedPickle = collections.namedtuple('PersistedPickle', ['checkpoint', 'bundle'])
 _PICKLE_SUFFIX = 'pickle'
+_CONTEXT_SUFFIX = 'context'
 
 
 class PicklePersister(Persister):
     """
     Implementation of the abstract Persister class that stores Process states
     in pickles on a filesystem.
+
+    The context of a process that keeps track of its changes, see :class:`plumpy.utils.TrackedAttributesDict`,
+    is written to a file of its own next to the pickle.  When the same process is checkpointed again with the
+    same tag only what changed in the context since is appended to that file, together with the values whose
+    changes cannot be tracked, up to :attr:`MAX_CONTEXT_DELTAS` times after which the whole context is
+    written again.
     """
+    MAX_CONTEXT_DELTAS = 100
 
     def __init__(self, pickle_directory):
         """
@@ -154,6 +163,8 @@ class PicklePersister(Persister):
             raise ValueError('failed to create the pickle directory at {}'.format(pickle_directory))
 
         self._pickle_directory = pickle_directory
+        # pid -> (tag, weak reference to the context, number of deltas) of the last context written
+        self._context_logs = {}
 
     @staticmethod
     def ensure_pickle_directory(dirpath):
@@ -201,6 +212,69 @@ class PicklePersister(Persister):
         """
         return os.path.join(self._pickle_directory, PicklePersister.pickle_filename(pid, tag))
 
+    def _context_filepath(self, pid, tag=None):
+        """
+        Returns the full filepath of the context file for the given process id
+        and optional checkpoint tag
+        """
+        filename = PicklePersister.pickle_filename(pid, tag)
+        return os.path.join(self._pickle_directory, filename[:-len(_PICKLE_SUFFIX)] + _CONTEXT_SUFFIX)
+
+    def _save_context(self, process, tag):
+        """
+        Write the saved state of the context of a process, appending only the changes and the untracked
+        values if the last context written for the process was this one with the same tag, and mark the
+        context as saved
+
+        :param process: :class:`plumpy.Process`
+        :param tag: the checkpoint tag
+        """
+        context = process.ctx
+        saved_context = context.__dict__
+        filepath = self._context_filepath(process.pid, tag)
+        last_tag, last_context, deltas = self._context_logs.get(process.pid, (None, None, 0))
+
+        if last_tag == tag and last_context is not None and last_context() is context and \
+                deltas < self.MAX_CONTEXT_DELTAS and os.path.exists(filepath):
+            changed, deleted = context.get_changes()
+            changed = set(changed) | context.get_untracked()
+            with open(filepath, 'ab') as handle:
+                pickle.dump(({key: saved_context[key] for key in changed}, deleted), handle)
+            deltas += 1
+        else:
+            with open(filepath, 'wb') as handle:
+                pickle.dump((process.CONTEXT, saved_context), handle)
+            deltas = 0
+
+        context.mark_saved()
+        self._context_logs[process.pid] = (tag, weakref.ref(context), deltas)
+
+    def _load_context(self, pid, tag, bundle):
+        """
+        Put the context of a process, if it was written to a file of its own, back into its bundle
+
+        :param pid: the process id
+        :param tag: the checkpoint tag
+        :param bundle: the bundle of the process
+        """
+        try:
+            handle = open(self._context_filepath(pid, tag), 'rb')
+        except (IOError, OSError):
+            return
+
+        with handle:
+            context_key, saved_context = pickle.load(handle)
+            while True:
+                try:
+                    changed, deleted = pickle.load(handle)
+                except EOFError:
+                    break
+                saved_context.update(changed)
+                for key in deleted:
+                    saved_context.pop(key, None)
+
+        bundle[context_key] = saved_context
+
     def save_checkpoint(self, process, tag=None):
         """
         Persist a process to a pickle on disk
@@ -209,8 +283,13 @@ class PicklePersister(Persister):
         :param tag: optional checkpoint identifier to allow distinguishing
             multiple checkpoints for the same process
         """
-        bundle = Bundle(process)
         checkpoint = PersistedCheckpoint(process.pid, tag)
+        if isinstance(getattr(process, 'ctx', None), utils.TrackedAttributesDict):
+            # The context is written by itself, leave it out of the bundle
+            bundle = Bundle(process, LoadSaveContext(exclude_context=True))
+            self._save_context(process, tag)
+        else:
+            bundle = Bundle(process)
         persisted_pickle = PersistedPickle(checkpoint, bundle)
 
         with open(self._pickle_filepath(process.pid, tag), 'w+b') as handle:
@@ -228,6 +307,7 @@ class PicklePersister(Persister):
         """
         filepath = self._pickle_filepath(pid, tag)
         checkpoint = PicklePersister.load_pickle(filepath)
+        self._load_context(pid, tag, checkpoint.bundle)
 
         return checkpoint.bundle
 
@@ -269,12 +349,14 @@ class PicklePersister(Persister):
         :param tag: optional checkpoint identifier to allow retrieving
             a specific sub checkpoint for the corresponding process
         """
-        pickle_filepath = self._pickle_filepath(pid, tag)
+        for filepath in (self._pickle_filepath(pid, tag), self._context_filepath(pid, tag)):
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
 
-        try:
-            os.remove(pickle_filepath)
-        except OSError:
-            pass
+        if self._context_logs.get(pid, (None,))[0] == tag:
+            del self._context_logs[pid]
 
     def delete_process_checkpoints(self, pid):
         """
@@ -403,6 +485,8 @@ META__TYPE__SAVABLE = 'S'
 
 
 class Savable(object):
+    __slots__ = ()
+
     CLASS_NAME = 'class_name'
 
     _auto_persist = None
@@ -508,9 +592,11 @@ class Savable(object):
             setattr(self, member, self._get_value(saved_state, member, load_context))
 
     def _ensure_persist_configured(self):
-        if not self._persist_configured:
-            self.persist()
-            self._persist_configured = True
+        # This is done once per class, checking the class' own dictionary as a base class may have been configured
+        cls = type(self)
+        if not cls.__dict__.get('_persist_configured', False):
+            cls.persist()
+            cls._persist_configured = True
 
     # region Metadata getter/setters
 
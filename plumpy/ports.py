@@ -8,7 +8,7 @@ from abc import ABCMeta
 from future.utils import with_metaclass
 from six import string_types
 
-from plumpy.utils import is_mutable_property
+from plumpy.utils import AttributesFrozendict, is_mutable_property
 
 _LOGGER = logging.getLogger(__name__)
 UNSPECIFIED = ()
@@ -20,7 +20,11 @@ class ValueSpec(with_metaclass(ABCMeta, object)):
     """
     Specifications relating to a general input/output value including
     properties like whether it is required, valid types, the help string, etc.
+
+    Once frozen, see :meth:`freeze`, a value spec can no longer be changed, which allows it to be
+    shared by the port namespaces of several process specifications.
     """
+    _frozen = False
 
     def __init__(self, name, valid_type=None, help=None, required=True, validator=None):
         self._name = name
@@ -32,6 +36,39 @@ class ValueSpec(with_metaclass(ABCMeta, object)):
     def __str__(self):
         return json.dumps(self.get_description())
 
+    @property
+    def frozen(self):
+        return self._frozen
+
+    def freeze(self):
+        """
+        Make this value spec immutable, e.g. because the process specification that it is part of
+        was sealed or because it is shared with another process specification
+        """
+        self._frozen = True
+
+    def thaw(self):
+        """
+        Get a copy of this frozen value spec that can be changed.  Its attributes, e.g. a mutable
+        default, are deep copied so that changing them does not affect this value spec.
+
+        :return: the copy
+        """
+        thawed = copy.deepcopy(self, self._shared_when_thawed())
+        thawed._frozen = False  # pylint: disable=protected-access
+        return thawed
+
+    def _shared_when_thawed(self):
+        """
+        :return: a deepcopy memo with what the copy made by :meth:`thaw` does not deep copy
+        :rtype: dict
+        """
+        return {}
+
+    def _check_mutable(self):
+        if self._frozen:
+            raise RuntimeError("the port '{}' is frozen and cannot be changed".format(self._name))
+
     def get_description(self):
         """
         Return a description of the ValueSpec, which will be a dictionary of its attributes
@@ -60,6 +97,7 @@ class ValueSpec(with_metaclass(ABCMeta, object)):
 
     @valid_type.setter
     def valid_type(self, valid_type):
+        self._check_mutable()
         self._valid_type = valid_type
 
     @property
@@ -68,6 +106,7 @@ class ValueSpec(with_metaclass(ABCMeta, object)):
 
     @help.setter
     def help(self, help):
+        self._check_mutable()
         self._help = help
 
     @property
@@ -76,6 +115,7 @@ class ValueSpec(with_metaclass(ABCMeta, object)):
 
     @required.setter
     def required(self, required):
+        self._check_mutable()
         self._required = required
 
     @property
@@ -84,6 +124,7 @@ class ValueSpec(with_metaclass(ABCMeta, object)):
 
     @validator.setter
     def validator(self, validator):
+        self._check_mutable()
         self._validator = validator
 
     def validate(self, value):
@@ -138,8 +179,8 @@ class InputPort(Port):
             validator=validator)
 
         if required is not InputPort.required_override(required, default):
-            _LOGGER.info("the required attribute for the input port '{}' was overridden "
-                         "because a default was specified".format(name))
+            _LOGGER.info("the required attribute for the input port '%s' was overridden "
+                         "because a default was specified", name)
 
         if default is not UNSPECIFIED:
             default_valid, msg = self.validate(default)
@@ -159,6 +200,7 @@ class InputPort(Port):
 
     @default.setter
     def default(self, default):
+        self._check_mutable()
         self._default = default
 
     def get_description(self):
@@ -212,17 +254,41 @@ class PortNamespace(collections.MutableMapping, Port):
     def __len__(self):
         return len(self._ports)
 
+    def __contains__(self, key):
+        return key in self._ports
+
     def __delitem__(self, key):
+        self._check_mutable()
         del self._ports[key]
 
     def __getitem__(self, key):
-        return self._ports[key]
+        port = self._ports[key]
+        if port._frozen and not self._frozen:  # pylint: disable=protected-access
+            # The port is shared with other namespaces, take a copy of our own before it is changed
+            port = self._ports[key] = port.thaw()
+        return port
 
     def __setitem__(self, key, port):
         if not isinstance(port, Port):
             raise TypeError('port needs to be an instance of Port')
+        self._check_mutable()
         self._ports[key] = port
 
+    def freeze(self):
+        """
+        Make this port namespace and all the ports it contains immutable
+        """
+        super(PortNamespace, self).freeze()
+        for port in self._ports.values():
+            if not port.frozen:
+                port.freeze()
+
+    def _shared_when_thawed(self):
+        # The ports are shared with the copy and are only copied in turn when they are accessed through it
+        memo = super(PortNamespace, self)._shared_when_thawed()
+        memo[id(self._ports)] = dict(self._ports)
+        return memo
+
     @property
     def ports(self):
         return self._ports
@@ -236,6 +302,7 @@ class PortNamespace(collections.MutableMapping, Port):
 
     @default.setter
     def default(self, default):
+        self._check_mutable()
         self._default = default
 
     @property
@@ -244,6 +311,7 @@ class PortNamespace(collections.MutableMapping, Port):
 
     @dynamic.setter
     def dynamic(self, dynamic):
+        self._check_mutable()
         self._dynamic = dynamic
 
     @property
@@ -361,6 +429,10 @@ class PortNamespace(collections.MutableMapping, Port):
         the port namespace that is to be absorbed. The exclude and include tuples can be used to exclude or
         include certain ports and both are mutually exclusive.
 
+        The ports, and the namespaces nested in them, are shared rather than copied, so absorbing does not
+        depend on how deeply they are nested.  They are copied level by level when they are accessed through
+        this namespace, e.g. in order to be changed, see :meth:`__getitem__`.
+
         :param port_namespace: instance of PortNamespace that is to be absorbed into self
         :param exclude: list or tuple of input keys to exclude from being exposed
         :param include: list or tuple of input keys to include as exposed inputs
@@ -371,12 +443,11 @@ class PortNamespace(collections.MutableMapping, Port):
             raise ValueError('port_namespace has to be an instance of PortNamespace')
 
         # Overload mutable attributes of PortNamespace unless overridden by value in namespace_options
-        for attr in dir(port_namespace):
-            if is_mutable_property(PortNamespace, attr):
-                if attr in namespace_options:
-                    setattr(self, attr, namespace_options.pop(attr))
-                else:
-                    setattr(self, attr, getattr(port_namespace, attr))
+        for attr in _namespace_properties():
+            if attr in namespace_options:
+                setattr(self, attr, namespace_options.pop(attr))
+            else:
+                setattr(self, attr, getattr(port_namespace, attr))
 
         if namespace_options:
             raise ValueError('the namespace_options {}, is not a supported PortNamespace property'.format(', '.join(
@@ -384,8 +455,12 @@ class PortNamespace(collections.MutableMapping, Port):
 
         absorbed_ports = []
 
-        for port_name, port in self._filter_ports(list(port_namespace.items()), exclude=exclude, include=include):
-            self[port_name] = copy.deepcopy(port)
+        # The ports are shared rather than copied, they are frozen and whichever namespace changes one first
+        # gets its own copy, see __getitem__
+        for port_name, port in self._filter_ports(list(port_namespace.ports.items()), exclude=exclude, include=include):
+            if not port.frozen:
+                port.freeze()
+            self[port_name] = port
             absorbed_ports.append(port_name)
 
         return absorbed_ports
@@ -514,3 +589,392 @@ class PortNamespace(collections.MutableMapping, Port):
                     continue
 
             yield name, port
+
+
+_NAMESPACE_PROPERTIES = []
+
+
+def _namespace_properties():
+    """The names of the mutable properties of PortNamespace, in the order of `dir`"""
+    if not _NAMESPACE_PROPERTIES:
+        _NAMESPACE_PROPERTIES.extend(attr for attr in dir(PortNamespace) if is_mutable_property(PortNamespace, attr))
+    return _NAMESPACE_PROPERTIES
+
+
+# region Compiled validators
+
+_MISSING = object()
+
+
+def _is_overridden(port, method_name, base):
+    """Whether the class of a port overrides a validation method of a base class"""
+    method = getattr(type(port), method_name)
+    base_method = getattr(base, method_name)
+    return getattr(method, '__func__', method) is not getattr(base_method, '__func__', base_method)
+
+
+def compile_validator(port, cache=None, type_checks=None):
+    """
+    Compile the validation of a port, or port namespace including all its nested ports, into a
+    function that gives the same result as its `validate` method.  The properties of the ports are
+    read once, at compile time, so the ports should not be changed afterwards, as is the case for
+    the ports of a sealed :class:`plumpy.ProcessSpec`.
+
+    Nested namespaces are validated without copying the port values and error messages are only
+    formatted when validation fails.  Ports whose class overrides any of the validation methods are
+    validated by calling the method.
+
+    :param port: the port or port namespace
+    :param cache: an optional dictionary of the id of ports to the port and its compiled validator, to use and fill in
+    :param type_checks: an optional dictionary in which to remember, for each valid type, whether
+        values of a given type are instances of it, shared by all ports with the same valid type.
+        Only use this for as long as the classes involved don't change, e.g. for a batch of inputs.
+    :return: a function that takes the value, or dictionary of values for a namespace, and returns
+        valid or not and the error string or None
+    """
+    if cache is not None:
+        entry = cache.get(id(port), None)
+        if entry is not None and entry[0] is port:
+            return entry[1]
+
+    if isinstance(port, PortNamespace):
+        validate = _compile_namespace(port, cache, type_checks)
+    else:
+        validate = _compile_port(port, type_checks)
+
+    if cache is not None:
+        cache[id(port)] = (port, validate)
+    return validate
+
+
+def compile_dynamic_validator(namespace):
+    """
+    Compile the validation of a single value for a dynamic port of a namespace, giving the same
+    result as `namespace.validate_dynamic_ports({name: value})`
+
+    :param namespace: the port namespace
+    :return: a function that takes the port name and the value
+    """
+    if _is_overridden(namespace, 'validate_dynamic_ports', PortNamespace):
+        return lambda name, value: namespace.validate_dynamic_ports({name: value})
+
+    dynamic = namespace.dynamic
+    valid_type = namespace.valid_type
+
+    def validate(name, value):
+        if not dynamic:
+            return False, 'Unexpected ports {}, for a non dynamic namespace'.format({name: value})
+        if valid_type is not None and not isinstance(value, valid_type):
+            return False, 'Invalid type {} for dynamic port value: expected {}'.format(type(value), valid_type)
+        return True, None
+
+    return validate
+
+
+def _instance_check(valid_type, type_checks):
+    """Get a function that checks whether a value is an instance of a valid type, remembering the result for each type"""
+    if type_checks is None or valid_type is None:
+        return None
+
+    classes = valid_type if isinstance(valid_type, tuple) else (valid_type,)
+    if all(type(cls) is type for cls in classes):  # pylint: disable=unidiomatic-typecheck
+        # Checking against plain classes is as fast as looking up the result
+        return None
+
+    try:
+        return type_checks[valid_type]
+    except KeyError:
+        pass
+    except TypeError:
+        # Not hashable
+        return None
+
+    known = {}
+
+    def instance_check(value):
+        value_type = type(value)
+        try:
+            return known[value_type]
+        except KeyError:
+            result = known[value_type] = isinstance(value, valid_type)
+            return result
+
+    type_checks[valid_type] = instance_check
+    return instance_check
+
+
+def _compile_port(port, type_checks=None):
+    if _is_overridden(port, 'validate', ValueSpec):
+        return port.validate
+
+    # pylint: disable=protected-access
+    name = port.name
+    required = port._required
+    valid_type = port._valid_type
+    validator = port._validator
+    sequence = collections.Sequence
+    instance_check = _instance_check(valid_type, type_checks)
+
+    def validate(value):
+        if value is UNSPECIFIED:
+            if required:
+                return False, "required value was not provided for '{}'".format(name)
+        elif valid_type is not None and not (instance_check(value)
+                                             if instance_check else isinstance(value, valid_type)):
+            return False, "value '{}' is not of the right type. Got '{}', expected '{}'".format(
+                name, type(value), valid_type)
+
+        if validator is not None:
+            result = validator(value)
+            if isinstance(result, sequence):
+                assert (len(result) == 2), 'Invalid validator return type'
+                return result
+            elif result is False:
+                return False, 'Value failed validation'
+
+        return True, None
+
+    return validate
+
+
+def _compile_namespace(namespace, cache, type_checks=None):
+    if any(
+            _is_overridden(namespace, method, PortNamespace)
+            for method in ('validate', 'validate_ports', 'validate_dynamic_ports')):
+        return namespace.validate
+
+    checks = tuple((name, compile_validator(port, cache, type_checks)) for name, port in namespace.ports.items())
+    names = frozenset(namespace.ports)
+    # pylint: disable=protected-access
+    validator = namespace._validator
+    required = namespace.required
+    dynamic = namespace.dynamic
+    valid_type = namespace._valid_type
+    mapping = collections.Mapping
+    instance_check = _instance_check(valid_type, type_checks)
+
+    def validate(port_values=None):
+        if port_values is None or port_values is UNSPECIFIED:
+            port_values = {}
+        elif type(port_values) is not dict and not isinstance(port_values, mapping):  # pylint: disable=unidiomatic-typecheck
+            port_values = dict(port_values)
+
+        is_valid, message = True, None
+        if validator is not None:
+            is_valid, message = validator(namespace, dict(port_values))
+            if not is_valid:
+                return is_valid, message
+
+        if not port_values and not required:
+            return is_valid, message
+
+        present = 0
+        for name, check in checks:
+            value = port_values.get(name, _MISSING)
+            if value is _MISSING:
+                value = UNSPECIFIED
+            else:
+                present += 1
+            is_valid, message = check(value)
+            if not is_valid:
+                return is_valid, message
+
+        if len(port_values) > present:
+            # There are values for ports that are not explicitly defined
+            if not dynamic:
+                remaining = {key: value for key, value in port_values.items() if key not in names}
+                return False, 'Unexpected ports {}, for a non dynamic namespace'.format(remaining)
+
+            if valid_type is not None:
+                for key, value in port_values.items():
+                    if key not in names and not (instance_check(value)
+                                                 if instance_check else isinstance(value, valid_type)):
+                        return False, 'Invalid type {} for dynamic port value: expected {}'.format(
+                            type(value), valid_type)
+
+        return True, None
+
+    return validate
+
+
+# The actions to take for a port when parsing inputs
+_FILL_DEFAULT = 0
+_CHECK_REQUIRED = 1
+_PARSE_NAMESPACE = 2
+
+
+def compile_input_parser(port_namespace):
+    """
+    Compile the matching of inputs to the ports of a port namespace, as done by
+    :meth:`plumpy.Process.create_input_args`, into a function.  The ports are looked at once, at
+    compile time, to make a plan of the defaults to fill in, the required ports to check and where
+    the nested namespaces are, so parsing inputs is then a single pass over the plan.
+
+    :param port_namespace: the port namespace
+    :return: a function that takes the inputs and returns an :class:`plumpy.utils.AttributesFrozendict`
+        with the inputs complemented with the port defaults, nested namespaces also being frozen
+    """
+    plan = []
+    for name, port in port_namespace.items():
+        if isinstance(port, PortNamespace):
+            default = port.default if port.has_default() else _MISSING
+            plan.append((name, _PARSE_NAMESPACE, (default, port.required), compile_input_parser(port)))
+        elif port.has_default():
+            plan.append((name, _FILL_DEFAULT, port.default, None))
+        elif port.required:
+            plan.append((name, _CHECK_REQUIRED, None, None))
+        # Ports that are neither required nor have a default are left alone
+    plan = tuple(plan)
+
+    def parse(inputs):
+        result = dict(inputs)
+        for name, action, argument, parse_namespace in plan:
+            if action == _FILL_DEFAULT:
+                if name not in inputs:
+                    result[name] = argument
+            elif action == _CHECK_REQUIRED:
+                if name not in inputs:
+                    raise ValueError('Value not supplied for required inputs port {}'.format(name))
+            elif name in inputs:
+                result[name] = parse_namespace(inputs[name])
+            elif argument[0] is not _MISSING:
+                result[name] = parse_namespace(argument[0])
+            elif argument[1]:
+                raise ValueError('Value not supplied for required inputs port {}'.format(name))
+        return AttributesFrozendict(result)
+
+    return parse
+
+
+class OutputChecks(object):
+    """
+    The checks of a namespace of output ports that remain to be done once all outputs have been
+    emitted, see :func:`compile_output_checks`.
+
+    Every port has a bit and the outputs that were emitted are tracked as a bitmap, an integer with
+    the bits of the ports they are for, of the ports these contain and of their enclosing namespaces.
+    Checking then only looks at the ports that have to be checked even when no value was emitted,
+    i.e. the required ones and the ones with a validator.
+    """
+
+    def __init__(self, masks, namespace_masks, checks, separator):
+        """
+        :param masks: the mask of each port, by full name
+        :param namespace_masks: the mask of the dynamic ports of each nested namespace, by full name
+        :param checks: tuples of the bit of a port, the bits of its enclosing namespaces that have to
+            be emitted to for it to be checked and the function that validates the port
+        :param separator: the namespace separator
+        """
+        self._masks = masks
+        self._namespace_masks = namespace_masks
+        self._checks = checks
+        self._separator = separator
+
+    def mask(self, output_port):
+        """
+        Get the bits to set when an output is emitted
+
+        :param output_port: the name of the output port, can be namespaced
+        :rtype: int
+        """
+        try:
+            return self._masks[output_port]
+        except KeyError:
+            pass
+
+        # A dynamic port, of the innermost namespace that exists
+        namespace = output_port
+        while namespace:
+            namespace = namespace.rpartition(self._separator)[0]
+            try:
+                return self._namespace_masks[namespace]
+            except KeyError:
+                pass
+        return 0
+
+    def emitted(self, outputs):
+        """
+        Get the bitmap of a mapping of outputs
+
+        :param outputs: the outputs by full name of the port
+        :rtype: int
+        """
+        emitted = 0
+        for output_port in outputs:
+            emitted |= self.mask(output_port)
+        return emitted
+
+    def check(self, emitted):
+        """
+        Check the ports that no value was emitted for
+
+        :param emitted: the bitmap of the emitted outputs
+        :return: valid or not, error string|None
+        :rtype: tuple(bool, str or None)
+        """
+        for bit, guard, validate in self._checks:
+            if emitted & bit or emitted & guard != guard:
+                # Either validated when emitted, or in a namespace that is not required and was left empty
+                continue
+            is_valid, message = validate(UNSPECIFIED)
+            if not is_valid:
+                return is_valid, message
+        return True, None
+
+
+def compile_output_checks(port_namespace, cache=None):
+    """
+    Compile the checks of the ports of a namespace of outputs that remain to be done once all outputs
+    have been emitted, given that each output was validated against its port when it was emitted.
+    This gives the same result as validating the nested dictionary of all the outputs against each
+    of the ports, but only costs as much as the number of required ports.
+
+    :param port_namespace: the port namespace of the outputs
+    :param cache: an optional dictionary of compiled validators, see :func:`compile_validator`
+    :return: the checks, or None if a nested namespace has a validator, which needs all the values
+    :rtype: :class:`OutputChecks`
+    """
+    separator = port_namespace.NAMESPACE_SEPARATOR
+    masks = {}
+    namespace_masks = {}
+    checks = []
+    bits = [0]
+
+    def next_bit():
+        bit = 1 << bits[0]
+        bits[0] += 1
+        return bit
+
+    def visit(namespace, prefix, path, guard):
+        """Visit the ports of a namespace and return the bits of all of them or None if not possible"""
+        contained = 0
+        for name, port in namespace.items():
+            full_name = prefix + name
+            bit = next_bit()
+
+            if isinstance(port, PortNamespace):
+                if port.validator is not None or any(
+                        _is_overridden(port, method, PortNamespace)
+                        for method in ('validate', 'validate_ports', 'validate_dynamic_ports')):
+                    return None
+                inner_guard = guard if port.required else guard | bit
+                inner = visit(port, full_name + separator, path | bit, inner_guard)
+                if inner is None:
+                    return None
+                namespace_masks[full_name] = path | bit
+                masks[full_name] = path | bit | inner
+                contained |= bit | inner
+            else:
+                masks[full_name] = path | bit
+                contained |= bit
+                if port.required or port.validator is not None or _is_overridden(port, 'validate', ValueSpec):
+                    checks.append((bit, guard, compile_validator(port, cache)))
+
+        return contained
+
+    if visit(port_namespace, '', 0, 0) is None:
+        return None
+    return OutputChecks(masks, namespace_masks, tuple(checks), separator)
+
+
+# endregion
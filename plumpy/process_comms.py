@@ -2,9 +2,15 @@
 
 from __future__ import absolute_import
 from __future__ import print_function
+import collections
 import copy
+import itertools
+import logging
+import os
+import threading
+import time
 
-from tornado import gen
+from tornado import gen, ioloop
 import kiwipy
 
 from . import loaders
@@ -19,12 +25,16 @@ __all__ = [
     'KILL_MSG',
     'STATUS_MSG',
     'ProcessLauncher',
+    'AdmissionPolicy',
+    'ShardedProcessLauncher',
     'create_continue_body',
     'create_launch_body',
     'RemoteProcessThreadController',
     'RemoteProcessController',
 ]
 
+_LOGGER = logging.getLogger(__name__)
+
 INTENT_KEY = 'intent'
 MESSAGE_KEY = 'message'
 
@@ -224,6 +234,30 @@ class RemoteProcessThreadController(object):
         return execute_future
 
 
+class AdmissionPolicy(object):
+    """What a :class:`ProcessLauncher` does with a task that arrives when it is at capacity"""
+    # Accept the task straight away and start the process once there is room.  A launch that does not
+    # wait for the process and is not persisted is the exception: its process has to be created to
+    # get its pid and then has to be held in memory until it is admitted.
+    QUEUE = 'queue'
+    DEFER = 'defer'  # Hold off acknowledging the task until there is room to start the process
+    REJECT = 'reject'  # Reject the task so that it can be delivered to someone else
+
+
+def _memory_usage():
+    """
+    Get the resident memory of this process in bytes
+
+    :return: the resident memory or None if it cannot be determined on this platform
+    """
+    # The peak usage from the resource module is no substitute: once it has crossed the limit it never drops
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+
+
 class ProcessLauncher(object):
     """
     Takes incoming task messages and uses them to launch processes.
@@ -244,9 +278,41 @@ class ProcessLauncher(object):
         'pid': [Process ID]
         'nowait': True or False
     }
+
+    The number of processes that the launcher runs at any one time can be limited using
+    `max_running` (all processes), `max_continues` (processes that were continued from a checkpoint)
+    and `max_memory` (resident memory of the interpreter in bytes, where it can be determined).
+    Tasks that arrive when one of the limits is reached are dealt with according to the `policy`,
+    see :class:`AdmissionPolicy`.  Queued tasks are admitted in the order they arrived as soon as
+    they fit.  When nothing is running the memory limit is ignored, otherwise the queue could never
+    drain.  Processes are only created, or loaded, once they are admitted.
     """
 
-    def __init__(self, loop=None, persister=None, load_context=None, loader=None):
+    def __init__(self,
+                 loop=None,
+                 persister=None,
+                 load_context=None,
+                 loader=None,
+                 max_running=None,
+                 max_continues=None,
+                 max_memory=None,
+                 max_queued=None,
+                 policy=AdmissionPolicy.QUEUE):
+        """
+        :param loop: the event loop to run the processes on
+        :param persister: the persister to save and load processes with
+        :param load_context: the context to use when loading processes
+        :param loader: the object loader to use to load process classes
+        :param max_running: the maximum number of processes to run at any one time
+        :param max_continues: the maximum number of continued processes to run at any one time
+        :param max_memory: the resident memory in bytes above which no new processes are started
+        :param max_queued: the maximum number of tasks waiting for admission, beyond which they are rejected
+        :param policy: what to do with tasks that arrive when the launcher is full
+        :type policy: str
+        """
+        if policy not in (AdmissionPolicy.QUEUE, AdmissionPolicy.DEFER, AdmissionPolicy.REJECT):
+            raise ValueError("Unknown admission policy '{}'".format(policy))
+
         self._loop = loop
         self._persister = persister
         self._load_context = load_context if load_context is not None else persistence.LoadSaveContext()
@@ -257,6 +323,47 @@ class ProcessLauncher(object):
         else:
             self._loader = loaders.get_object_loader()
 
+        self._max_running = max_running
+        self._max_continues = max_continues
+        self._max_memory = max_memory
+        self._max_queued = max_queued
+        self._policy = policy
+
+        self._running = 0
+        self._continues = 0
+        # A queue for each task type, of entries [arrival number, admission future, time queued, cancelled],
+        # so that tasks held up by a limit of their type do not have to be looked at for the others
+        self._waiting = {LAUNCH_TASK: collections.deque(), CONTINUE_TASK: collections.deque()}
+        self._entries = {}  # The queue entry of each admission future
+        self._queued = 0
+        self._arrivals = itertools.count()
+        self._stats = {'admitted': 0, 'queued': 0, 'rejected': 0, 'total_wait': 0., 'max_wait': 0.}
+
+    @property
+    def num_running(self):
+        """The number of processes started by this launcher that have not yet terminated"""
+        return self._running
+
+    @property
+    def queue_depth(self):
+        """The number of tasks that are waiting to be admitted"""
+        return self._queued
+
+    def get_stats(self):
+        """
+        Get the admission statistics of this launcher
+
+        :return: a dictionary with the number of running processes and the current queue depth, the
+            total number of admitted, queued and rejected tasks, and the total and maximum time (in
+            seconds) that tasks waited to be admitted
+        :rtype: dict
+        """
+        stats = dict(self._stats)
+        stats['running'] = self._running
+        stats['continues'] = self._continues
+        stats['queue_depth'] = self._queued
+        return stats
+
     @gen.coroutine
     def __call__(self, communicator, task):
         """
@@ -283,16 +390,32 @@ class ProcessLauncher(object):
         if init_kwargs is None:
             init_kwargs = {}
 
-        proc_class = self._loader.load_object(process_class)
-        proc = proc_class(*init_args, **init_kwargs)
-        if persist:
-            self._persister.save_checkpoint(proc)
+        admission = self._request_admission(LAUNCH_TASK)
+        if self._policy == AdmissionPolicy.DEFER or not nowait:
+            # Nothing has to be returned before the process is admitted, so only create it then
+            yield admission
 
-        if nowait:
-            self._loop.add_callback(proc.step_until_terminated)
-            raise gen.Return(proc.pid)
+        try:
+            proc_class = self._loader.load_object(process_class)
+            proc = proc_class(*init_args, **init_kwargs)
+            if persist:
+                self._persister.save_checkpoint(proc)
+        except Exception:
+            self._abandon(LAUNCH_TASK, admission)
+            raise
 
-        yield proc.step_until_terminated()
+        if nowait:
+            pid = proc.pid
+            if persist and not admission.done():
+                # Let go of the process while it is queued and load it again from its checkpoint once admitted
+                del proc
+                self._start_when_admitted(
+                    admission, lambda: self._persister.load_checkpoint(pid).unbundle(self._load_context), LAUNCH_TASK)
+            else:
+                self._start_when_admitted(admission, lambda: proc, LAUNCH_TASK)
+            raise gen.Return(pid)
+
+        yield self._run(proc, LAUNCH_TASK)
         raise gen.Return(proc.future().result())
 
     @gen.coroutine
@@ -305,13 +428,24 @@ class ProcessLauncher(object):
         except exceptions.PersistenceError as exception:
             raise communications.TaskRejected("Cannot continue process: {}".format(exception))
 
-        proc = saved_state.unbundle(self._load_context)
+        admission = self._request_admission(CONTINUE_TASK)
+        if nowait and self._policy != AdmissionPolicy.DEFER:
+            # Only recreate the process once it is admitted, there is no point holding it in memory until then
+            self._start_when_admitted(admission, lambda: saved_state.unbundle(self._load_context), CONTINUE_TASK)
+            raise gen.Return(pid)
+
+        yield admission
+        try:
+            proc = saved_state.unbundle(self._load_context)
+        except Exception:
+            self._abandon(CONTINUE_TASK, admission)
+            raise
 
         if nowait:
-            self._loop.add_callback(proc.step_until_terminated)
+            self._loop.add_callback(self._run, proc, CONTINUE_TASK)
             raise gen.Return(proc.pid)
 
-        yield proc.step_until_terminated()
+        yield self._run(proc, CONTINUE_TASK)
         raise gen.Return(proc.future().result())
 
     @gen.coroutine
@@ -330,3 +464,304 @@ class ProcessLauncher(object):
             self._persister.save_checkpoint(proc)
 
         raise gen.Return(proc.pid)
+
+    @gen.coroutine
+    def _run(self, proc, task_type):
+        """Run an admitted process until it terminates and then give up its slot"""
+        try:
+            yield proc.step_until_terminated()
+        finally:
+            self._release(task_type)
+
+    def _start_when_admitted(self, admission, get_process, task_type):
+
+        def admitted(_):
+            try:
+                proc = get_process()
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception('Failed to recreate the admitted process')
+                self._release(task_type)
+            else:
+                self._loop.add_callback(self._run, proc, task_type)
+
+        self._loop.add_future(admission, admitted)
+
+    def _has_capacity(self, memory=None):
+        """
+        Whether there is room for another process of any type
+
+        :param memory: the resident memory, if already read during this admission pass
+        :return: room or not and the resident memory if it was read
+        """
+        if self._max_running is not None and self._running >= self._max_running:
+            return False, memory
+        if self._max_memory is not None and self._running > 0:
+            if memory is None:
+                memory = _memory_usage()
+            if memory is not None and memory >= self._max_memory:
+                return False, memory
+        return True, memory
+
+    def _has_type_capacity(self, task_type):
+        """Whether the limits specific to a task type leave room for another process of that type"""
+        return not (task_type == CONTINUE_TASK and self._max_continues is not None and
+                    self._continues >= self._max_continues)
+
+    def _request_admission(self, task_type):
+        """
+        Ask for a slot to run a process of the given task type
+
+        :return: a future that resolves once the slot has been granted
+        :raises: :class:`plumpy.TaskRejected` if the slot cannot be granted now and the task should not wait
+        """
+        memory = self._admit_waiting() if self._queued else None
+
+        admission = futures.Future()
+        if not self._get_waiting(task_type) and self._has_type_capacity(task_type) and self._has_capacity(memory)[0]:
+            self._grant(task_type, admission)
+            return admission
+
+        if self._policy == AdmissionPolicy.REJECT or \
+                (self._max_queued is not None and self._queued >= self._max_queued):
+            self._stats['rejected'] += 1
+            raise communications.TaskRejected('Process launcher is at capacity')
+
+        self._stats['queued'] += 1
+        self._queued += 1
+        entry = [next(self._arrivals), admission, time.time(), False]
+        self._waiting[task_type].append(entry)
+        self._entries[admission] = entry
+        return admission
+
+    def _get_waiting(self, task_type):
+        """Get the queue of a task type, with the cancelled entries at its front dropped"""
+        waiting = self._waiting[task_type]
+        while waiting and waiting[0][3]:
+            waiting.popleft()
+        return waiting
+
+    def _grant(self, task_type, admission):
+        self._running += 1
+        if task_type == CONTINUE_TASK:
+            self._continues += 1
+        self._stats['admitted'] += 1
+        admission.set_result(True)
+
+    def _release(self, task_type):
+        self._running -= 1
+        if task_type == CONTINUE_TASK:
+            self._continues -= 1
+        self._admit_waiting()
+
+    def _abandon(self, task_type, admission):
+        """Give up a slot, or the place in the queue, of a task that failed before its process could run"""
+        if admission.done():
+            self._release(task_type)
+            return
+
+        # Marked as cancelled, it is dropped when it gets to the front of its queue
+        self._entries.pop(admission)[3] = True
+        self._queued -= 1
+
+    def _admit_waiting(self):
+        """
+        Admit queued tasks, in the order they arrived, for as long as they fit.  A task held up by a
+        limit specific to its type, e.g. the number of continues, does not hold up the others.
+
+        :return: the resident memory if it was read
+        """
+        memory = None
+        while self._queued:
+            has_capacity, memory = self._has_capacity(memory)
+            if not has_capacity:
+                break
+
+            # The oldest task at the front of the queues of the types that have room
+            task_type, waiting = None, None
+            for candidate_type in self._waiting:
+                candidate = self._get_waiting(candidate_type)
+                if not candidate or not self._has_type_capacity(candidate_type):
+                    continue
+                if waiting is None or candidate[0][0] < waiting[0][0]:
+                    task_type, waiting = candidate_type, candidate
+            if waiting is None:
+                break
+
+            _arrival, admission, queued_at, _cancelled = waiting.popleft()
+            del self._entries[admission]
+            self._queued -= 1
+            waited = time.time() - queued_at
+            self._stats['total_wait'] += waited
+            self._stats['max_wait'] = max(self._stats['max_wait'], waited)
+            self._grant(task_type, admission)
+
+        return memory
+
+
+class _Shard(object):
+    """
+    A single event loop, running in its own thread, together with the queue of tasks that
+    have been assigned to it and the process launcher that will carry them out.
+    """
+
+    def __init__(self, index, owner, loop, launcher):
+        self.index = index
+        self.loop = loop
+        self.launcher = launcher
+        self.active = 0
+        # Deque appends and pops are atomic so the queue can be shared between threads
+        self._queue = collections.deque()
+        self._owner = owner
+        self._thread = threading.Thread(target=self._run, name='plumpy-shard-{}'.format(index))
+        self._thread.daemon = True
+
+    @property
+    def pending(self):
+        """The number of tasks that are queued on this shard but have not been started"""
+        return len(self._queue)
+
+    @property
+    def load(self):
+        return len(self._queue) + self.active
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.loop.add_callback(self.loop.stop)
+        self._thread.join()
+        self.loop.close(all_fds=True)
+
+    def put(self, item):
+        self._queue.append(item)
+        self.wake()
+
+    def steal(self):
+        """Take the most recently queued task from this shard, returns None if there is nothing to take"""
+        try:
+            return self._queue.pop()
+        except IndexError:
+            return None
+
+    def wake(self):
+        self.loop.add_callback(self._drain)
+
+    def _run(self):
+        self.loop.make_current()
+        self.loop.start()
+
+    def _next(self):
+        try:
+            return self._queue.popleft()
+        except IndexError:
+            return self._owner._steal_for(self)
+
+    def _drain(self):
+        """Start the next available task, then give the loop a chance to run before taking another"""
+        item = self._next()
+        if item is None:
+            return
+
+        communicator, task, outcome, caller_loop = item
+        self.active += 1
+
+        def task_done(task_future):
+            self.active -= 1
+            caller_loop.add_callback(futures.copy_future, task_future, outcome)
+
+        with kiwipy.capture_exceptions(outcome):
+            self.loop.add_future(self.launcher(communicator, task), task_done)
+
+        self.loop.add_callback(self._drain)
+
+
+class ShardedProcessLauncher(object):
+    """
+    Takes incoming task messages and spreads them over a number of event loops, each running
+    in its own thread, so that the processes of one worker are not confined to a single loop.
+
+    Continue tasks are assigned to a shard by hashing the process id, other tasks go to the
+    least loaded shard.  Each shard has its own :class:`ProcessLauncher` and a shard that runs
+    out of queued tasks will steal tasks that are still waiting in the queue of a busier one.
+
+    The launcher is used like a :class:`ProcessLauncher` i.e. it is added as a task subscriber
+    to a communicator.  If the load context contains a communicator, continued processes will
+    wrap it for the loop of their shard so that RPC messages are delivered on the right loop.
+    """
+
+    def __init__(self, num_shards, persister=None, load_context=None, loader=None):
+        """
+        :param num_shards: the number of event loops (and threads) to spread the processes over
+        :param persister: the persister used to load and save processes
+        :param load_context: the load context, the loop will be set for each shard
+        :type load_context: :class:`plumpy.LoadSaveContext`
+        :param loader: the object loader
+        """
+        if num_shards < 1:
+            raise ValueError('the number of shards has to be at least one')
+
+        load_context = load_context if load_context is not None else persistence.LoadSaveContext()
+
+        self._shards = []
+        for index in range(num_shards):
+            loop = ioloop.IOLoop(make_current=False)
+            launcher = ProcessLauncher(
+                loop=loop, persister=persister, load_context=load_context.copyextend(loop=loop), loader=loader)
+            self._shards.append(_Shard(index, self, loop, launcher))
+
+        for shard in self._shards:
+            shard.start()
+
+    @property
+    def shards(self):
+        return tuple(self._shards)
+
+    def close(self):
+        """Stop all the shard event loops and wait for their threads to finish"""
+        for shard in self._shards:
+            shard.stop()
+
+    def __call__(self, communicator, task):
+        """
+        Receive a task.  It will be carried out on one of the shards and the returned future
+        will resolve, on the calling loop, to the outcome of the task.
+
+        :param task: The task message
+        :return: a future representing the outcome of the task
+        :rtype: :class:`plumpy.Future`
+        """
+        if task[TASK_KEY] not in (LAUNCH_TASK, CONTINUE_TASK, CREATE_TASK):
+            raise communications.TaskRejected
+
+        return self._submit(self._select_shard(task), communicator, task)
+
+    def _select_shard(self, task):
+        if task[TASK_KEY] == CONTINUE_TASK:
+            pid = task.get(TASK_ARGS, {}).get(PID_KEY)
+            return self._shards[hash(pid) % len(self._shards)]
+
+        return min(self._shards, key=lambda shard: shard.load)
+
+    def _submit(self, shard, communicator, task):
+        outcome = futures.Future()
+        shard.put((communicator, task, outcome, ioloop.IOLoop.current()))
+
+        # Make sure that any shard that has nothing to do gets a chance to steal the task
+        for other in self._shards:
+            if other is not shard and other.load == 0:
+                other.wake()
+
+        return outcome
+
+    def _steal_for(self, thief):
+        """Take a queued task from the busiest shard other than the thief, returns None if there is none"""
+        victims = sorted((shard for shard in self._shards if shard is not thief),
+                         key=lambda shard: shard.pending,
+                         reverse=True)
+        for victim in victims:
+            item = victim.steal()
+            if item is not None:
+                _LOGGER.debug('shard %d stole a task from shard %d', thief.index, victim.index)
+                return item
+
+        return None
@@ -68,6 +68,19 @@ class ProcessListener(with_metaclass(ABCMeta, object)):
         """
         pass
 
+    def on_outputs_emitted(self, process, outputs):
+        """
+        Called when the process has emitted a batch of output values, by default this calls
+        :meth:`on_output_emitted` for each of them
+
+        :param process: The process
+        :type process: :class:`plumpy.Process`
+        :param outputs: The output ports, values and whether the ports are dynamic
+        :type outputs: list
+        """
+        for output_port, value, dynamic in outputs:
+            self.on_output_emitted(process, output_port, value, dynamic)
+
     def on_process_finished(self, process, outputs):
         """
         Called when the process has finished successfully
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 import collections
+import functools
 import json
 import logging
 
@@ -34,6 +35,12 @@ class ProcessSpec(object):
         self._ports.create_port_namespace(self.NAME_OUTPUTS_PORT_NAMESPACE)
         self._exposed_inputs = collections.defaultdict(lambda: collections.defaultdict(list))
         self._exposed_outputs = collections.defaultdict(lambda: collections.defaultdict(list))
+        # Validators and input parsers compiled once the spec is sealed, see get_port_validator
+        self._validators = {}
+        self._dynamic_validators = {}
+        self._input_parsers = {}
+        self._resolved_outputs = {}
+        self._output_checks = {}
 
     def __str__(self):
         return json.dumps(self.get_description(), sort_keys=True, indent=4)
@@ -48,9 +55,13 @@ class ProcessSpec(object):
 
     def seal(self):
         """
-        Seal this specification disallowing any further changes
+        Seal this specification disallowing any further changes, its ports are frozen
         """
+        if self._sealed:
+            # Each process instance seals its spec, only the first one has anything to do
+            return
         self._sealed = True
+        self._ports.freeze()
 
     @property
     def sealed(self):
@@ -171,6 +182,100 @@ class ProcessSpec(object):
         """
         return name in self.outputs
 
+    def get_port_validator(self, port):
+        """
+        Get the function that validates values for a port, or port namespace, of this specification.
+        Once the spec is sealed this is the validation of the port compiled by
+        :func:`plumpy.ports.compile_validator`, before that it is the `validate` method of the port.
+
+        :param port: the port or port namespace
+        :return: a function that takes the value and returns valid or not and the error string or None
+        """
+        if not self._sealed:
+            return port.validate
+        return ports.compile_validator(port, self._validators)
+
+    def get_dynamic_validator(self, port_namespace):
+        """
+        Get the function that validates a value for a dynamic port of a port namespace of this
+        specification, see :meth:`get_port_validator`
+
+        :param port_namespace: the port namespace
+        :return: a function that takes the port name and the value and returns valid or not and the error string or None
+        """
+        if not self._sealed:
+            return lambda name, value: port_namespace.validate_dynamic_ports({name: value})
+        return self._get_compiled(self._dynamic_validators, port_namespace, ports.compile_dynamic_validator)
+
+    def get_input_parser(self, port_namespace):
+        """
+        Get the function that matches inputs to the ports of a port namespace of this specification,
+        filling in the defaults, see :func:`plumpy.ports.compile_input_parser`.  It is compiled
+        once the spec is sealed and compiled afresh on each call before that.
+
+        :param port_namespace: the port namespace
+        :return: a function that takes the inputs and returns the parsed inputs
+        """
+        if not self._sealed:
+            return ports.compile_input_parser(port_namespace)
+        return self._get_compiled(self._input_parsers, port_namespace, ports.compile_input_parser)
+
+    def resolve_output(self, output_port):
+        """
+        Resolve the name of an output port, which may be namespaced, to the function that validates
+        values for it.  Once the spec is sealed the resolution is cached for each port.
+
+        :param output_port: the name of the output port
+        :return: the function that takes the value and returns valid or not and the error string or
+            None, and whether the port is a dynamic port of its namespace
+        :rtype: tuple
+        :raises: ValueError if a namespace of the port does not exist
+        """
+        try:
+            return self._resolved_outputs[output_port]
+        except KeyError:
+            pass
+
+        namespace = output_port.split(self.namespace_separator)
+        port_name = namespace.pop()
+
+        if namespace:
+            port_namespace = self.outputs.get_port(self.namespace_separator.join(namespace))
+        else:
+            port_namespace = self.outputs
+
+        try:
+            port = port_namespace[port_name]
+        except KeyError:
+            # Not cached as there is no end to the names of dynamic ports
+            return functools.partial(self.get_dynamic_validator(port_namespace), port_name), True
+
+        resolved = self.get_port_validator(port), False
+        if self._sealed:
+            self._resolved_outputs[output_port] = resolved
+        return resolved
+
+    def get_output_checks(self):
+        """
+        Get the checks of the output ports that remain to be done once all outputs have been emitted,
+        see :func:`plumpy.ports.compile_output_checks`.  These are only available once the spec is
+        sealed and as long as no nested output namespace has a validator.
+
+        :return: the checks or None
+        :rtype: :class:`plumpy.ports.OutputChecks`
+        """
+        if not self._sealed:
+            return None
+        return self._get_compiled(self._output_checks, self.outputs,
+                                  lambda outputs: ports.compile_output_checks(outputs, self._validators))
+
+    @staticmethod
+    def _get_compiled(cache, port, compile_port):
+        entry = cache.get(id(port), None)
+        if entry is None or entry[0] is not port:
+            entry = cache[id(port)] = (port, compile_port(port))
+        return entry[1]
+
     def validate_inputs(self, inputs=None):
         """
         Validate a dictionary of inputs according to the input port namespace of this specification
@@ -179,7 +284,39 @@ class ProcessSpec(object):
         :return: valid or not, error string|None
         :rtype: tuple(bool, str or None)
         """
-        return self.inputs.validate(inputs)
+        return self.get_port_validator(self.inputs)(inputs)
+
+    def validate_inputs_batch(self, inputs_iterable, executor=None, max_pending=256):
+        """
+        Validate many dictionaries of inputs according to the input port namespace of this specification.
+
+        The validation of the ports is compiled once for the whole batch and whether values of a
+        given type are instances of the valid type of a port is only checked once per type.  The
+        results are yielded as the inputs are consumed so that the inputs can be streamed, e.g.
+        from a generator.  If user validators are slow, for example because they do I/O, the
+        validation of each dictionary of inputs can be carried out by an executor such as a
+        :class:`concurrent.futures.ThreadPoolExecutor`.
+
+        :param inputs_iterable: an iterable of inputs dictionaries
+        :param executor: an optional executor to validate the inputs with
+        :param max_pending: the maximum number of inputs dictionaries submitted to the executor at a time
+        :return: a generator of valid or not, error string|None for each of the inputs in turn
+        """
+        validate = ports.compile_validator(self.inputs, type_checks={})
+
+        if executor is None:
+            for inputs in inputs_iterable:
+                yield validate(inputs)
+            return
+
+        pending = collections.deque()
+        for inputs in inputs_iterable:
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+            pending.append(executor.submit(validate, inputs))
+
+        while pending:
+            yield pending.popleft().result()
 
     def validate_outputs(self, outputs=None):
         """
@@ -189,7 +326,7 @@ class ProcessSpec(object):
         :return: valid or not, error string|None
         :rtype: tuple(bool, str or None)
         """
-        return self.outputs.validate(outputs)
+        return self.get_port_validator(self.outputs)(outputs)
 
     def expose_inputs(self, process_class, namespace=None, exclude=(), include=None, namespace_options={}):
         """
@@ -18,6 +18,7 @@ from . import futures
 from .base import state_machine
 from . import persistence
 from .persistence import auto_persist
+from . import timers
 from . import utils
 from . import exceptions
 
@@ -56,31 +57,53 @@ class PauseInterruption(Interruption):
 
 
 class Command(persistence.Savable):
-    pass
+    __slots__ = ()
 
 
 @auto_persist('msg')
 class Kill(Command):
+    __slots__ = ('msg',)
 
     def __init__(self, msg=None):
         self.msg = msg
 
 
 class Pause(Command):
-    pass
+    __slots__ = ()
 
 
 @auto_persist('msg', 'data')
 class Wait(Command):
+    __slots__ = ('continue_fn', 'msg', 'data', 'deadline')
+
+    DEADLINE = 'deadline'
 
-    def __init__(self, continue_fn=None, msg=None, data=None):
+    def __init__(self, continue_fn=None, msg=None, data=None, deadline=None):
+        """
+        :param continue_fn: the function to call once done waiting
+        :param msg: an optional message
+        :param data: optional data for the waiting state
+        :param deadline: an optional absolute time, as given by :func:`time.time`, at which to stop
+            waiting and carry on without a value if the process has not been resumed by then
+        """
         self.continue_fn = continue_fn
         self.msg = msg
         self.data = data
+        self.deadline = deadline
+
+    def save_instance_state(self, out_state, save_context):
+        super(Wait, self).save_instance_state(out_state, save_context)
+        if self.deadline is not None:
+            out_state[self.DEADLINE] = self.deadline
+
+    def load_instance_state(self, saved_state, load_context):
+        super(Wait, self).load_instance_state(saved_state, load_context)
+        self.deadline = saved_state.get(self.DEADLINE, None)
 
 
 @auto_persist('result')
 class Stop(Command):
+    __slots__ = ('result', 'successful')
 
     def __init__(self, result, successful):
         self.result = result
@@ -89,6 +112,8 @@ class Stop(Command):
 
 @auto_persist('args', 'kwargs')
 class Continue(Command):
+    __slots__ = ('continue_fn', 'args', 'kwargs')
+
     CONTINUE_FN = 'continue_fn'
 
     def __init__(self, continue_fn, *args, **kwargs):
@@ -128,6 +153,7 @@ class ProcessState(Enum):
 
 @auto_persist('in_state')
 class State(state_machine.State, persistence.Savable):
+    __slots__ = ()
 
     @property
     def process(self):
@@ -147,6 +173,8 @@ class State(state_machine.State, persistence.Savable):
 
 @auto_persist('args', 'kwargs')
 class Created(State):
+    __slots__ = ('run_fn', 'args', 'kwargs')
+
     LABEL = ProcessState.CREATED
     ALLOWED = {ProcessState.RUNNING, ProcessState.KILLED, ProcessState.EXCEPTED}
 
@@ -173,6 +201,8 @@ class Created(State):
 
 @auto_persist('args', 'kwargs')
 class Running(State):
+    __slots__ = ('run_fn', 'args', 'kwargs', '_command', '_running', '_run_handle')
+
     LABEL = ProcessState.RUNNING
     ALLOWED = {
         ProcessState.RUNNING, ProcessState.WAITING, ProcessState.FINISHED, ProcessState.KILLED, ProcessState.EXCEPTED
@@ -181,17 +211,14 @@ class Running(State):
     RUN_FN = 'run_fn'  # The key used to store the function to run
     COMMAND = 'command'  # The key used to store an upcoming command
 
-    # Class level defaults
-    _command = None
-    _running = False
-    _run_handle = None
-
     def __init__(self, process, run_fn, *args, **kwargs):
         super(Running, self).__init__(process)
         assert run_fn is not None
         self.run_fn = run_fn
         self.args = args
         self.kwargs = kwargs
+        self._command = None
+        self._running = False
         self._run_handle = None
 
     def save_instance_state(self, out_state, save_context):
@@ -205,6 +232,10 @@ class Running(State):
         self.run_fn = getattr(self.process, saved_state[self.RUN_FN])
         if self.COMMAND in saved_state:
             self._command = persistence.Savable.load(saved_state[self.COMMAND], load_context)
+        else:
+            self._command = None
+        self._running = False
+        self._run_handle = None
 
     def interrupt(self, reason):
         return False
@@ -247,6 +278,9 @@ class Running(State):
         elif isinstance(command, Stop):
             return self.create_state(ProcessState.FINISHED, command.result, command.successful)
         elif isinstance(command, Wait):
+            if command.deadline is not None:
+                return self.create_state(
+                    ProcessState.WAITING, command.continue_fn, command.msg, command.data, deadline=command.deadline)
             return self.create_state(ProcessState.WAITING, command.continue_fn, command.msg, command.data)
         elif isinstance(command, Continue):
             return self.create_state(ProcessState.RUNNING, command.continue_fn, *command.args)
@@ -256,14 +290,15 @@ class Running(State):
 
 @auto_persist('msg', 'data')
 class Waiting(State):
+    __slots__ = ('done_callback', 'msg', 'data', 'deadline', '_waiting_future', '_timer')
+
     LABEL = ProcessState.WAITING
     ALLOWED = {
         ProcessState.RUNNING, ProcessState.WAITING, ProcessState.KILLED, ProcessState.EXCEPTED, ProcessState.FINISHED
     }
 
     DONE_CALLBACK = 'DONE_CALLBACK'
-
-    _interruption = None
+    DEADLINE = 'deadline'
 
     def __str__(self):
         state_info = super(Waiting, self).__str__()
@@ -271,17 +306,21 @@ class Waiting(State):
             state_info += " ({})".format(self.msg)
         return state_info
 
-    def __init__(self, process, done_callback, msg=None, data=None):
+    def __init__(self, process, done_callback, msg=None, data=None, deadline=None):
         super(Waiting, self).__init__(process)
         self.done_callback = done_callback
         self.msg = msg
         self.data = data
+        self.deadline = deadline
         self._waiting_future = futures.Future()
+        self._timer = None
 
     def save_instance_state(self, out_state, save_context):
         super(Waiting, self).save_instance_state(out_state, save_context)
         if self.done_callback is not None:
             out_state[self.DONE_CALLBACK] = self.done_callback.__name__
+        if self.deadline is not None:
+            out_state[self.DEADLINE] = self.deadline
 
     def load_instance_state(self, saved_state, load_context):
         super(Waiting, self).load_instance_state(saved_state, load_context)
@@ -290,7 +329,17 @@ class Waiting(State):
             self.done_callback = getattr(self.process, callback_name)
         else:
             self.done_callback = None
+        self.deadline = saved_state.get(self.DEADLINE, None)
         self._waiting_future = futures.Future()
+        self._timer = None
+
+    def enter(self):
+        super(Waiting, self).enter()
+        self._arm()
+
+    def exit(self):
+        super(Waiting, self).exit()
+        self._disarm()
 
     def interrupt(self, reason):
         # This will cause the future in execute() to raise the exception
@@ -298,6 +347,9 @@ class Waiting(State):
 
     @coroutine
     def execute(self):
+        if not self._waiting_future.done():
+            # A loaded state isn't entered again, so it starts to count down to the deadline once it is executed
+            self._arm()
         try:
             result = yield self._waiting_future
         except Interruption:
@@ -318,8 +370,46 @@ class Waiting(State):
         assert self._waiting_future is not None, "Not yet waiting"
         self._waiting_future.set_result(value)
 
+    def detach(self):
+        """
+        Let go of anything that is being waited on that cannot be saved, so the process can be
+        saved and dropped from memory.  Used when hibernating the process.
+
+        :return: the live awaitables that have to be handed back to :meth:`attach` once reloaded
+        """
+        if self.deadline is None:
+            return ()
+
+        # The deadline is saved with the state, but whoever holds on to the awaitables should know about it
+        self._disarm()
+        return (timers.get_timer_wheel(self.process.loop()).future_at(self.deadline),)
+
+    def attach(self, awaitables):
+        """
+        Pick up waiting on the awaitables returned by :meth:`detach` after the process has been reloaded
+
+        :param awaitables: the awaitables
+        """
+        pass
+
+    def _arm(self):
+        if self.deadline is not None and self._timer is None:
+            self._timer = timers.get_timer_wheel(self.process.loop()).call_at(self.deadline, self._deadline_reached)
+
+    def _disarm(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _deadline_reached(self):
+        self._timer = None
+        if not self._waiting_future.done():
+            self._waiting_future.set_result(NULL)
+
 
 class Excepted(State):
+    __slots__ = ('exception', 'traceback')
+
     LABEL = ProcessState.EXCEPTED
 
     EXC_VALUE = 'ex_value'
@@ -368,6 +458,8 @@ class Excepted(State):
 
 @auto_persist('result', 'successful')
 class Finished(State):
+    __slots__ = ('result', 'successful')
+
     LABEL = ProcessState.FINISHED
 
     def __init__(self, process, result, successful):
@@ -378,6 +470,8 @@ class Finished(State):
 
 @auto_persist('msg')
 class Killed(State):
+    __slots__ = ('msg',)
+
     LABEL = ProcessState.KILLED
 
     def __init__(self, process, msg):
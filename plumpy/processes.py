@@ -11,6 +11,7 @@ import time
 import sys
 import threading
 import uuid
+import weakref
 
 from future.utils import with_metaclass, raise_
 from pika.exceptions import ConnectionClosed
@@ -34,6 +35,7 @@ from . import persistence
 from . import process_comms
 from . import process_states
 from . import ports
+from . import scheduling
 from . import utils
 
 __all__ = ['Process', 'ProcessSpec', 'BundleKeys', 'TransitionFailed']
@@ -56,6 +58,20 @@ class BundleKeys(object):
 # Use thread-local storage for the stack
 _thread_local = threading.local()  # pylint_ disable=invalid-name
 
+# The futures of the processes that were created or loaded in this interpreter, by pid
+_FUTURES = weakref.WeakValueDictionary()
+
+
+def get_process_future(pid):
+    """
+    Get the future of a process that was created or loaded in this interpreter and is still around
+
+    :param pid: the pid of the process
+    :return: the future of the process
+    :raises KeyError: if there is no such process
+    """
+    return _FUTURES[pid]
+
 
 def _process_stack():
     """Access the private live stack"""
@@ -117,12 +133,40 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
 
     # Static class stuff ######################
     _spec_type = ProcessSpec
+    STATE_EVENT_METHODS = {
+        state_machine.StateEventHook.ENTERING_STATE: 'on_entering',
+        state_machine.StateEventHook.ENTERED_STATE: 'on_entered',
+        state_machine.StateEventHook.EXITING_STATE: '_on_exiting_state',
+    }
+    # The messages a process gets when entering, having entered and exiting a state
+    _ENTERING_MESSAGES = {
+        process_states.ProcessState.CREATED: lambda self, state: call_with_super_check(self.on_create),
+        process_states.ProcessState.RUNNING: lambda self, state: call_with_super_check(self.on_run),
+        process_states.ProcessState.WAITING: lambda self, state: call_with_super_check(self.on_wait, state.data),
+        process_states.ProcessState.FINISHED:
+            lambda self, state: call_with_super_check(self.on_finish, state.result, state.successful),
+        process_states.ProcessState.KILLED: lambda self, state: call_with_super_check(self.on_kill, state.msg),
+        process_states.ProcessState.EXCEPTED:
+            lambda self, state: call_with_super_check(self.on_except, state.get_exc_info()),
+    }
+    _ENTERED_MESSAGES = {
+        process_states.ProcessState.RUNNING: 'on_running',
+        process_states.ProcessState.WAITING: 'on_waiting',
+        process_states.ProcessState.FINISHED: 'on_finished',
+        process_states.ProcessState.EXCEPTED: 'on_excepted',
+        process_states.ProcessState.KILLED: 'on_killed',
+    }
+    _EXITING_MESSAGES = {
+        process_states.ProcessState.WAITING: 'on_exit_waiting',
+        process_states.ProcessState.RUNNING: 'on_exit_running',
+    }
     # Default placeholders, will be populated in init()
     _stepping = False
     _pausing = None  # type: futures.Future
     _paused = None
     _killing = None
     _interrupt_action = None
+    _emitting_batch = False
 
     @classmethod
     def current(cls):
@@ -154,8 +198,9 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
     @classmethod
     def spec(cls):
         try:
-            return cls.__getattribute__(cls, '_spec')
-        except AttributeError:
+            # The spec of this very class, each class builds its own when it is first asked for it
+            return cls.__dict__['_spec']
+        except KeyError:
             cls._spec = cls._spec_type()
             cls.__called = False
             cls.define(cls._spec)
@@ -230,8 +275,6 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
 
         self._loop = loop if loop is not None else events.get_event_loop()
 
-        self._setup_event_hooks()
-
         self._status = None  # May hold a current status message
         self._pre_paused_status = None  # Save status when a pause message replaces it, such that it can be restored
         self._paused = None
@@ -241,12 +284,15 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
         self._pid = pid
         self._parsed_inputs = None
         self._outputs = {}
+        # The bitmap of the emitted outputs and the number of outputs it is for, see ProcessSpec.get_output_checks
+        self._emitted_mask = 0
+        self._emitted_count = 0
         self._uuid = None
         self._CREATION_TIME = None
 
         # Runtime variables
         self._future = persistence.SavableFuture()
-        self.__event_helper = utils.EventHelper(ProcessListener)
+        self.__event_helper = None  # Created when the first listener is added
         self._logger = logger
         if communicator is None:
             self._communicator = None
@@ -257,25 +303,17 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
     @base.super_check
     def init(self):
         """ Any common initialisation stuff after create or load goes here """
+        _FUTURES[self.pid] = self._future
         if self._communicator is not None:
             self._communicator.add_rpc_subscriber(self.message_receive, identifier=str(self.pid))
 
         if not self._future.done():
+            self._future.add_done_callback(self._try_killing)
 
-            def try_killing(future):
-                if future.cancelled():
-                    if not self.kill('Killed by future being cancelled'):
-                        self.logger.warning("Failed to kill process on future cancel")
-
-            self._future.add_done_callback(try_killing)
-
-    def _setup_event_hooks(self):
-        self.add_state_event_callback(state_machine.StateEventHook.ENTERING_STATE,
-                                      lambda _s, _h, state: self.on_entering(state))
-        self.add_state_event_callback(state_machine.StateEventHook.ENTERED_STATE,
-                                      lambda _s, _h, from_state: self.on_entered(from_state))
-        self.add_state_event_callback(state_machine.StateEventHook.EXITING_STATE,
-                                      lambda _s, _h, _state: self.on_exiting())
+    def _try_killing(self, future):
+        if future.cancelled():
+            if not self.kill('Killed by future being cancelled'):
+                self.logger.warning("Failed to kill process on future cancel")
 
     @property
     def creation_time(self):
@@ -415,7 +453,11 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
         """
         args = (callback,) + args
         handle = events.ProcessCallback(self, self._run_task, args, kwargs)
-        self._loop.add_callback(handle.run)
+        scheduler = scheduling.get_scheduler(self._loop)
+        if scheduler is None:
+            self._loop.add_callback(handle.run)
+        else:
+            scheduler.call_soon(self, handle.run)
         return handle
 
     def call_soon_external(self, callback, *args, **kwargs):
@@ -493,11 +535,9 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
         # First make sure the state machine constructor is called
         super(Process, self).__init__()
 
-        self._setup_event_hooks()
-
         # Runtime variables, set initial states
         self._future = persistence.SavableFuture()
-        self.__event_helper = utils.EventHelper(ProcessListener)
+        self.__event_helper = None  # Created when the first listener is added
         self._logger = None
         self._communicator = None
 
@@ -536,15 +576,20 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
             self._outputs = decoded
         except KeyError:
             self._outputs = {}
+        self._emitted_mask = 0
+        self._emitted_count = 0
 
     # endregion
 
     def add_process_listener(self, listener):
         assert (listener != self), "Cannot listen to yourself!"
+        if self.__event_helper is None:
+            self.__event_helper = utils.EventHelper(ProcessListener)
         self.__event_helper.add_listener(listener)
 
     def remove_process_listener(self, listener):
-        self.__event_helper.remove_listener(listener)
+        if self.__event_helper is not None:
+            self.__event_helper.remove_listener(listener)
 
     @protected
     def set_logger(self, logger):
@@ -558,33 +603,15 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
 
     def on_entering(self, state):
         # Map these onto direct functions that the subclass can implement
-        state_label = state.LABEL
-        if state_label == process_states.ProcessState.CREATED:
-            call_with_super_check(self.on_create)
-        elif state_label == process_states.ProcessState.RUNNING:
-            call_with_super_check(self.on_run)
-        elif state_label == process_states.ProcessState.WAITING:
-            call_with_super_check(self.on_wait, state.data)
-        elif state_label == process_states.ProcessState.FINISHED:
-            call_with_super_check(self.on_finish, state.result, state.successful)
-        elif state_label == process_states.ProcessState.KILLED:
-            call_with_super_check(self.on_kill, state.msg)
-        elif state_label == process_states.ProcessState.EXCEPTED:
-            call_with_super_check(self.on_except, state.get_exc_info())
+        message = self._ENTERING_MESSAGES.get(state.LABEL, None)
+        if message is not None:
+            message(self, state)
 
     def on_entered(self, from_state):
         # Map these onto direct functions that the subclass can implement
-        state_label = self._state.LABEL
-        if state_label == process_states.ProcessState.RUNNING:
-            call_with_super_check(self.on_running)
-        elif state_label == process_states.ProcessState.WAITING:
-            call_with_super_check(self.on_waiting)
-        elif state_label == process_states.ProcessState.FINISHED:
-            call_with_super_check(self.on_finished)
-        elif state_label == process_states.ProcessState.EXCEPTED:
-            call_with_super_check(self.on_excepted)
-        elif state_label == process_states.ProcessState.KILLED:
-            call_with_super_check(self.on_killed)
+        message = self._ENTERED_MESSAGES.get(self._state.LABEL, None)
+        if message is not None:
+            call_with_super_check(getattr(self, message))
 
         if self._communicator:
             from_label = from_state.LABEL.value if from_state is not None else None
@@ -595,12 +622,13 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
                 self.logger.info('no connection available to broadcast state change from {} to {}'.format(
                     from_label, self.state.value))
 
+    def _on_exiting_state(self, _next_state):
+        self.on_exiting()
+
     def on_exiting(self):
-        state = self.state
-        if state == process_states.ProcessState.WAITING:
-            call_with_super_check(self.on_exit_waiting)
-        elif state == process_states.ProcessState.RUNNING:
-            call_with_super_check(self.on_exit_running)
+        message = self._EXITING_MESSAGES.get(self._state.LABEL, None)
+        if message is not None:
+            call_with_super_check(getattr(self, message))
 
     @super_check
     def on_create(self):
@@ -639,7 +667,26 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
         pass
 
     def on_output_emitted(self, output_port, value, dynamic):
-        self.__event_helper.fire_event(ProcessListener.on_output_emitted, self, output_port, value, dynamic)
+        if not self._emitting_batch:
+            self._fire_event(ProcessListener.on_output_emitted, output_port, value, dynamic)
+
+    def on_outputs_emitted(self, outputs):
+        """
+        Called once for a batch of outputs recorded by :meth:`out_many`.  Subclasses that override
+        :meth:`on_output_emitted` still get to see the outputs one by one, listeners are notified of
+        the whole batch at once either way.
+
+        :param outputs: a list of tuples of the output port, the value and whether the port is dynamic
+        """
+        method = type(self).on_output_emitted
+        if getattr(method, '__func__', method) is not Process.__dict__['on_output_emitted']:
+            self._emitting_batch = True
+            try:
+                for output_port, value, dynamic in outputs:
+                    self.on_output_emitted(output_port, value, dynamic)
+            finally:
+                del self._emitting_batch
+        self._fire_event(ProcessListener.on_outputs_emitted, outputs)
 
     @super_check
     def on_wait(self, awaitables):
@@ -718,7 +765,8 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
         self._fire_event(ProcessListener.on_process_killed, self.killed_msg())
 
     def _fire_event(self, evt, *args, **kwargs):
-        self.__event_helper.fire_event(evt, self, *args, **kwargs)
+        if self.__event_helper is not None:
+            self.__event_helper.fire_event(evt, self, *args, **kwargs)
 
     # endregion
 
@@ -734,6 +782,20 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
         """
         self.logger.debug("Message '%s' received with communicator '%s'", msg, _comm)
 
+        scheduler = scheduling.get_scheduler(self._loop)
+        if scheduler is None:
+            result = self._act_on_message(msg)
+        else:
+            # Control messages skip the queue of scheduled process work
+            result = yield scheduler.run_control(self._act_on_message, msg)
+
+        if concurrent.is_future(result):
+            # Wait for the process to actually finish
+            result = yield result
+
+        raise gen.Return(result)
+
+    def _act_on_message(self, msg):
         intent = msg[process_comms.INTENT_KEY]
 
         if intent == process_comms.Intent.PLAY:
@@ -749,11 +811,7 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
         else:
             raise RuntimeError("Unknown intent")
 
-        if concurrent.is_future(result):
-            # Wait for the process to actually finish
-            result = yield result
-
-        raise gen.Return(result)
+        return result
 
     def close(self):
         """
@@ -993,7 +1051,12 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
     @gen.coroutine
     def step_until_terminated(self):
         while not self.has_terminated():
-            yield self.step()
+            scheduler = scheduling.get_scheduler(self._loop)
+            if scheduler is None:
+                yield self.step()
+            else:
+                # The process may have been terminated, e.g. killed, while the step was waiting for its turn
+                yield scheduler.run(self, lambda: None if self.has_terminated() else self.step())
 
     # endregion
 
@@ -1011,31 +1074,49 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
         """
         self.on_output_emitting(output_port, value)
 
-        namespace_separator = self.spec().namespace_separator
-
-        namespace = output_port.split(namespace_separator)
-        port_name = namespace.pop()
-
-        if namespace:
-            port_namespace = self.spec().outputs.get_port(namespace_separator.join(namespace))
-        else:
-            port_namespace = self.spec().outputs
-
-        try:
-            port = port_namespace[port_name]
-            dynamic = False
-            is_valid, message = port.validate(value)
-        except KeyError:
-            port = port_namespace
-            dynamic = True
-            is_valid, message = port.validate_dynamic_ports({port_name: value})
-
+        validate, dynamic = self.spec().resolve_output(output_port)
+        is_valid, message = validate(value)
         if not is_valid:
             raise TypeError(message)
 
-        self._outputs[output_port] = value
+        self._record_output(output_port, value)
         self.on_output_emitted(output_port, value, dynamic)
 
+    @protected
+    def out_many(self, outputs):
+        """
+        Record a batch of output values.  All of the values are validated before any of them is
+        recorded, so either all or none of them are, and listeners are notified of the whole batch
+        at once, see :meth:`on_outputs_emitted`.
+
+        :param outputs: a mapping of the names of the output ports, can be namespaced, to the values
+        :raises: TypeError if any of the output values is not validated against its port
+        """
+        spec = self.spec()
+        emitted = []
+        for output_port, value in outputs.items():
+            validate, dynamic = spec.resolve_output(output_port)
+            is_valid, message = validate(value)
+            if not is_valid:
+                raise TypeError(message)
+            emitted.append((output_port, value, dynamic))
+
+        # Only once the whole batch is known to be valid
+        for output_port, value, _ in emitted:
+            self.on_output_emitting(output_port, value)
+
+        for output_port, value, _ in emitted:
+            self._record_output(output_port, value)
+        self.on_outputs_emitted(emitted)
+
+    def _record_output(self, output_port, value):
+        checks = self.spec().get_output_checks()
+        if checks is not None:
+            if output_port not in self._outputs:
+                self._emitted_count += 1
+            self._emitted_mask |= checks.mask(output_port)
+        self._outputs[output_port] = value
+
     @protected
     def create_input_args(self, port_namespace, inputs):
         """
@@ -1048,6 +1129,11 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
         :return: an AttributesFrozenDict with the inputs, complemented with port default values
         :raises: ValueError if no input was specified for a required port without a default value
         """
+        method = type(self).create_input_args
+        if getattr(method, '__func__', method) is Process.__dict__['create_input_args']:
+            return self.spec().get_input_parser(port_namespace)(inputs)
+
+        # Overridden, in which case the override has to be called for each nested namespace
         result = dict(inputs)
         for name, port in port_namespace.items():
 
@@ -1111,8 +1197,20 @@ class Process(with_metaclass(ProcessStateMachineMeta, StateMachine, persistence.
 
     def _check_outputs(self):
         # Check that the necessary outputs have been emitted
-        wrapped = utils.wrap_dict(self._outputs, separator=self.spec().namespace_separator)
-        for name, port in self.spec().outputs.items():
-            valid, msg = port.validate(wrapped.get(name, ports.UNSPECIFIED))
+        spec = self.spec()
+        checks = spec.get_output_checks()
+        if checks is not None:
+            if self._emitted_count != len(self._outputs):
+                # Some outputs were not recorded by out(), e.g. they were loaded from a saved state
+                self._emitted_mask = checks.emitted(self._outputs)
+                self._emitted_count = len(self._outputs)
+            valid, msg = checks.check(self._emitted_mask)
+            if not valid:
+                raise ValueError(msg)
+            return
+
+        wrapped = utils.wrap_dict(self._outputs, separator=spec.namespace_separator)
+        for name, port in spec.outputs.items():
+            valid, msg = spec.get_port_validator(port)(wrapped.get(name, ports.UNSPECIFIED))
             if not valid:
                 raise ValueError(msg)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Reducers that fold the results of awaited children into an accumulator as they arrive, see
+:func:`plumpy.reduce_` and :func:`plumpy.map_`.
+
+A reducer is any callable that takes the accumulator and a result and returns the new accumulator.
+As they are saved along with the work chain waiting on the children, reducers should be picklable,
+i.e. module level functions or instances of module level classes such as the ones here.
+"""
+
+from __future__ import absolute_import
+import bisect
+
+__all__ = ['Sum', 'Histogram', 'TopK']
+
+
+class _Reducer(object):
+    """Base for reducers that can pick a single output from the results of child processes"""
+
+    def __init__(self, output=None):
+        """
+        :param output: the name of the output to reduce, if None the whole result is used
+        """
+        self._output = output
+
+    def _value(self, result):
+        if self._output is None:
+            return result
+        return result[self._output]
+
+
+class Sum(_Reducer):
+    """Sum the results, use with an initial value of zero"""
+
+    def __call__(self, accumulator, result):
+        return accumulator + self._value(result)
+
+
+class Histogram(_Reducer):
+    """Count the results in bins of a given width, the accumulator is a dictionary of bin index to count"""
+
+    def __init__(self, bin_width, output=None):
+        super(Histogram, self).__init__(output)
+        self._bin_width = bin_width
+
+    def __call__(self, accumulator, result):
+        if accumulator is None:
+            accumulator = {}
+        bin_index = int(self._value(result) // self._bin_width)
+        accumulator[bin_index] = accumulator.get(bin_index, 0) + 1
+        return accumulator
+
+
+class TopK(_Reducer):
+    """Keep the largest k results in ascending order, the accumulator is a list"""
+
+    def __init__(self, k, output=None):
+        super(TopK, self).__init__(output)
+        if k < 1:
+            raise ValueError('k has to be at least one')
+        self._k = k
+
+    def __call__(self, accumulator, result):
+        if accumulator is None:
+            accumulator = []
+        value = self._value(result)
+        if len(accumulator) < self._k:
+            bisect.insort(accumulator, value)
+        elif value > accumulator[0]:
+            accumulator.pop(0)
+            bisect.insort(accumulator, value)
+        return accumulator
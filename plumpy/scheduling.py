@@ -0,0 +1,268 @@
+"""
+An optional scheduler that decides the order in which the work of processes sharing an event loop
+is carried out.
+
+Without a scheduler every step and callback of every process is simply put at the back of the
+event loop's callback queue.  Once a :class:`Scheduler` is installed on a loop, the processes on
+that loop hand their steps and callbacks to it instead and it feeds them to the loop in small
+batches, choosing what goes next by:
+
+* lane: control work (e.g. acting on kill, pause, play and status messages) always goes first
+* priority: work of processes with a higher priority goes before that of lower priority ones
+* fair share: processes of the same priority get a share of the loop that is proportional to the
+  weight of their class, regardless of how many of them are runnable
+"""
+
+from __future__ import absolute_import
+import collections
+import logging
+import sys
+import weakref
+
+from tornado import concurrent, ioloop
+
+from . import futures
+
+__all__ = ['Scheduler', 'get_scheduler']
+
+_LOGGER = logging.getLogger(__name__)
+
+# The schedulers that are installed, keyed on their event loop
+_SCHEDULERS = weakref.WeakKeyDictionary()
+
+
+def get_scheduler(loop=None):
+    """
+    Get the scheduler installed on an event loop
+
+    :param loop: the event loop, defaults to the current one
+    :type loop: :class:`tornado.ioloop.IOLoop`
+    :return: the scheduler or None if the loop has none installed
+    :rtype: :class:`Scheduler`
+    """
+    if loop is None:
+        loop = ioloop.IOLoop.current()
+    return _SCHEDULERS.get(loop, None)
+
+
+class Scheduler(object):
+    """
+    Schedules the work of processes that run on an event loop.
+
+    Work is run from a single loop callback that runs up to `batch_size` items before giving the
+    loop back, so the latency of anything else on the loop, including incoming messages, is bounded
+    by a batch rather than by the number of runnable processes.  Control work is checked for before
+    each item.
+    """
+
+    DEFAULT_PRIORITY = 0
+    DEFAULT_WEIGHT = 1.
+
+    def __init__(self, loop=None, batch_size=64):
+        """
+        :param loop: the event loop to schedule work on, defaults to the current one
+        :type loop: :class:`tornado.ioloop.IOLoop`
+        :param batch_size: the maximum number of items run each time the scheduler gets the loop
+        :type batch_size: int
+        """
+        if batch_size < 1:
+            raise ValueError('The batch size has to be at least one')
+
+        self._loop = loop or ioloop.IOLoop.current()
+        self._batch_size = batch_size
+
+        self._control = collections.deque()
+        # priority -> process class -> deque of (callback, args, kwargs)
+        self._levels = {}
+        self._class_weights = {}
+        self._class_priorities = {}
+        self._process_priorities = weakref.WeakKeyDictionary()
+        # The virtual time of each class, which advances inversely proportional to its weight
+        self._class_times = {}
+        self._virtual_time = 0.
+        self._pending = 0
+        self._pumping = False
+
+    def loop(self):
+        return self._loop
+
+    @property
+    def pending(self):
+        """The number of items waiting to be run, not counting control work"""
+        return self._pending
+
+    def install(self):
+        """Make this the scheduler used by processes running on its event loop"""
+        installed = _SCHEDULERS.get(self._loop, None)
+        if installed is not None and installed is not self:
+            raise RuntimeError('There already is a scheduler installed on the loop')
+        _SCHEDULERS[self._loop] = self
+
+    def uninstall(self):
+        """
+        Stop processes from using this scheduler.  Work that has already been scheduled will still be run.
+        """
+        if _SCHEDULERS.get(self._loop, None) is self:
+            del _SCHEDULERS[self._loop]
+
+    def set_priority(self, process_or_class, priority):
+        """
+        Set the priority of a process, or of all processes of a class (including its subclasses)
+        that do not have a priority of their own.  Higher priorities are run first.
+
+        :param process_or_class: the process instance or class
+        :param priority: the priority
+        :type priority: int
+        """
+        if isinstance(process_or_class, type):
+            self._class_priorities[process_or_class] = priority
+        else:
+            self._process_priorities[process_or_class] = priority
+
+    def get_priority(self, process):
+        """
+        Get the priority that the work of a process is scheduled with
+
+        :param process: the process
+        :return: the priority
+        :rtype: int
+        """
+        try:
+            return self._process_priorities[process]
+        except KeyError:
+            pass
+
+        for cls in type(process).__mro__:
+            if cls in self._class_priorities:
+                return self._class_priorities[cls]
+
+        return self.DEFAULT_PRIORITY
+
+    def set_weight(self, process_class, weight):
+        """
+        Set the share of the loop the processes of a class get relative to the other classes of the same priority
+
+        :param process_class: the process class
+        :param weight: the weight, the default is one
+        :type weight: float
+        """
+        if weight <= 0:
+            raise ValueError('The weight has to be positive')
+        self._class_weights[process_class] = float(weight)
+
+    def call_soon(self, process, callback, *args, **kwargs):
+        """
+        Schedule a callback on behalf of a process
+
+        :param process: the process the work is for
+        :param callback: the callback
+        """
+        priority = self.get_priority(process)
+        process_class = type(process)
+        try:
+            queues = self._levels[priority]
+        except KeyError:
+            queues = self._levels[priority] = {}
+
+        try:
+            queue = queues[process_class]
+        except KeyError:
+            queue = queues[process_class] = collections.deque()
+            # A class that becomes runnable again should not be able to claim the time it was idle for
+            self._class_times[process_class] = max(self._class_times.get(process_class, 0.), self._virtual_time)
+
+        queue.append((callback, args, kwargs))
+        self._pending += 1
+        self._ensure_pumping()
+
+    def call_control(self, callback, *args, **kwargs):
+        """
+        Schedule a callback in the control lane, it will run before any other scheduled work
+
+        :param callback: the callback
+        """
+        self._control.append((callback, args, kwargs))
+        self._ensure_pumping()
+
+    def run(self, process, fn, *args, **kwargs):
+        """
+        Schedule a function or coroutine on behalf of a process
+
+        :param process: the process the work is for
+        :param fn: the function or coroutine
+        :return: a future that resolves to the outcome of the function
+        :rtype: :class:`plumpy.Future`
+        """
+        outcome = futures.Future()
+        self.call_soon(process, _run_into_future, outcome, fn, args, kwargs)
+        return outcome
+
+    def run_control(self, fn, *args, **kwargs):
+        """
+        Schedule a function or coroutine in the control lane
+
+        :param fn: the function or coroutine
+        :return: a future that resolves to the outcome of the function
+        :rtype: :class:`plumpy.Future`
+        """
+        outcome = futures.Future()
+        self.call_control(_run_into_future, outcome, fn, args, kwargs)
+        return outcome
+
+    def _ensure_pumping(self):
+        if not self._pumping:
+            self._pumping = True
+            self._loop.add_callback(self._pump)
+
+    def _pump(self):
+        try:
+            for _ in range(self._batch_size):
+                if self._control:
+                    callback, args, kwargs = self._control.popleft()
+                elif self._pending:
+                    callback, args, kwargs = self._pop_next()
+                else:
+                    break
+
+                try:
+                    callback(*args, **kwargs)
+                except Exception:  # pylint: disable=broad-except
+                    _LOGGER.exception('Exception in scheduled callback %s', callback)
+        finally:
+            if self._control or self._pending:
+                # Give the rest of the loop a go before carrying on
+                self._loop.add_callback(self._pump)
+            else:
+                self._pumping = False
+
+    def _pop_next(self):
+        priority = max(self._levels)
+        queues = self._levels[priority]
+
+        # Pick the class that is furthest behind in virtual time
+        process_class = min(queues, key=self._class_times.__getitem__)
+        queue = queues[process_class]
+        item = queue.popleft()
+        self._pending -= 1
+
+        self._virtual_time = self._class_times[process_class]
+        self._class_times[process_class] += 1. / self._class_weights.get(process_class, self.DEFAULT_WEIGHT)
+
+        if not queue:
+            del queues[process_class]
+            if not queues:
+                del self._levels[priority]
+
+        return item
+
+
+def _run_into_future(outcome, fn, args, kwargs):
+    try:
+        result = fn(*args, **kwargs)
+    except Exception:  # pylint: disable=broad-except
+        outcome.set_exc_info(sys.exc_info())
+    else:
+        if concurrent.is_future(result):
+            futures.chain(result, outcome)
+        else:
+            outcome.set_result(result)
@@ -1,2 +1,11 @@
+import os
+
 check_protected = False
 check_override = False
+# How to check that overrides of super checked methods call the superclass method:
+#  'runtime': count the calls each time (default)
+#  'class': analyse each class once, the first time the method is called on it.  This cannot spot
+#           super calls that are skipped conditionally or super checked methods that are called directly
+#  'off': don't check at all
+# This is read when plumpy is imported so it can also be set through the environment
+super_check_mode = os.environ.get('PLUMPY_SUPER_CHECK', 'runtime')
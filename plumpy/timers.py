@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+A timer service for processes that have to wait for a point in time.
+
+Deadlines are absolute times, as given by :func:`time.time`, so that they can be saved with a
+process and armed again when it is loaded, possibly by a different interpreter.  All the timers of
+an event loop live in a single hierarchical timing wheel, see :class:`TimerWheel`, so that there
+can be many of them pending at little cost.
+"""
+
+from __future__ import absolute_import
+import logging
+import math
+import time
+import weakref
+
+from tornado import ioloop
+
+from . import futures
+
+__all__ = ['TimerWheel', 'get_timer_wheel']
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _Timer(object):
+    """A pending timer, as returned by :meth:`TimerWheel.call_at`"""
+    __slots__ = ('tick', 'callback', 'args', '__weakref__')
+
+    def __init__(self, tick, callback, args):
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+
+    @property
+    def cancelled(self):
+        return self.callback is None
+
+    def cancel(self):
+        """Cancel the timer, this is a no-op if it has already fired"""
+        self.callback = None
+        self.args = None
+
+
+class TimerWheel(object):
+    """
+    A hierarchical timing wheel driven by an event loop.
+
+    Time is divided into ticks of a fixed resolution.  The first wheel has a slot for each of the
+    next few ticks, the next wheel a slot for each turn of the first wheel and so on, and timers
+    cascade down the wheels as their time approaches.  Adding and cancelling a timer take constant
+    time and, while timers are pending, the loop is woken at most once per turn of the first wheel
+    in which nothing is due.  Timers never fire early but may fire up to one tick late.
+    """
+
+    def __init__(self, loop=None, resolution=0.1, slots=64, levels=4):
+        """
+        :param loop: the event loop to run the timers on
+        :param resolution: the duration of a tick, in seconds
+        :param slots: the number of slots of each wheel
+        :param levels: the number of wheels
+        """
+        self._loop = loop or ioloop.IOLoop.current()
+        self._resolution = resolution
+        self._slots = slots
+        self._wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._origin = self._loop.time()
+        self._tick = 0  # The last tick that was processed
+        self._pending = 0
+        self._handle = None
+        self._handle_tick = None
+
+    def loop(self):
+        return self._loop
+
+    def __len__(self):
+        """The number of timers that are pending, including ones that were cancelled but are yet to be dropped"""
+        return self._pending
+
+    def call_at(self, deadline, callback, *args):
+        """
+        Call a function on the event loop once a point in time has been reached
+
+        :param deadline: the absolute time, as given by :func:`time.time`
+        :param callback: the function to call
+        :param args: the arguments to call it with
+        :return: the timer, which can be cancelled
+        """
+        if not self._pending:
+            # Nothing has been ticking while there were no timers, skip straight to now
+            self._tick = max(self._tick, self._current_tick())
+
+        loop_deadline = self._loop.time() + (deadline - time.time())
+        tick = max(int(math.ceil((loop_deadline - self._origin) / self._resolution)), self._tick + 1)
+        timer = _Timer(tick, callback, args)
+        self._insert(timer)
+        self._pending += 1
+        self._schedule()
+        return timer
+
+    def call_later(self, delay, callback, *args):
+        """
+        Call a function on the event loop after a delay
+
+        :param delay: the delay in seconds
+        """
+        return self.call_at(time.time() + delay, callback, *args)
+
+    def future_at(self, deadline):
+        """
+        Get a future that resolves, to None, once a point in time has been reached
+
+        :param deadline: the absolute time, as given by :func:`time.time`
+        :rtype: :class:`plumpy.Future`
+        """
+        future = futures.Future()
+        self.call_at(deadline, _resolve, future)
+        return future
+
+    def _insert(self, timer):
+        delta = timer.tick - self._tick
+        span = 1
+        for level, wheel in enumerate(self._wheels):
+            if delta < span * self._slots or level == len(self._wheels) - 1:
+                # Timers beyond the last wheel wait in it for as many turns as it takes
+                wheel[(timer.tick // span) % self._slots].append(timer)
+                return
+            span *= self._slots
+
+    def _schedule(self):
+        """Make sure the loop wakes up for the next tick on which something may be due"""
+        wake_tick = self._next_tick()
+        if wake_tick is None:
+            return
+        if self._handle is not None:
+            if self._handle_tick <= wake_tick:
+                return
+            self._loop.remove_timeout(self._handle)
+
+        self._handle_tick = wake_tick
+        self._handle = self._loop.call_at(self._origin + wake_tick * self._resolution, self._advance)
+
+    def _next_tick(self):
+        if not self._pending:
+            return None
+
+        # Either a tick of this turn of the first wheel, or the start of the next turn when the other wheels cascade
+        first = self._wheels[0]
+        boundary = (self._tick // self._slots + 1) * self._slots
+        for tick in range(self._tick + 1, boundary):
+            if first[tick % self._slots]:
+                return tick
+        return boundary
+
+    def _advance(self):
+        self._handle = None
+        self._handle_tick = None
+        now = self._current_tick()
+        while self._tick < now and self._pending:
+            self._tick += 1
+            self._cascade()
+            due = self._wheels[0][self._tick % self._slots]
+            if due:
+                self._wheels[0][self._tick % self._slots] = []
+                for timer in due:
+                    self._pending -= 1
+                    self._fire(timer)
+        if not self._pending:
+            # Nothing to catch up on, carry on from now
+            self._tick = max(self._tick, now)
+        self._schedule()
+
+    def _current_tick(self):
+        # Allow for rounding so that being woken for a tick is enough to process it
+        return int((self._loop.time() - self._origin) / self._resolution + 1e-6)
+
+    def _cascade(self):
+        span = 1
+        for level in range(1, len(self._wheels)):
+            span *= self._slots
+            if self._tick % span:
+                break
+            wheel = self._wheels[level]
+            slot = (self._tick // span) % self._slots
+            timers, wheel[slot] = wheel[slot], []
+            for timer in timers:
+                if timer.cancelled:
+                    self._pending -= 1
+                elif timer.tick <= self._tick:
+                    # Can happen after catching up on ticks
+                    self._wheels[0][self._tick % self._slots].append(timer)
+                else:
+                    self._insert(timer)
+
+    @staticmethod
+    def _fire(timer):
+        callback, args = timer.callback, timer.args
+        if callback is None:
+            return
+        timer.cancel()
+        try:
+            callback(*args)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception('Exception in timer callback %s', callback)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+_WHEELS = weakref.WeakKeyDictionary()
+
+
+def get_timer_wheel(loop=None):
+    """
+    Get the timer wheel of an event loop, creating it if need be
+
+    :param loop: the event loop, the current one if None
+    :rtype: :class:`TimerWheel`
+    """
+    loop = loop or ioloop.IOLoop.current()
+    try:
+        return _WHEELS[loop]
+    except KeyError:
+        wheel = _WHEELS[loop] = TimerWheel(loop)
+        return wheel
@@ -2,6 +2,7 @@
 
 from __future__ import absolute_import
 from collections import deque, defaultdict
+import functools
 import importlib
 import inspect
 import logging
@@ -9,6 +10,7 @@ import threading
 import tornado.gen
 
 import frozendict
+import six
 
 from . import lang
 from plumpy.settings import check_protected, check_override
@@ -24,6 +26,7 @@ _default_loop = None
 
 
 class EventHelper(object):
+    __slots__ = ('_listener_type', '_listeners')
 
     def __init__(self, listener_type):
         assert listener_type is not None, "Must provide valid listener type"
@@ -173,6 +176,145 @@ class AttributesDict(SimpleNamespace):
         return self.__dict__.get(*args, **kwargs)
 
 
+_IMMUTABLE_TYPES = (type(None), bool, float, complex, frozenset, bytes) + six.integer_types + six.string_types
+
+
+def _is_immutable(value):
+    if isinstance(value, tuple):
+        return all(_is_immutable(item) for item in value)
+    return isinstance(value, _IMMUTABLE_TYPES)
+
+
+class TrackedAttributesDict(AttributesDict):
+    """
+    An :class:`AttributesDict` that keeps track of the keys that were set or deleted since it was
+    last marked as saved, so that only what changed has to be written.  Changes to values that are
+    mutated in place are tracked if they are :class:`TrackedList` or :class:`TrackedDict` instances,
+    or if they are marked using :meth:`touch`.  Only changes to the tracked container itself are
+    tracked, not those to the values it contains.  Other mutable values are reported by
+    :meth:`get_untracked` as they have to be written every time.
+    """
+    __slots__ = ('_changed', '_deleted')
+
+    def __init__(self, **kwargs):
+        super(TrackedAttributesDict, self).__init__(**kwargs)
+        object.__setattr__(self, '_changed', set())
+        object.__setattr__(self, '_deleted', set())
+        for key, value in kwargs.items():
+            self._adopt(key, value)
+
+    def __setattr__(self, key, value):
+        super(TrackedAttributesDict, self).__setattr__(key, value)
+        self._adopt(key, value)
+        self._changed.add(key)
+        self._deleted.discard(key)
+
+    def __delattr__(self, key):
+        super(TrackedAttributesDict, self).__delattr__(key)
+        self._changed.discard(key)
+        self._deleted.add(key)
+
+    def setdefault(self, key, value):
+        if key not in self.__dict__:
+            self[key] = value
+        return self.__dict__[key]
+
+    def touch(self, key):
+        """
+        Mark a key as changed, e.g. because its value was mutated in place
+
+        :param key: the key
+        """
+        if key not in self.__dict__:
+            raise KeyError("No key '{}'".format(key))
+        self._changed.add(key)
+
+    def get_changes(self):
+        """
+        Get what changed since the last time this was marked as saved
+
+        :return: a dictionary of the keys that were set or changed with their values, and the set of deleted keys
+        :rtype: tuple
+        """
+        return {key: self.__dict__[key] for key in self._changed}, set(self._deleted)
+
+    def get_untracked(self):
+        """
+        Get the keys of the values that can be mutated in place without that being tracked, i.e. that
+        are neither immutable nor tracked containers.  Unless they are written every time changes to
+        them can be lost.
+
+        :return: the keys
+        :rtype: set
+        """
+        return {key for key, value in self.__dict__.items() if not self._is_tracked(value)}
+
+    def mark_saved(self):
+        """Forget about the changes so far, e.g. once they have been written"""
+        self._changed.clear()
+        self._deleted.clear()
+
+    def _is_tracked(self, value):
+        return isinstance(value, _Tracked) or _is_immutable(value)
+
+    def _adopt(self, key, value):
+        if isinstance(value, _Tracked):
+            value._on_change = functools.partial(self.touch, key)  # pylint: disable=protected-access
+
+
+class _Tracked(object):
+    """A container that tells its owner when it is mutated"""
+    __slots__ = ()
+
+    def _changed(self):
+        on_change = getattr(self, '_on_change', None)
+        if on_change is not None:
+            on_change()
+
+
+def _tracking(cls, base, names):
+    """Wrap the methods of a container that mutate it to notify the owner"""
+
+    def wrap(method):
+
+        def wrapped(self, *args, **kwargs):
+            result = method(self, *args, **kwargs)
+            self._changed()  # pylint: disable=protected-access
+            return result
+
+        wrapped.__name__ = method.__name__
+        wrapped.__doc__ = method.__doc__
+        return wrapped
+
+    for name in names:
+        if hasattr(base, name):
+            setattr(cls, name, wrap(getattr(base, name)))
+    return cls
+
+
+class TrackedList(_Tracked, list):
+    """A list that marks its key in a :class:`TrackedAttributesDict` as changed when it is mutated"""
+    __slots__ = ('_on_change',)
+
+    def __reduce_ex__(self, protocol):
+        # Don't take the owner along when pickled or copied
+        return self.__class__, (list(self),)
+
+
+class TrackedDict(_Tracked, dict):
+    """A dict that marks its key in a :class:`TrackedAttributesDict` as changed when it is mutated"""
+    __slots__ = ('_on_change',)
+
+    def __reduce_ex__(self, protocol):
+        # Don't take the owner along when pickled or copied
+        return self.__class__, (dict(self),)
+
+
+_tracking(TrackedList, list, ('__setitem__', '__delitem__', '__setslice__', '__delslice__', '__iadd__', '__imul__',
+                              'append', 'extend', 'insert', 'pop', 'remove', 'reverse', 'sort', 'clear'))
+_tracking(TrackedDict, dict, ('__setitem__', '__delitem__', 'clear', 'pop', 'popitem', 'setdefault', 'update'))
+
+
 def load_function(name, instance=None):
     obj = load_object(name)
     if inspect.ismethod(obj):
@@ -3,18 +3,27 @@
 from __future__ import absolute_import
 import abc
 import collections
+import copy
 import inspect
 import plumpy.lang
 import re
 import sys
+import time
 
+from tornado import gen
+
+from . import futures
 from . import mixins
 from . import persistence
 from . import processes
 from . import process_states
+from . import utils
 import six
 
-__all__ = ['WorkChain', 'if_', 'while_', 'return_', 'ToContext', 'WorkChainSpec']
+__all__ = [
+    'WorkChain', 'if_', 'while_', 'parallel_', 'map_', 'reduce_', 'sleep_', 'wait_until_', 'return_', 'ToContext',
+    'WorkChainSpec'
+]
 
 ToContext = dict
 
@@ -24,6 +33,7 @@ class WorkChainSpec(processes.ProcessSpec):
     def __init__(self):
         super(WorkChainSpec, self).__init__()
         self._outline = None
+        self._program = None
 
     def get_description(self):
         description = super(WorkChainSpec, self).get_description()
@@ -46,41 +56,142 @@ class WorkChainSpec(processes.ProcessSpec):
             # There are multiple instructions
             self._outline = _Block(commands)
 
+        self._program = _Program(self._outline)
+
     def get_outline(self):
         return self._outline
 
+    def get_program(self):
+        """
+        Get the outline compiled into a program that can be stepped through
+
+        :rtype: :class:`_Program`
+        """
+        return self._program
+
 
 @persistence.auto_persist('_awaiting')
 class Waiting(process_states.Waiting):
-    """ Overwrite the waiting state"""
+    """
+    Overwrite the waiting state to wait for the awaitables of the work chain.  They are waited for
+    using a single :class:`plumpy.Barrier` and, when saved, only the context key and, for processes,
+    the pid of the awaitables that are still outstanding are kept.  Once reloaded, the processes are
+    waited for again by their pid, see :meth:`WorkChain.get_child_awaitable`.  With a deadline and
+    nothing to await, the work chain sleeps until the deadline.
+    """
 
-    def __init__(self, process, done_callback, msg=None, awaiting=None):
-        super(Waiting, self).__init__(process, done_callback, msg, awaiting)
+    def __init__(self, process, done_callback, msg=None, awaiting=None, deadline=None):
+        super(Waiting, self).__init__(process, done_callback, msg, awaiting, deadline)
+        # index -> (context key, pid or None) of the awaitables that are yet to be done
         self._awaiting = {}
+        # index -> awaitable, only of those that are yet to be done
+        self._awaitables = {}
+        self._next_index = 0
+        self._barrier = None
         for awaitable, key in awaiting.items():
-            if isinstance(awaitable, processes.Process):
-                awaitable = awaitable.future()
-            self._awaiting[awaitable] = key
+            self._add(awaitable, key)
+
+    def load_instance_state(self, saved_state, load_context):
+        super(Waiting, self).load_instance_state(saved_state, load_context)
+        self._awaitables = None
+        self._next_index = max(self._awaiting) + 1 if self._awaiting else 0
+        self._barrier = None
 
     def enter(self):
         super(Waiting, self).enter()
-        for awaitable in self._awaiting.keys():
-            awaitable.add_done_callback(self._awaitable_done)
+        # The awaitables have been passed to on_wait by now, don't hold on to them any longer
+        self.data = None
+        self._wait()
+
+    @gen.coroutine
+    def execute(self):
+        if self._awaitables is None:
+            # Loaded rather than entered, wait for the processes again
+            self._reattach()
+        result = yield super(Waiting, self).execute()
+        raise gen.Return(result)
 
     def exit(self):
         super(Waiting, self).exit()
-        for awaitable in self._awaiting.keys():
-            awaitable.remove_done_callback(self._awaitable_done)
-
-    def _awaitable_done(self, awaitable):
-        key = self._awaiting.pop(awaitable)
-        try:
+        self._stop_waiting()
+
+    def detach(self):
+        self._stop_waiting()
+        # In the order of their index, so they can be matched up with what is outstanding again on attach
+        awaitables = [self._awaitables[index] for index in sorted(self._awaiting)]
+        self._awaitables = None
+        self.data = None
+        awaitables.extend(super(Waiting, self).detach())
+        return awaitables
+
+    def attach(self, awaitables):
+        super(Waiting, self).attach(awaitables)
+        self._awaitables = dict(zip(sorted(self._awaiting), awaitables))
+        self._wait()
+
+    def _wait(self):
+        if not self._awaiting and self.deadline is not None:
+            # Just sleeping
+            return
+
+        self._barrier = futures.Barrier(((index, self._awaitables[index]) for index in sorted(self._awaiting)),
+                                        self._awaitable_done)
+        self._barrier.add_done_callback(self._barrier_done)
+
+    def _reattach(self):
+        awaitables = {}
+        for index, (key, pid) in self._awaiting.items():
+            if pid is None:
+                raise RuntimeError("cannot wait for '{}' again after being reloaded, only processes can be".format(key))
+            try:
+                awaitables[index] = self.process.get_child_awaitable(pid)
+            except KeyError:
+                raise RuntimeError("cannot find the process '{}' to wait for '{}' again".format(pid, key))
+        self._awaitables = awaitables
+        self._wait()
+
+    def _stop_waiting(self):
+        if self._barrier is not None:
+            self._barrier.close()
+            self._barrier = None
+
+    def _add(self, awaitable, key):
+        pid = None
+        if isinstance(awaitable, processes.Process):
+            pid = awaitable.pid
+            awaitable = awaitable.future()
+
+        index = self._next_index
+        self._next_index += 1
+        self._awaiting[index] = (key, pid)
+        self._awaitables[index] = awaitable
+        return index, awaitable
+
+    def _awaitable_done(self, index, awaitable):
+        key, _pid = self._awaiting.pop(index)
+        del self._awaitables[index]
+        if isinstance(key, _MapItem):
+            # Record the result of the child of a map and launch the next one to take its place
+            launched = self.process._stepper.map_item_done(key, awaitable.result())  # pylint: disable=protected-access
+            if launched is not None:
+                return [self._add(*launched)]
+        elif isinstance(key, _Reduction):
+            # Fold the result into the accumulator, the result itself isn't kept
+            self.process.ctx[key.key] = key.reducer(self.process.ctx[key.key], awaitable.result())
+        else:
             self.process.ctx[key] = awaitable.result()
-        except Exception as e:
-            self._waiting_future.set_exception(e)
+
+        return None
+
+    def _barrier_done(self, barrier):
+        if barrier is not self._barrier:
+            return
+
+        self._barrier = None
+        if barrier.exception() is not None:
+            self._waiting_future.set_exception(barrier.exception())
         else:
-            if not self._awaiting:
-                self._waiting_future.set_result(plumpy.lang.NULL)
+            self._waiting_future.set_result(plumpy.lang.NULL)
 
 
 class WorkChain(mixins.ContextMixin, processes.Process):
@@ -105,7 +216,7 @@ class WorkChain(mixins.ContextMixin, processes.Process):
 
     def on_create(self):
         super(WorkChain, self).on_create()
-        self._stepper = self.spec().get_outline().create_stepper(self)
+        self._stepper = self.spec().get_program().create_stepper(self)
 
     def save_instance_state(self, out_state, save_context):
         super(WorkChain, self).save_instance_state(out_state, save_context)
@@ -121,7 +232,24 @@ class WorkChain(mixins.ContextMixin, processes.Process):
         self._stepper = None
         stepper_state = saved_state.get(self._STEPPER_STATE, None)
         if stepper_state is not None:
-            self._stepper = self.spec().get_outline().recreate_stepper(stepper_state, self)
+            self._stepper = self.spec().get_program().recreate_stepper(stepper_state, self)
+
+    def on_terminated(self):
+        super(WorkChain, self).on_terminated()
+        # Nothing can be carried on from a checkpoint any more, so the offloaded values are no longer needed
+        self.delete_offloaded_context(str(self.pid))
+
+    def get_child_awaitable(self, pid):
+        """
+        Get what to wait for to carry on waiting for a child process once this work chain was reloaded.
+        By default this is the future of the child if it is still around in this interpreter, override
+        this to find children that are carried on elsewhere.
+
+        :param pid: the pid of the child
+        :return: the awaitable
+        :raises KeyError: if the child cannot be found
+        """
+        return processes.get_process_future(pid)
 
     def to_context(self, **kwargs):
         """
@@ -130,9 +258,13 @@ class WorkChain(mixins.ContextMixin, processes.Process):
         to the corresponding key in the context of the workchain
         """
         for key, awaitable in kwargs.items():
-            if isinstance(awaitable, processes.Process):
-                awaitable = awaitable.future()
-            self._awaitables[awaitable] = key
+            if isinstance(awaitable, _Reduce):
+                self.ctx[key] = copy.deepcopy(awaitable.initial)
+                reduction = _Reduction(key, awaitable.reducer)
+                for each in awaitable.awaitables:
+                    self._awaitables[each] = reduction
+            else:
+                self._awaitables[awaitable] = key
 
     def run(self):
         return self._do_step()
@@ -145,13 +277,18 @@ class WorkChain(mixins.ContextMixin, processes.Process):
         except _PropagateReturn as exception:
             finished, return_value = True, exception.exit_code
 
-        if not finished and (return_value is None or isinstance(return_value, ToContext)):
+        self.offload_context(str(self.pid))
+
+        if not finished and (return_value is None or isinstance(return_value, (ToContext, _Deadline))):
 
             if isinstance(return_value, ToContext):
                 self.to_context(**return_value)
 
             if self._awaitables:
                 return process_states.Wait(self._do_step, 'Waiting before next step', self._awaitables)
+            elif isinstance(return_value, _Deadline):
+                return process_states.Wait(
+                    self._do_step, 'Sleeping before next step', {}, deadline=return_value.deadline)
             else:
                 return process_states.Continue(self._do_step)
         else:
@@ -181,20 +318,32 @@ class Stepper(six.with_metaclass(abc.ABCMeta, persistence.Savable)):
 
 class _Instruction(six.with_metaclass(abc.ABCMeta, object)):
     """
-    This class represents an instruction in a workchain. To step through the
-    step you need to get a stepper by calling ``create_stepper()`` from which
-    you can call the :class:`~Stepper.step()` method.
+    This class represents an instruction in a workchain.  Before being run the
+    instructions of an outline are compiled into a :class:`_Program` that can be
+    stepped through by the :class:`Stepper` returned by ``create_stepper()``.
     """
 
     @abc.abstractmethod
+    def compile(self, program, wrap):
+        """
+        Append the operations of this instruction to a program
+
+        :param program: the program being compiled
+        :type program: :class:`_Program`
+        :param wrap: a callable that turns the description of a position within this instruction
+            into that of the position within the whole outline
+        :return: a callable that maps the saved state of the nested stepper this instruction used
+            to have to the corresponding program counter, so that old checkpoints can be loaded
+        """
+        pass
+
     def create_stepper(self, workchain):
         """ Create a new stepper for this instruction """
-        pass
+        return _Program(self).create_stepper(workchain)
 
-    @abc.abstractmethod
     def recreate_stepper(self, saved_state, workchain):
         """ Recreate a stepper from a previously saved state """
-        pass
+        return _Program(self).recreate_stepper(saved_state, workchain)
 
     def __str__(self):
         return str(self.get_description())
@@ -209,25 +358,292 @@ class _Instruction(six.with_metaclass(abc.ABCMeta, object)):
         pass
 
 
-class _FunctionStepper(Stepper):
+# The operations of a compiled program
+_CALL = 0  # Call a step of the workchain, which ends the step
+_TEST = 1  # Evaluate a predicate, moving on if true and jumping to the target (and maybe ending the step) if false
+_JUMP = 2  # Jump to the target
+_RETURN = 3  # Return from the outline
+_FORK = 4  # Step each of the branches starting at the given positions, moving on to the target once all have stopped
+_STOP = 5  # The end of a branch
+_MAP = 6  # Launch children for the items of a map, moving on to the target once they are all done
+_SLEEP = 7  # Sleep until a deadline, moving on to the target once it has passed
+
+# The key under which the child of a map is awaited, the position of the map in the program and the index of the item
+_MapItem = collections.namedtuple('_MapItem', ('pc', 'index'))
+# A group of awaitables and how to reduce their results, as passed to the context
+_Reduce = collections.namedtuple('_Reduce', ('awaitables', 'reducer', 'initial'))
+# The key under which the members of a reduced group are awaited
+_Reduction = collections.namedtuple('_Reduction', ('key', 'reducer'))
+# The result of a step that has to sleep until an absolute time before the next one
+_Deadline = collections.namedtuple('_Deadline', ('deadline',))
+
+STEPPER_STATE = 'stepper_state'
+
+
+class _Program(object):
+    """
+    An outline compiled into a flat list of operations with jump targets.  The position of a
+    workchain within its outline is then just the index of the next operation, the program counter,
+    along with the program counters of the branches of any parallel instructions that are running.
+
+    Each step of the program carries out the same work as a step of the nested steppers that it
+    replaces: it ends after calling a step of the workchain or after a conditional instruction is
+    left without calling anything, e.g. a while loop whose predicate became false.  Within a
+    parallel instruction, a step carries out a step of each of the branches that has not stopped.
+    """
+
+    def __init__(self, outline):
+        self._ops = []
+        self._descriptions = []
+        wrap = (lambda inner: inner)
+        self._locate = outline.compile(self, wrap)
+
+        # Jumps to jumps are followed at compile time so that a step never rests on a jump
+        self._resume = [self._follow(pc) for pc in range(len(self._ops) + 1)]
+        ops = []
+        for code, arg, target, ends_step in self._ops:
+            if code == _FORK:
+                arg = tuple(self._resume[start] for start in arg)
+            if target is not None:
+                target = self._resume[target]
+            ops.append((code, arg, target, ends_step))
+        self._ops = tuple(ops)
+        self._descriptions.append('finished')
+
+    def __len__(self):
+        return len(self._ops)
+
+    def emit(self, code, arg=None, target=None, ends_step=False, description=None):
+        """
+        Append an operation to the program
+
+        :return: the index of the operation
+        """
+        self._ops.append([code, arg, target, ends_step])
+        self._descriptions.append(description)
+        return len(self._ops) - 1
+
+    def set_target(self, index, target, ends_step=None):
+        op = self._ops[index]
+        op[2] = target
+        if ends_step is not None:
+            op[3] = ends_step
+
+    def set_arg(self, index, arg):
+        self._ops[index][1] = arg
+
+    def describe(self, pc):
+        return self._descriptions[pc]
+
+    def stopped(self, pc):
+        """Is a branch (or the whole program) that is at the given position at its end"""
+        return pc == len(self._ops) or self._ops[pc][0] == _STOP
+
+    def create_stepper(self, workchain):
+        return _ProgramStepper(self, workchain, self._resume[0])
+
+    def recreate_stepper(self, saved_state, workchain):
+        if _ProgramStepper.PC not in saved_state:
+            # A checkpoint with the state of the nested steppers that came before compiled programs
+            return _ProgramStepper(self, workchain, self._resume[self._locate(saved_state)])
+
+        load_context = persistence.LoadSaveContext(workchain=workchain, program=self)
+        return _ProgramStepper.recreate_from(saved_state, load_context)
 
-    def __init__(self, workchain, fn):
-        super(_FunctionStepper, self).__init__(workchain)
-        self._fn = fn
+    def _follow(self, pc):
+        while pc < len(self._ops) and self._ops[pc][0] == _JUMP:
+            pc = self._ops[pc][2]
+        return pc
+
+
+@persistence.auto_persist('_pc')
+class _ProgramStepper(Stepper):
+    """
+    Steps through a compiled program, its state is the program counter and, for each parallel
+    instruction that is running, the program counters of its branches
+    """
+    PC = '_pc'
+    BRANCHES = 'branches'
+    MAPS = 'maps'
+    SLEEPS = 'sleeps'
+
+    def __init__(self, program, workchain, pc=0):
+        super(_ProgramStepper, self).__init__(workchain)
+        self._program = program
+        self._pc = pc
+        self._branches = {}  # The index of the fork operation -> the program counters of its branches
+        self._maps = {}  # The index of the map operation -> the index of the next item to launch
+        self._map_items = {}  # The index of the map operation -> the items, not saved
+        self._sleeps = {}  # The index of the sleep operation -> its deadline
 
     def save_instance_state(self, out_state, save_context):
-        super(_FunctionStepper, self).save_instance_state(out_state, save_context)
-        out_state['_fn'] = self._fn.__name__
+        super(_ProgramStepper, self).save_instance_state(out_state, save_context)
+        if self._branches:
+            out_state[self.BRANCHES] = {fork: list(branches) for fork, branches in self._branches.items()}
+        if self._maps:
+            out_state[self.MAPS] = dict(self._maps)
+        if self._sleeps:
+            out_state[self.SLEEPS] = dict(self._sleeps)
 
     def load_instance_state(self, saved_state, load_context):
-        super(_FunctionStepper, self).load_instance_state(saved_state, load_context)
-        self._fn = getattr(self._workchain.__class__, saved_state['_fn'])
+        super(_ProgramStepper, self).load_instance_state(saved_state, load_context)
+        self._program = load_context.program
+        self._branches = {int(fork): list(branches) for fork, branches in saved_state.get(self.BRANCHES, {}).items()}
+        self._maps = {int(pc): next_index for pc, next_index in saved_state.get(self.MAPS, {}).items()}
+        self._map_items = {}
+        self._sleeps = {int(pc): deadline for pc, deadline in saved_state.get(self.SLEEPS, {}).items()}
+
+    def finished(self):
+        return self._pc == len(self._program)
 
     def step(self):
-        return True, self._fn(self._workchain)
+        assert not self.finished(), "Can't call step after the outline is finished"
+        self._pc, result = self._step_from(self._pc)
+        return self.finished(), result
+
+    def _step_from(self, pc):
+        """
+        Carry out a step starting at a position in the program
+
+        :return: the new position and the return value of the step
+        """
+        program = self._program
+        ops = program._ops  # pylint: disable=protected-access
+        while not program.stopped(pc):
+            code, arg, target, ends_step = ops[pc]
+            if code == _CALL:
+                return program._resume[pc + 1], arg(self._workchain)  # pylint: disable=protected-access
+            elif code == _TEST:
+                if arg(self._workchain):
+                    pc += 1
+                else:
+                    pc = target
+                    if ends_step:
+                        break
+            elif code == _JUMP:
+                pc = target
+            elif code == _FORK:
+                return self._step_branches(pc, arg, target)
+            elif code == _MAP:
+                if self._start_map(pc, arg):
+                    return pc, None
+                pc = target
+            elif code == _SLEEP:
+                deadline = self._sleeps.get(pc, None)
+                if deadline is None:
+                    deadline = self._sleeps[pc] = arg.get_deadline(self._workchain)
+                if time.time() < deadline:
+                    return pc, _Deadline(deadline)
+                del self._sleeps[pc]
+                pc = target
+            else:
+                raise _PropagateReturn(arg)
+
+        return pc, None
+
+    def _step_branches(self, fork, starts, join):
+        branches = self._branches.get(fork, None)
+        if branches is None:
+            branches = self._branches[fork] = list(starts)
+
+        to_context = ToContext()
+        sleep = None
+        for index, pc in enumerate(branches):
+            if self._program.stopped(pc):
+                continue
+
+            branches[index], result = self._step_from(pc)
+            if isinstance(result, ToContext):
+                to_context.update(result)
+            elif isinstance(result, _Deadline):
+                sleep = result if sleep is None else min(sleep, result)
+            elif result is not None:
+                # An exit code, this ends the whole outline
+                return fork, result
+
+        if all(self._program.stopped(pc) for pc in branches):
+            del self._branches[fork]
+            return join, to_context or None
+
+        # Anything the other branches wait for comes first, sleeping branches check their deadline again after
+        return fork, to_context or sleep
+
+    def _start_map(self, pc, instruction):
+        """
+        Launch the first children of a map
+
+        :return: True if children were launched and have to be waited for, False if the map is done
+        """
+        if pc in self._maps:
+            # Back after waiting for all of the children
+            del self._maps[pc]
+            self._map_items.pop(pc, None)
+            return False
+
+        items = self._map_items[pc] = instruction.get_items(self._workchain)
+        if instruction.reducer is None:
+            self._workchain.ctx[instruction.target] = utils.TrackedList([None] * len(items))
+        else:
+            self._workchain.ctx[instruction.target] = copy.deepcopy(instruction.initial)
+        if not items:
+            del self._map_items[pc]
+            return False
+
+        self._maps[pc] = 0
+        for _ in range(min(instruction.max_concurrency or len(items), len(items))):
+            awaitable, key = self._launch_next(pc, instruction)
+            self._workchain._awaitables[awaitable] = key  # pylint: disable=protected-access
+        return True
+
+    def map_item_done(self, item, result):
+        """
+        Record the result of a child of a map
+
+        :param item: the map item of the child
+        :param result: the result of the child
+        :return: the next child that was launched in its place, and its key, or None if all have been launched
+        """
+        instruction = self._program._ops[item.pc][1]  # pylint: disable=protected-access
+        if instruction.reducer is None:
+            self._workchain.ctx[instruction.target][item.index] = result
+        else:
+            ctx = self._workchain.ctx
+            ctx[instruction.target] = instruction.reducer(ctx[instruction.target], result)
+        if self._maps[item.pc] < len(self._get_map_items(item.pc, instruction)):
+            return self._launch_next(item.pc, instruction)
+        return None
+
+    def _get_map_items(self, pc, instruction):
+        try:
+            return self._map_items[pc]
+        except KeyError:
+            # After being reloaded, the items are expected to be the same as before
+            items = self._map_items[pc] = instruction.get_items(self._workchain)
+            return items
+
+    def _launch_next(self, pc, instruction):
+        index = self._maps[pc]
+        self._maps[pc] = index + 1
+        item = self._get_map_items(pc, instruction)[index]
+        return instruction.launch(self._workchain, item), _MapItem(pc, index)
+
+    def _describe(self, pc):
+        description = self._program.describe(pc)
+        if not self._program.stopped(pc) and self._program._ops[pc][0] == _FORK:  # pylint: disable=protected-access
+            branches = self._branches.get(pc, self._program._ops[pc][1])  # pylint: disable=protected-access
+            description += '(' + ', '.join(self._describe(branch) for branch in branches) + ')'
+        return description
 
     def __str__(self):
-        return self._fn.__name__
+        return self._describe(self._pc)
+
+
+def _prefixed(wrap, prefix):
+    return lambda inner: wrap(prefix + inner)
+
+
+def _enclosed(wrap, label):
+    return lambda inner: wrap('{}({})'.format(label, inner))
 
 
 class _FunctionCall(_Instruction):
@@ -242,12 +658,9 @@ class _FunctionCall(_Instruction):
 
         self._fn = func
 
-    def create_stepper(self, workchain):
-        return _FunctionStepper(workchain, self._fn)
-
-    def recreate_stepper(self, saved_state, workchain):
-        load_context = persistence.LoadSaveContext(workchain=workchain, func_spec=self)
-        return _FunctionStepper.recreate_from(saved_state, load_context)
+    def compile(self, program, wrap):
+        index = program.emit(_CALL, self._fn, description=wrap(self._fn.__name__))
+        return lambda stepper_state: index
 
     def get_description(self):
         desc = self._fn.__name__
@@ -258,55 +671,6 @@ class _FunctionCall(_Instruction):
         return desc
 
 
-STEPPER_STATE = 'stepper_state'
-
-
-@persistence.auto_persist('_pos')
-class _BlockStepper(Stepper):
-
-    def __init__(self, block, workchain):
-        super(_BlockStepper, self).__init__(workchain)
-        self._block = block
-        self._pos = 0
-        self._child_stepper = self._block[0].create_stepper(self._workchain)
-
-    def step(self):
-        assert not self.finished(), "Can't call step after the block is finished"
-
-        finished, result = self._child_stepper.step()
-        if finished:
-            self.next_instruction()
-
-        return self.finished(), result
-
-    def next_instruction(self):
-        assert not self.finished()
-        self._pos += 1
-        if self.finished():
-            self._child_stepper = None
-        else:
-            self._child_stepper = self._block[self._pos].create_stepper(self._workchain)
-
-    def finished(self):
-        return self._pos == len(self._block)
-
-    def save_instance_state(self, out_state, save_context):
-        super(_BlockStepper, self).save_instance_state(out_state, save_context)
-        if self._child_stepper is not None:
-            out_state[STEPPER_STATE] = self._child_stepper.save()
-
-    def load_instance_state(self, saved_state, load_context):
-        super(_BlockStepper, self).load_instance_state(saved_state, load_context)
-        self._block = load_context.block_instruction
-        stepper_state = saved_state.get(STEPPER_STATE, None)
-        self._child_stepper = None
-        if stepper_state is not None:
-            self._child_stepper = self._block[self._pos].recreate_stepper(stepper_state, self._workchain)
-
-    def __str__(self):
-        return str(self._pos) + ':' + str(self._child_stepper)
-
-
 class _Block(_Instruction, collections.Sequence):
     """
     Represents a block of instructions i.e. a sequential list of instructions.
@@ -329,12 +693,20 @@ class _Block(_Instruction, collections.Sequence):
     def __len__(self):
         return len(self._instruction)
 
-    def create_stepper(self, workchain):
-        return _BlockStepper(self, workchain)
+    def compile(self, program, wrap):
+        locators = [
+            instruction.compile(program, _prefixed(wrap, '{}:'.format(pos)))
+            for pos, instruction in enumerate(self._instruction)
+        ]
+        end = len(program)
 
-    def recreate_stepper(self, saved_state, workchain):
-        load_context = persistence.LoadSaveContext(workchain=workchain, block_instruction=self)
-        return _BlockStepper.recreate_from(saved_state, load_context)
+        def locate(stepper_state):
+            child_state = stepper_state.get(STEPPER_STATE, None)
+            if child_state is None:
+                return end
+            return locators[stepper_state['_pos']](child_state)
+
+        return locate
 
     def get_description(self):
         return [instruction.get_description() for instruction in self._instruction]
@@ -379,63 +751,6 @@ class _Conditional(object):
         return self._label + '(' + self.predicate.__name__ + ')'
 
 
-@persistence.auto_persist('_pos')
-class _IfStepper(Stepper):
-
-    def __init__(self, if_instruction, workchain):
-        super(_IfStepper, self).__init__(workchain)
-        self._if_instruction = if_instruction
-        self._pos = 0
-        self._child_stepper = None
-
-    def step(self):
-        if self.finished():
-            return True, None
-
-        if self._child_stepper is None:
-            # Check the conditions until we find one that is true or we get to the end and
-            # none are true in which case we set pos to past the end
-            for conditional in self._if_instruction:
-                if conditional.is_true(self._workchain):
-                    break
-                self._pos += 1
-
-            if self.finished():
-                return True, None
-            else:
-                self._child_stepper = self._if_instruction[self._pos].body.create_stepper(self._workchain)
-
-        finished, retval = self._child_stepper.step()
-        if finished:
-            self._pos = len(self._if_instruction)
-            self._child_stepper = None
-
-        return self.finished(), retval
-
-    def finished(self):
-        return self._pos == len(self._if_instruction)
-
-    def save_instance_state(self, out_state, save_context):
-        super(_IfStepper, self).save_instance_state(out_state, save_context)
-        if self._child_stepper is not None:
-            out_state[STEPPER_STATE] = self._child_stepper.save()
-
-    def load_instance_state(self, saved_state, load_context):
-        super(_IfStepper, self).load_instance_state(saved_state, load_context)
-        self._if_instruction = load_context.if_instruction
-        stepper_state = saved_state.get(STEPPER_STATE, None)
-        self._child_stepper = None
-        if stepper_state is not None:
-            self._child_stepper = self._if_instruction[self._pos].body.recreate_stepper(stepper_state, self._workchain)
-
-    def __str__(self):
-        s = str(self._if_instruction[self._pos])
-        if self._child_stepper is not None:
-            s += '(' + str(self._child_stepper) + ')'
-
-        return s
-
-
 class _If(_Instruction, collections.Sequence):
 
     def __init__(self, condition):
@@ -472,12 +787,31 @@ class _If(_Instruction, collections.Sequence):
         self._sealed = True
         return self
 
-    def create_stepper(self, workchain):
-        return _IfStepper(self, workchain)
-
-    def recreate_stepper(self, saved_state, workchain):
-        load_context = persistence.LoadSaveContext(workchain=workchain, if_instruction=self)
-        return _IfStepper.recreate_from(saved_state, load_context)
+    def compile(self, program, wrap):
+        tests = []
+        jumps = []
+        locators = []
+        for conditional in self._ifs:
+            label = str(conditional)
+            tests.append(program.emit(_TEST, conditional.predicate, description=wrap(label)))
+            locators.append(conditional.body.compile(program, _enclosed(wrap, label)))
+            jumps.append(program.emit(_JUMP))
+            # If false, move on to the next conditional
+            program.set_target(tests[-1], len(program))
+
+        end = len(program)
+        for jump in jumps:
+            program.set_target(jump, end)
+        # Not going into any of the bodies ends the step
+        program.set_target(tests[-1], end, ends_step=True)
+
+        def locate(stepper_state):
+            child_state = stepper_state.get(STEPPER_STATE, None)
+            if child_state is not None:
+                return locators[stepper_state['_pos']](child_state)
+            return tests[0] if stepper_state['_pos'] == 0 else end
+
+        return locate
 
     def get_description(self):
         description = collections.OrderedDict()
@@ -489,90 +823,128 @@ class _If(_Instruction, collections.Sequence):
         return description
 
 
-class _WhileStepper(Stepper):
+class _While(_Conditional, _Instruction, collections.Sequence):
 
-    def __init__(self, while_instruction, workchain):
-        super(_WhileStepper, self).__init__(workchain)
-        self._while_instruction = while_instruction
-        self._child_stepper = None
+    def __init__(self, predicate):
+        super(_While, self).__init__(self, predicate, label=while_.__name__)
 
-    def step(self):
-        # Do we need to check the condition?
-        if self._child_stepper is None:
-            # Should we go into the loop body?
-            if self._while_instruction.is_true(self._workchain):
-                self._child_stepper = self._while_instruction.body.create_stepper(self._workchain)
-            else:  # Nope...we're done
-                return True, None
+    def __getitem__(self, idx):
+        assert idx == 0
+        return self
 
-        finished, result = self._child_stepper.step()
-        if finished:
-            self._child_stepper = None
+    def __len__(self):
+        return 1
 
-        return False, result
+    def compile(self, program, wrap):
+        label = str(self)
+        test = program.emit(_TEST, self.predicate, ends_step=True, description=wrap(label))
+        body = self.body.compile(program, _enclosed(wrap, label))
+        program.emit(_JUMP, target=test)
+        program.set_target(test, len(program))
 
-    def save_instance_state(self, out_state, save_context):
-        super(_WhileStepper, self).save_instance_state(out_state, save_context)
-        if self._child_stepper is not None:
-            out_state[STEPPER_STATE] = self._child_stepper.save()
+        def locate(stepper_state):
+            child_state = stepper_state.get(STEPPER_STATE, None)
+            return test if child_state is None else body(child_state)
 
-    def load_instance_state(self, saved_state, load_context):
-        super(_WhileStepper, self).load_instance_state(saved_state, load_context)
-        self._while_instruction = load_context.while_instruction
-        stepper_state = saved_state.get(STEPPER_STATE, None)
-        self._child_stepper = None
-        if stepper_state is not None:
-            self._child_stepper = self._while_instruction.body.recreate_stepper(stepper_state, self._workchain)
+        return locate
 
-    def __str__(self):
-        s = str(self._while_instruction)
-        if self._child_stepper is not None:
-            s += '(' + str(self._child_stepper) + ')'
+    def get_description(self):
+        return {"while({})".format(self.predicate.__name__): self.body.get_description()}
 
-        return s
 
+class _Parallel(_Instruction):
+    """
+    Branches of instructions that are carried out side by side, each step of the work chain
+    carrying out a step of each of the branches that has not finished.
+    """
 
-class _While(_Conditional, _Instruction, collections.Sequence):
+    def __init__(self, branches):
+        super(_Parallel, self).__init__()
+        self._branches = []
+        for branch in branches:
+            if isinstance(branch, (list, tuple)):
+                branch = _Block(branch)
+            self._branches.append(_ensure_instruction(branch))
+
+    def compile(self, program, wrap):
+        fork = program.emit(_FORK, description=wrap(parallel_.__name__))
+        starts = []
+        for branch in self._branches:
+            starts.append(len(program))
+            # The branches are described on their own, within the description of the fork
+            branch.compile(program, lambda inner: inner)
+            program.emit(_STOP, description='finished')
+        program.set_arg(fork, tuple(starts))
+        program.set_target(fork, len(program))
+
+        return lambda stepper_state: fork
 
-    def __init__(self, predicate):
-        super(_While, self).__init__(self, predicate, label=while_.__name__)
+    def get_description(self):
+        return {parallel_.__name__: [branch.get_description() for branch in self._branches]}
 
-    def __getitem__(self, idx):
-        assert idx == 0
-        return self
 
-    def __len__(self):
-        return 1
+class _Map(_Instruction):
+    """
+    Launches a child for each of a number of items, at most a given number at a time, collecting
+    their results in a list in the context.
+    """
 
-    def create_stepper(self, workchain):
-        return _WhileStepper(self, workchain)
+    def __init__(self, items, launch, target, max_concurrency=None, reducer=None, initial=None):
+        super(_Map, self).__init__()
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError('The maximum concurrency has to be at least one')
 
-    def recreate_stepper(self, saved_state, workchain):
-        load_context = persistence.LoadSaveContext(workchain=workchain, while_instruction=self)
-        return _WhileStepper.recreate_from(saved_state, load_context)
+        self._items = items
+        self._launch = launch
+        self.target = target
+        self.max_concurrency = max_concurrency
+        self.reducer = reducer
+        self.initial = initial
+
+    def get_items(self, workchain):
+        return self._items(workchain)
+
+    def launch(self, workchain, item):
+        return self._launch(workchain, item)
+
+    def compile(self, program, wrap):
+        index = program.emit(_MAP, self, description=wrap(str(self)))
+        program.set_target(index, len(program))
+        return lambda stepper_state: index
 
     def get_description(self):
-        return {"while({})".format(self.predicate.__name__): self.body.get_description()}
+        return '{}({}, {})'.format(map_.__name__, self._items.__name__, self._launch.__name__)
 
 
-class _PropagateReturn(BaseException):
+class _Sleep(_Instruction):
+    """Sleeps until a deadline, the deadline is saved so the sleep carries on after being reloaded"""
 
-    def __init__(self, exit_code):
-        self.exit_code = exit_code
+    def __init__(self, name, value, relative):
+        super(_Sleep, self).__init__()
+        self._name = name
+        self._value = value
+        self._relative = relative
 
+    def get_deadline(self, workchain):
+        value = self._value(workchain) if callable(self._value) else self._value
+        if self._relative:
+            return time.time() + value
+        return value
 
-class _ReturnStepper(Stepper):
+    def compile(self, program, wrap):
+        index = program.emit(_SLEEP, self, description=wrap(str(self)))
+        program.set_target(index, len(program))
+        return lambda stepper_state: index
 
-    def __init__(self, return_instruction, workchain):
-        super(_ReturnStepper, self).__init__(workchain)
-        self._return_instruction = return_instruction
+    def get_description(self):
+        value = self._value.__name__ if callable(self._value) else self._value
+        return '{}({})'.format(self._name, value)
 
-    def step(self):
-        """
-        Raise a _PropagateReturn exception where the value is the exit code set
-        in the _Return instruction upon instantiation
-        """
-        raise _PropagateReturn(self._return_instruction._exit_code)
+
+class _PropagateReturn(BaseException):
+
+    def __init__(self, exit_code):
+        self.exit_code = exit_code
 
 
 class _Return(_Instruction):
@@ -588,11 +960,9 @@ class _Return(_Instruction):
     def __call__(self, exit_code):
         return _Return(exit_code)
 
-    def create_stepper(self, workchain):
-        return _ReturnStepper(self, workchain)
-
-    def recreate_stepper(self, saved_state, workchain):
-        return _ReturnStepper(self, workchain)
+    def compile(self, program, wrap):
+        index = program.emit(_RETURN, self._exit_code, description=wrap('return_'))
+        return lambda stepper_state: index
 
     def get_description(self):
         """
@@ -639,6 +1009,100 @@ def while_(condition):
     return _While(condition)
 
 
+def parallel_(*branches):
+    """
+    Branches of a workchain outline that are carried out side by side.
+
+    Use as::
+
+      parallel_(
+        (cls.prepare_a, cls.run_a),
+        (cls.prepare_b, cls.run_b),
+      )
+
+    Each branch can be a single step or instruction, or a tuple or list of them.  Each step of
+    the workchain carries out a step of every branch that has not finished, anything the branches
+    add to the context is waited for together and the outline carries on once all branches have
+    finished.  A step of any of the branches that returns an exit code ends the workchain.
+
+    :param branches: the branches
+    """
+    return _Parallel(branches)
+
+
+def map_(items, launch, to, max_concurrency=None, reducer=None, initial=None):
+    """
+    Launch a child for each of a number of items, with at most a given number running at a time.
+
+    Use as::
+
+      map_(cls.get_structures, cls.relax, to='relaxed', max_concurrency=10)
+
+    where `get_structures` returns a sequence of items and `relax` launches the child for an item
+    and returns it, or any other awaitable.  As each child finishes its result is stored in the list
+    `ctx.relaxed` at the index of its item and the next child is launched.  The items are expected to
+    be the same each time `get_structures` is called, so that a map can carry on after being reloaded.
+    Only the index of the next item and the pids of the children that are running are saved, once
+    reloaded these children are waited for again, see :meth:`WorkChain.get_child_awaitable`.
+
+    If a reducer is given, the results are folded into `ctx.relaxed` as they arrive instead, see :func:`reduce_`.
+
+    :param items: the workchain method that returns the items
+    :param launch: the workchain method that launches the child for an item
+    :param to: the context key of the list of results
+    :param max_concurrency: the maximum number of children to have running at a time, all at once if None
+    :param reducer: an optional reducer for the results
+    :param initial: the initial value of the accumulator of the reducer
+    """
+    return _Map(items, launch, to, max_concurrency, reducer, initial)
+
+
+def reduce_(awaitables, reducer, initial=None):
+    """
+    A group of awaitables whose results are folded into a single accumulator in the context as they
+    arrive, rather than each being stored.  Only the accumulator is kept and saved.
+
+    Use as::
+
+      return ToContext(energy=reduce_([self.launch(Calculation) for _ in range(1000)], plumpy.Sum('energy'), 0.))
+
+    :param awaitables: the awaitables or processes
+    :param reducer: a callable that takes the accumulator and a result and returns the new
+        accumulator, it is saved with the workchain so should be picklable, see :mod:`plumpy.reducers`
+    :param initial: the initial value of the accumulator
+    """
+    return _Reduce(list(awaitables), reducer, initial)
+
+
+def sleep_(seconds):
+    """
+    Sleep for a while before carrying on with the outline.
+
+    Use as::
+
+      while_(cls.not_ready)(
+        cls.poll,
+        sleep_(60)
+      )
+
+    The point in time until which to sleep is saved with the workchain, so that after being reloaded
+    it only sleeps for what is left.  While sleeping the workchain is waiting and, if run by a
+    :class:`plumpy.Hibernator`, it can be evicted from memory.
+
+    :param seconds: the number of seconds or a workchain method that returns it
+    """
+    return _Sleep(sleep_.__name__, seconds, True)
+
+
+def wait_until_(when):
+    """
+    Sleep until a point in time before carrying on with the outline, see :func:`sleep_`.
+
+    :param when: the absolute time, as given by :func:`time.time`, or a workchain method that returns it
+    """
+    return _Sleep(wait_until_.__name__, when, False)
+
+
 return_ = _Return()
 """
 A global singleton that contains a Return instruction that allows to exit
@@ -0,0 +1,610 @@
+"""
+A pool of worker processes on a single machine that talk to each other over multiprocessing queues.
+
+This gives task, RPC and broadcast messaging without a message broker, so several cores can be used
+to run processes without having to run separate daemons against RabbitMQ.
+"""
+
+from __future__ import absolute_import
+import collections
+import itertools
+import logging
+import multiprocessing
+import pickle
+import sys
+import threading
+import traceback
+
+import kiwipy
+from tornado import concurrent
+
+from . import communications
+from . import events
+from . import futures
+from . import persistence
+from . import process_comms
+
+__all__ = ['WorkerPool', 'MultiprocessingCommunicator']
+
+_LOGGER = logging.getLogger(__name__)
+
+# Message fields
+TYPE_KEY = 'type'
+ID_KEY = 'id'
+SENDER_KEY = 'sender'
+BODY_KEY = 'body'
+RECIPIENT_KEY = 'recipient'
+OUTCOME_KEY = 'outcome'
+
+# Message types
+TASK = 'task'
+RPC = 'rpc'
+BROADCAST = 'broadcast'
+REPLY = 'reply'
+SUBSCRIBE_RPC = 'subscribe_rpc'
+UNSUBSCRIBE_RPC = 'unsubscribe_rpc'
+SUBSCRIBE_TASKS = 'subscribe_tasks'
+UNSUBSCRIBE_TASKS = 'unsubscribe_tasks'
+EXITED = 'exited'
+STOP = 'stop'
+
+# Outcomes of a task or RPC
+RESULT = 'result'
+REJECTED = 'rejected'
+EXCEPTION = 'exception'
+UNROUTABLE = 'unroutable'
+
+SUPERVISOR_ID = 'supervisor'
+
+
+def _dumps(message):
+    return pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+
+
+def _loads(data):
+    return pickle.loads(data)
+
+
+class MultiprocessingCommunicator(kiwipy.Communicator):
+    """
+    A communicator that exchanges messages with the other participants of a :class:`WorkerPool`
+    through the hub of the pool.
+
+    Subscribers are called on the thread that reads the incoming messages, so, as with any other
+    kiwipy communicator, they should be wrapped using :func:`plumpy.wrap_communicator` to have the
+    messages handled on an event loop.
+    """
+
+    def __init__(self, participant_id, inbox, hub_queue):
+        """
+        :param participant_id: the identifier of this participant of the pool
+        :param inbox: the queue on which this participant receives messages
+        :type inbox: :class:`multiprocessing.Queue`
+        :param hub_queue: the queue of the hub that routes messages between participants
+        :type hub_queue: :class:`multiprocessing.Queue`
+        """
+        self._id = participant_id
+        self._inbox = inbox
+        self._hub_queue = hub_queue
+        self._correlation_ids = itertools.count()
+        self._pending = {}
+        self._task_subscribers = []
+        self._rpc_subscribers = {}
+        self._broadcast_subscribers = {}
+        self._close_callbacks = []
+        self._closed = False
+        self._reader = threading.Thread(target=self._read, name='plumpy-{}-reader'.format(participant_id))
+        self._reader.daemon = True
+        self._reader.start()
+
+    @property
+    def participant_id(self):
+        return self._id
+
+    def add_close_callback(self, callback):
+        """Add a callback that will be called without arguments when the communicator is told to stop"""
+        self._close_callbacks.append(callback)
+
+    def close(self):
+        """Stop reading messages.  Pending futures will not be resolved."""
+        if not self._closed:
+            self._inbox.put(_dumps({TYPE_KEY: STOP}))
+            self._reader.join()
+
+    def add_rpc_subscriber(self, subscriber, identifier=None):
+        identifier = identifier or '{}.{}'.format(self._id, next(self._correlation_ids))
+        self._rpc_subscribers[identifier] = subscriber
+        self._send_to_hub({TYPE_KEY: SUBSCRIBE_RPC, BODY_KEY: identifier})
+        return identifier
+
+    def remove_rpc_subscriber(self, identifier):
+        try:
+            self._rpc_subscribers.pop(identifier)
+        except KeyError:
+            raise ValueError("Unknown subscriber '{}'".format(identifier))
+        self._send_to_hub({TYPE_KEY: UNSUBSCRIBE_RPC, BODY_KEY: identifier})
+
+    def add_task_subscriber(self, subscriber):
+        self._task_subscribers.append(subscriber)
+        if len(self._task_subscribers) == 1:
+            self._send_to_hub({TYPE_KEY: SUBSCRIBE_TASKS})
+
+    def remove_task_subscriber(self, subscriber):
+        try:
+            self._task_subscribers.remove(subscriber)
+        except ValueError:
+            raise ValueError("Unknown subscriber: '{}'".format(subscriber))
+        if not self._task_subscribers:
+            self._send_to_hub({TYPE_KEY: UNSUBSCRIBE_TASKS})
+
+    def add_broadcast_subscriber(self, subscriber, identifier=None):
+        identifier = identifier or '{}.{}'.format(self._id, next(self._correlation_ids))
+        self._broadcast_subscribers[identifier] = subscriber
+        return identifier
+
+    def remove_broadcast_subscriber(self, identifier):
+        try:
+            del self._broadcast_subscribers[identifier]
+        except KeyError:
+            raise ValueError("Broadcast subscriber '{}' unknown".format(identifier))
+
+    def task_send(self, task, no_reply=False):
+        """
+        Send a task to one of the participants that has a task subscriber.
+
+        :return: a future that resolves to a future representing the outcome of the task
+        :rtype: :class:`kiwipy.Future`
+        """
+        if no_reply:
+            self._send_to_hub({TYPE_KEY: TASK, ID_KEY: None, BODY_KEY: task})
+            return None
+
+        return self._send_with_reply({TYPE_KEY: TASK, BODY_KEY: task})
+
+    def rpc_send(self, recipient_id, msg):
+        """
+        Send an RPC message to the participant that subscribed the recipient identifier.
+
+        :return: a future that resolves to a future representing the response
+        :rtype: :class:`kiwipy.Future`
+        """
+        return self._send_with_reply({TYPE_KEY: RPC, RECIPIENT_KEY: recipient_id, BODY_KEY: msg})
+
+    def broadcast_send(self, body, sender=None, subject=None, correlation_id=None):
+        self._send_to_hub({
+            TYPE_KEY: BROADCAST,
+            BODY_KEY: {
+                'body': body,
+                'sender': sender,
+                'subject': subject,
+                'correlation_id': correlation_id
+            }
+        })
+        return True
+
+    def _send_with_reply(self, message):
+        response = kiwipy.Future()
+        correlation_id = next(self._correlation_ids)
+        message[ID_KEY] = correlation_id
+        self._pending[correlation_id] = response
+        try:
+            self._send_to_hub(message)
+        except Exception:
+            self._pending.pop(correlation_id)
+            raise
+
+        # The message is handed over to the hub so consider it delivered
+        delivered = kiwipy.Future()
+        delivered.set_result(response)
+        return delivered
+
+    def _send_to_hub(self, message):
+        message[SENDER_KEY] = self._id
+        self._hub_queue.put(_dumps(message))
+
+    def _read(self):
+        while True:
+            message = _loads(self._inbox.get())
+            message_type = message[TYPE_KEY]
+
+            if message_type == STOP:
+                break
+
+            try:
+                if message_type == REPLY:
+                    self._on_reply(message)
+                elif message_type == TASK:
+                    self._on_task(message)
+                elif message_type == RPC:
+                    self._on_rpc(message)
+                elif message_type == BROADCAST:
+                    self._on_broadcast(message)
+                else:
+                    _LOGGER.warning("%s: received message of unknown type '%s'", self._id, message_type)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception('%s: failed to handle message %s', self._id, message)
+
+        self._closed = True
+        for callback in self._close_callbacks:
+            callback()
+
+    def _on_reply(self, message):
+        response = self._pending.pop(message[ID_KEY], None)
+        if response is None:
+            return
+
+        outcome, value = message[OUTCOME_KEY]
+        if outcome == RESULT:
+            response.set_result(value)
+        elif outcome == REJECTED:
+            response.set_exception(kiwipy.TaskRejected(value))
+        elif outcome == UNROUTABLE:
+            response.set_exception(kiwipy.UnroutableError(value))
+        else:
+            response.set_exception(kiwipy.RemoteException(value))
+
+    def _on_task(self, message):
+        for subscriber in self._task_subscribers:
+            try:
+                result = subscriber(self, message[BODY_KEY])
+            except kiwipy.TaskRejected:
+                continue
+            except Exception:  # pylint: disable=broad-except
+                self._reply(message, (EXCEPTION, traceback.format_exc()))
+            else:
+                self._reply_when_done(message, result)
+            return
+
+        self._reply(message, (REJECTED, 'Rejected by all subscribers of {}'.format(self._id)))
+
+    def _on_rpc(self, message):
+        try:
+            subscriber = self._rpc_subscribers[message[RECIPIENT_KEY]]
+        except KeyError:
+            self._reply(message, (UNROUTABLE, "Unknown rpc recipient '{}'".format(message[RECIPIENT_KEY])))
+            return
+
+        try:
+            result = subscriber(self, message[BODY_KEY])
+        except Exception:  # pylint: disable=broad-except
+            self._reply(message, (EXCEPTION, traceback.format_exc()))
+        else:
+            self._reply_when_done(message, result)
+
+    def _on_broadcast(self, message):
+        for subscriber in list(self._broadcast_subscribers.values()):
+            try:
+                subscriber(self, **message[BODY_KEY])
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception('%s: broadcast subscriber %s raised', self._id, subscriber)
+
+    def _reply_when_done(self, message, result):
+        """Send the reply once the result, which may be a (chain of) future(s), has resolved to a value"""
+        if isinstance(result, kiwipy.Future):
+            result = futures.unwrap_kiwi_future(result)
+        elif not concurrent.is_future(result):
+            self._reply(message, (RESULT, result))
+            return
+
+        def done(future):
+            try:
+                outcome = (RESULT, future.result())
+            except kiwipy.TaskRejected as exception:
+                outcome = (REJECTED, str(exception))
+            except Exception:  # pylint: disable=broad-except
+                outcome = (EXCEPTION, ''.join(traceback.format_exception(*sys.exc_info())))
+            self._reply(message, outcome)
+
+        result.add_done_callback(done)
+
+    def _reply(self, message, outcome):
+        if message[ID_KEY] is None:
+            return
+
+        reply = {TYPE_KEY: REPLY, ID_KEY: message[ID_KEY], OUTCOME_KEY: outcome}
+        try:
+            self._send_to_hub(reply)
+        except Exception:  # pylint: disable=broad-except
+            # Most likely the result could not be pickled, let the sender know rather than leaving it hanging
+            reply[OUTCOME_KEY] = (EXCEPTION, traceback.format_exc())
+            self._send_to_hub(reply)
+
+
+class _Hub(object):
+    """
+    Routes messages between the participants of a worker pool.  Runs in a thread of the supervisor.
+
+    Tasks are given to the task subscribing participant with the fewest tasks in flight and are
+    offered to the next one if rejected.  Tasks that arrive while there are no task subscribers yet,
+    but workers that are still starting up, are held until the first of these subscribes.  RPCs are
+    routed to the participant that subscribed the identifier and broadcasts are sent to everyone.
+
+    When a worker exits, the tasks and RPCs it was handling fail, as it may have carried out part of
+    them, and the held tasks are rejected if there are no workers left to take them.
+    """
+
+    def __init__(self):
+        self.queue = multiprocessing.Queue()
+        self._inboxes = {}
+        self._inboxes_lock = threading.Lock()  # Participants can be added while the hub is running
+        self._task_workers = []
+        self._starting_workers = set()  # Workers that are expected to subscribe to tasks but have not yet
+        self._held_tasks = collections.deque()
+        self._in_flight = {}
+        self._rpc_routes = {}
+        self._tasks = {}
+        self._rpcs = {}
+        self._ids = itertools.count()
+        self._thread = threading.Thread(target=self._run, name='plumpy-hub')
+        self._thread.daemon = True
+
+    def add_participant(self, participant_id, worker=False):
+        """
+        Add a participant, workers have to be added before the hub is started
+
+        :param participant_id: the identifier of the participant
+        :param worker: whether the participant is a worker that will subscribe to tasks
+        :return: the inbox of the participant
+        :rtype: :class:`multiprocessing.Queue`
+        """
+        inbox = multiprocessing.Queue()
+        with self._inboxes_lock:
+            self._inboxes[participant_id] = inbox
+            self._in_flight[participant_id] = 0
+        if worker:
+            self._starting_workers.add(participant_id)
+        return inbox
+
+    def stop_participant(self, participant_id):
+        """
+        Tell a participant to stop reading messages
+
+        :param participant_id: the identifier of the participant
+        """
+        self._send(participant_id, {TYPE_KEY: STOP})
+
+    def worker_exited(self, participant_id):
+        """
+        Tell the hub that a worker has exited, it will no longer be given tasks
+
+        :param participant_id: the identifier of the worker
+        """
+        self.queue.put(_dumps({TYPE_KEY: EXITED, SENDER_KEY: participant_id}))
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.queue.put(_dumps({TYPE_KEY: STOP, SENDER_KEY: None}))
+        self._thread.join()
+
+    def _run(self):
+        handlers = {
+            TASK: self._on_task,
+            RPC: self._on_rpc,
+            BROADCAST: self._on_broadcast,
+            REPLY: self._on_reply,
+            SUBSCRIBE_RPC: self._on_subscribe_rpc,
+            UNSUBSCRIBE_RPC: self._on_unsubscribe_rpc,
+            SUBSCRIBE_TASKS: self._on_subscribe_tasks,
+            UNSUBSCRIBE_TASKS: self._on_unsubscribe_tasks,
+            EXITED: self._on_exited,
+        }
+
+        while True:
+            message = _loads(self.queue.get())
+            if message[TYPE_KEY] == STOP:
+                break
+
+            try:
+                handlers[message[TYPE_KEY]](message)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception('hub: failed to route message %s', message)
+
+    def _send(self, participant_id, message):
+        with self._inboxes_lock:
+            inbox = self._inboxes[participant_id]
+        inbox.put(_dumps(message))
+
+    def _reply(self, recipient, correlation_id, outcome):
+        if correlation_id is not None:
+            self._send(recipient, {TYPE_KEY: REPLY, ID_KEY: correlation_id, OUTCOME_KEY: outcome})
+
+    def _on_subscribe_rpc(self, message):
+        self._rpc_routes[message[BODY_KEY]] = message[SENDER_KEY]
+
+    def _on_unsubscribe_rpc(self, message):
+        if self._rpc_routes.get(message[BODY_KEY]) == message[SENDER_KEY]:
+            del self._rpc_routes[message[BODY_KEY]]
+
+    def _on_subscribe_tasks(self, message):
+        self._starting_workers.discard(message[SENDER_KEY])
+        if message[SENDER_KEY] not in self._task_workers:
+            self._task_workers.append(message[SENDER_KEY])
+
+        self._release_held_tasks()
+
+    def _on_unsubscribe_tasks(self, message):
+        self._starting_workers.discard(message[SENDER_KEY])
+        if message[SENDER_KEY] in self._task_workers:
+            self._task_workers.remove(message[SENDER_KEY])
+
+    def _on_exited(self, message):
+        worker = message[SENDER_KEY]
+        self._on_unsubscribe_tasks(message)
+        for route, recipient in list(self._rpc_routes.items()):
+            if recipient == worker:
+                del self._rpc_routes[route]
+
+        outcome = (EXCEPTION, "The worker '{}' exited while handling the message".format(worker))
+        for hub_id, (sender, correlation_id, _body, task_worker, _remaining) in list(self._tasks.items()):
+            if task_worker == worker:
+                del self._tasks[hub_id]
+                self._reply(sender, correlation_id, outcome)
+        for hub_id, (sender, correlation_id, recipient) in list(self._rpcs.items()):
+            if recipient == worker:
+                del self._rpcs[hub_id]
+                self._reply(sender, correlation_id, outcome)
+        self._in_flight[worker] = 0
+
+        # The held tasks are rejected if nobody is left to take them
+        self._release_held_tasks()
+
+    def _release_held_tasks(self):
+        while self._held_tasks and (self._task_workers or not self._starting_workers):
+            self._on_task(self._held_tasks.popleft())
+
+    def _on_task(self, message):
+        if not self._task_workers and self._starting_workers:
+            self._held_tasks.append(message)
+            return
+
+        # Offer the task to the least busy workers first
+        candidates = sorted(self._task_workers, key=lambda worker: self._in_flight[worker])
+        self._offer_task(message[SENDER_KEY], message[ID_KEY], message[BODY_KEY], candidates)
+
+    def _offer_task(self, sender, correlation_id, body, candidates):
+        if not candidates:
+            self._reply(sender, correlation_id, (REJECTED, 'Rejected by all subscribers'))
+            return
+
+        worker, remaining = candidates[0], candidates[1:]
+        hub_id = next(self._ids)
+        self._tasks[hub_id] = (sender, correlation_id, body, worker, remaining)
+        self._in_flight[worker] += 1
+        self._send(worker, {TYPE_KEY: TASK, ID_KEY: hub_id, SENDER_KEY: sender, BODY_KEY: body})
+
+    def _on_rpc(self, message):
+        recipient = self._rpc_routes.get(message[RECIPIENT_KEY])
+        if recipient is None:
+            self._reply(message[SENDER_KEY], message[ID_KEY],
+                        (UNROUTABLE, "Unknown rpc recipient '{}'".format(message[RECIPIENT_KEY])))
+            return
+
+        hub_id = next(self._ids)
+        self._rpcs[hub_id] = (message[SENDER_KEY], message[ID_KEY], recipient)
+        routed = dict(message)
+        routed[ID_KEY] = hub_id
+        self._send(recipient, routed)
+
+    def _on_broadcast(self, message):
+        with self._inboxes_lock:
+            inboxes = list(self._inboxes.values())
+        data = _dumps(message)
+        for inbox in inboxes:
+            inbox.put(data)
+
+    def _on_reply(self, message):
+        hub_id = message[ID_KEY]
+        if hub_id in self._tasks:
+            sender, correlation_id, body, worker, remaining = self._tasks.pop(hub_id)
+            self._in_flight[worker] -= 1
+            if message[OUTCOME_KEY][0] == REJECTED:
+                self._offer_task(sender, correlation_id, body, remaining)
+            else:
+                self._reply(sender, correlation_id, message[OUTCOME_KEY])
+        elif hub_id in self._rpcs:
+            sender, correlation_id, _recipient = self._rpcs.pop(hub_id)
+            self._reply(sender, correlation_id, message[OUTCOME_KEY])
+
+
+def _run_worker(participant_id, inbox, hub_queue, persister, loader):
+    """The entry point of a worker process: run a process launcher on a fresh event loop until stopped"""
+    loop = events.new_event_loop()
+    communicator = MultiprocessingCommunicator(participant_id, inbox, hub_queue)
+    communicator.add_close_callback(lambda: loop.add_callback(loop.stop))
+
+    loop_communicator = communications.wrap_communicator(communicator, loop)
+    load_context = persistence.LoadSaveContext(loop=loop, communicator=communicator)
+    launcher = process_comms.ProcessLauncher(loop, persister=persister, load_context=load_context, loader=loader)
+    loop_communicator.add_task_subscriber(launcher)
+
+    loop.start()
+    loop.close()
+
+
+class WorkerPool(object):
+    """
+    A supervisor that forks a number of worker processes, each running a :class:`plumpy.ProcessLauncher`
+    on its own event loop, and connects them with :class:`MultiprocessingCommunicator` instances.
+
+    Tasks sent through any communicator of the pool are executed by one of the workers.  The pool
+    can be created without workers, in which case it provides in-machine messaging between the
+    communicators created with :meth:`create_communicator`.
+
+    The persister is handed to every worker process, so it has to be one that can be shared between
+    processes e.g. a :class:`plumpy.PicklePersister`.
+    """
+
+    def __init__(self, num_workers, persister=None, loader=None):
+        """
+        :param num_workers: the number of worker processes to fork
+        :param persister: the persister the workers use to save and continue processes
+        :param loader: the object loader used by the workers
+        """
+        self._hub = _Hub()
+        self._communicators = []
+        self._workers = []
+
+        # Fork the workers before any of our own threads are started
+        for index in range(num_workers):
+            participant_id = 'worker-{}'.format(index)
+            inbox = self._hub.add_participant(participant_id, worker=True)
+            worker = multiprocessing.Process(
+                target=_run_worker, args=(participant_id, inbox, self._hub.queue, persister, loader), name=participant_id)
+            worker.daemon = True
+            worker.start()
+            self._workers.append((participant_id, worker))
+
+        self._hub.start()
+        for participant_id, worker in self._workers:
+            watcher = threading.Thread(
+                target=self._watch, args=(participant_id, worker), name='plumpy-{}-watcher'.format(participant_id))
+            watcher.daemon = True
+            watcher.start()
+        self._communicator = self.create_communicator(SUPERVISOR_ID)
+
+    @property
+    def communicator(self):
+        """The communicator of the supervisor"""
+        return self._communicator
+
+    @property
+    def num_workers(self):
+        return len(self._workers)
+
+    def create_communicator(self, participant_id=None):
+        """
+        Create a new communicator, in this process, that takes part in the messaging of the pool
+
+        :param participant_id: an optional identifier for the new participant
+        :rtype: :class:`MultiprocessingCommunicator`
+        """
+        participant_id = participant_id or 'participant-{}'.format(len(self._communicators))
+        inbox = self._hub.add_participant(participant_id)
+        communicator = MultiprocessingCommunicator(participant_id, inbox, self._hub.queue)
+        self._communicators.append(communicator)
+        return communicator
+
+    def _watch(self, participant_id, worker):
+        """Let the hub know once a worker has exited, whether it was told to or not"""
+        worker.join()
+        self._hub.worker_exited(participant_id)
+
+    def close(self, timeout=None):
+        """
+        Stop the workers, the hub and the communicators of this pool
+
+        :param timeout: how long to wait for each worker to exit before terminating it
+        """
+        for participant_id, _worker in self._workers:
+            self._hub.stop_participant(participant_id)
+        for _participant_id, worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+
+        for communicator in self._communicators:
+            communicator.close()
+
+        self._hub.stop()
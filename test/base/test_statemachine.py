@@ -121,6 +121,23 @@ class CdPlayer(state_machine.StateMachine):
         self.transition_to(Stopped)
 
 
+class RecordingCdPlayer(CdPlayer):
+    STATE_EVENT_METHODS = {
+        state_machine.StateEventHook.ENTERING_STATE: 'record_entering',
+        state_machine.StateEventHook.EXITING_STATE: 'record_exiting',
+    }
+
+    def __init__(self):
+        self.events = []
+        super(RecordingCdPlayer, self).__init__()
+
+    def record_entering(self, state):
+        self.events.append(('entering', state.LABEL))
+
+    def record_exiting(self, next_state):
+        self.events.append(('exiting', next_state.LABEL))
+
+
 class TestStateMachine(unittest.TestCase):
     def test_basic(self):
         cd_player = CdPlayer()
@@ -145,3 +162,22 @@ class TestStateMachine(unittest.TestCase):
         cd_player = CdPlayer()
         with self.assertRaises(AssertionError):
             cd_player.play()
+
+    def test_invalid_transition(self):
+        cd_player = CdPlayer()
+        with self.assertRaises(RuntimeError):
+            cd_player.transition_to(Paused, Playing(cd_player, 'Track'))
+        self.assertEqual(cd_player.state, STOPPED)
+
+    def test_state_event_methods(self):
+        cd_player = RecordingCdPlayer()
+        cd_player.play('Track')
+        cd_player.stop()
+        self.assertListEqual(cd_player.events, [('entering', STOPPED), ('exiting', PLAYING), ('entering', PLAYING),
+                                                ('exiting', STOPPED), ('entering', STOPPED)])
+
+    def test_transition_table(self):
+        self.assertEqual(CdPlayer.get_state_class(PLAYING), Playing)
+        for from_index, from_state in enumerate(CdPlayer.STATES):
+            for to_index, to_state in enumerate(CdPlayer.STATES):
+                self.assertEqual(CdPlayer._TRANSITIONS[from_index][to_index], to_state.LABEL in from_state.ALLOWED)
@@ -1,3 +1,4 @@
+import functools
 import unittest
 from plumpy.base import utils
 
@@ -42,3 +43,104 @@ class TestSuperCheckMixin(unittest.TestCase):
             DoCall().method()
 
 
+class TestSuperCheckModes(unittest.TestCase):
+    """Test that call_with_super_check behaves the same whatever the mode, apart from how it checks"""
+
+    def setUp(self):
+        self._mode = utils._MODE  # pylint: disable=protected-access
+
+    def tearDown(self):
+        utils._MODE = self._mode  # pylint: disable=protected-access
+
+    def _create_classes(self, mode):
+        # super_check decorates according to the mode, so the classes have to be created in it
+        utils._MODE = mode  # pylint: disable=protected-access
+
+        class Base(object):
+
+            @utils.super_check
+            def method(self, value):
+                return value
+
+        class Calls(Base):
+
+            def method(self, value):
+                return super(Calls, self).method(value) + 1
+
+        class DoesNotCall(Base):
+
+            def method(self, value):
+                return value
+
+        return Calls, DoesNotCall
+
+    def test_return_value(self):
+        for mode in (utils.SUPER_CHECK_RUNTIME, utils.SUPER_CHECK_CLASS, utils.SUPER_CHECK_OFF):
+            calls, _ = self._create_classes(mode)
+            self.assertEqual(utils.call_with_super_check(calls().method, 1), 2, mode)
+
+    def test_class_mode(self):
+        calls, does_not_call = self._create_classes(utils.SUPER_CHECK_CLASS)
+        self.assertEqual(utils.call_with_super_check(calls().method, 1), 2)
+        # Verified once per class, calling it again is the same
+        self.assertEqual(utils.call_with_super_check(calls().method, 2), 3)
+        with self.assertRaises(AssertionError):
+            utils.call_with_super_check(does_not_call().method, 1)
+
+
+class DecoratedCall(Root):
+
+    @staticmethod
+    def _decorator(fn):
+
+        @functools.wraps(fn)
+        def wrapper(self):
+            return fn(self)
+
+        return wrapper
+
+    @_decorator.__func__
+    def method(self):
+        super(DecoratedCall, self).method()
+
+
+class ClosureDecoratedCall(Root):
+    """Like DecoratedCall but with a decorator that does not set `__wrapped__`, as on Python 2"""
+
+    @staticmethod
+    def _decorator(fn):
+
+        def wrapper(self):
+            return fn(self)
+
+        return wrapper
+
+    @_decorator.__func__
+    def method(self):
+        super(ClosureDecoratedCall, self).method()
+
+
+class TestVerifySuperCalls(unittest.TestCase):
+
+    def test_do_call(self):
+        utils.verify_super_calls(DoCall, 'method')
+        utils.verify_super_calls(DecoratedCall, 'method')
+        utils.verify_super_calls(ClosureDecoratedCall, 'method')
+
+    def test_dont_call(self):
+        with self.assertRaises(AssertionError):
+            utils.verify_super_calls(DontCall, 'method')
+
+    def test_dont_call_middle(self):
+
+        class ThirdChild(DontCall):
+
+            def method(self):
+                super(ThirdChild, self).method()
+
+        with self.assertRaises(AssertionError):
+            utils.verify_super_calls(ThirdChild, 'method')
+
+    def test_not_super_checked(self):
+        with self.assertRaises(AssertionError):
+            utils.verify_super_calls(Root, 'do')
@@ -1,4 +1,6 @@
 from __future__ import absolute_import
+import os
+import pickle
 import tempfile
 
 if getattr(tempfile, 'TemporaryDirectory', None) is None:
@@ -9,6 +11,35 @@ from plumpy.test_utils import ProcessWithCheckpoint
 from test.utils import TestCaseWithLoop
 
 
+class ContextWorkChain(plumpy.WorkChain):
+
+    @classmethod
+    def define(cls, spec):
+        super(ContextWorkChain, cls).define(spec)
+        spec.outline(cls.run_step)
+
+    def run_step(self):
+        pass
+
+
+class AppendingWorkChain(plumpy.WorkChain):
+    """Changes a plain list in its context in place"""
+
+    @classmethod
+    def define(cls, spec):
+        super(AppendingWorkChain, cls).define(spec)
+        spec.outline(cls.a, cls.b, cls.c)
+
+    def a(self):
+        self.ctx.results = []
+
+    def b(self):
+        self.ctx.results.append(1)
+
+    def c(self):
+        self.ctx.results.append(2)
+
+
 class TestPicklePersister(TestCaseWithLoop):
 
     def test_save_load_roundtrip(self):
@@ -160,3 +191,48 @@ class TestPicklePersister(TestCaseWithLoop):
             retrieved_checkpoints = persister.get_checkpoints()
 
             self.assertSetEqual(set(retrieved_checkpoints), set(checkpoints))
+
+    def test_context_delta(self):
+        """A second checkpoint of a process only writes what changed in its context"""
+        workchain = ContextWorkChain()
+        workchain.ctx.big = plumpy.utils.TrackedList(range(10000))
+        workchain.ctx.small = 1
+        workchain.ctx.removed = 2
+
+        with tempfile.TemporaryDirectory() as directory:
+            persister = plumpy.PicklePersister(directory)
+            persister.save_checkpoint(workchain)
+            self.assertEqual(workchain.ctx.get_changes(), ({}, set()))
+
+            workchain.ctx.small = 3
+            del workchain.ctx.removed
+            persister.save_checkpoint(workchain)
+
+            context_file = os.path.join(directory, '{}.context'.format(workchain.pid))
+            with open(context_file, 'rb') as handle:
+                pickle.load(handle)
+                self.assertEqual(pickle.load(handle), ({'small': 3}, {'removed'}))
+                self.assertEqual(handle.read(), b'')
+
+            bundle = persister.load_checkpoint(workchain.pid)
+            recreated = bundle.unbundle(plumpy.LoadSaveContext(loop=self.loop))
+            self.assertEqual(recreated.ctx, plumpy.utils.TrackedAttributesDict(big=list(range(10000)), small=3))
+
+            persister.delete_checkpoint(workchain.pid)
+            self.assertFalse(os.listdir(directory))
+
+    def test_context_delta_untracked(self):
+        """Values that are changed in place without being tracked are written in full every time"""
+        workchain = AppendingWorkChain()
+
+        with tempfile.TemporaryDirectory() as directory:
+            persister = plumpy.PicklePersister(directory)
+            persister.save_checkpoint(workchain)
+            while not workchain.has_terminated():
+                self.loop.run_sync(workchain.step)
+                persister.save_checkpoint(workchain)
+
+                recreated = persister.load_checkpoint(workchain.pid).unbundle(plumpy.LoadSaveContext(loop=self.loop))
+                self.assertEqual(recreated.ctx, workchain.ctx)
+
+            self.assertEqual(workchain.ctx.results, [1, 2])
@@ -0,0 +1,230 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import plumpy
+
+
+class BigContextWorkChain(plumpy.WorkChain):
+    """A work chain that puts a large and a small value in its context"""
+
+    @classmethod
+    def define(cls, spec):
+        super(BigContextWorkChain, cls).define(spec)
+        spec.outline(cls.fill, cls.result)
+        spec.output('total')
+
+    def fill(self):
+        self.ctx.big = list(range(1000))
+        self.ctx.small = 1
+
+    def result(self):
+        self.out('total', sum(self.ctx.big) + self.ctx.small)
+
+
+class CountingList(list):
+    """A list that counts how often it was pickled"""
+    pickled = 0
+
+    def __reduce_ex__(self, protocol):
+        CountingList.pickled += 1
+        return super(CountingList, self).__reduce_ex__(protocol)
+
+
+class MemoryBlobStore(plumpy.BlobStore):
+    """A blob store that keeps the blobs in memory"""
+
+    def __init__(self, name):
+        super(MemoryBlobStore, self).__init__()
+        self._name = name
+        self._blobs = {}
+
+    @property
+    def locator(self):
+        return MemoryBlobStore, (self._name,)
+
+    def has_blob(self, blob_id):
+        return blob_id in self._blobs
+
+    def put_blob(self, blob_id, data):
+        self._blobs[blob_id] = data
+
+    def get_blob(self, blob_id):
+        return self._blobs[blob_id]
+
+    def delete_blob(self, blob_id):
+        self._blobs.pop(blob_id, None)
+
+    def delete_namespace(self, namespace):
+        for blob_id in [blob_id for blob_id in self._blobs if blob_id.startswith(namespace + '/')]:
+            del self._blobs[blob_id]
+
+
+class TestBlobStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            plumpy.BlobStore()  # pylint: disable=abstract-class-instantiated
+
+    def test_store_and_load(self):
+        store = plumpy.DirectoryBlobStore(self.directory)
+        handle = store.store({'a': 1})
+        self.assertEqual(handle.value, {'a': 1})
+
+        # Writing the same value again gives the same blob
+        self.assertEqual(store.store({'a': 1}).blob_id, handle.blob_id)
+
+        loaded = pickle.loads(pickle.dumps(handle))
+        self.assertFalse(loaded.loaded)
+        self.assertEqual(loaded.value, {'a': 1})
+
+    def test_pickle_handle(self):
+        store = MemoryBlobStore('test_pickle_handle')
+        handle = store.store(list(range(1000)))
+
+        # Only the locator of the store is pickled, not its blobs or its cache
+        data = pickle.dumps(handle)
+        self.assertLess(len(data), 500)
+        loaded = pickle.loads(data)
+        self.assertIs(loaded._store, store)  # pylint: disable=protected-access
+        self.assertEqual(loaded.value, list(range(1000)))
+
+    def test_eviction(self):
+        cache = plumpy.BlobCache(max_size=1500)
+        store = plumpy.DirectoryBlobStore(self.directory, cache=cache)
+        first = store.store(b'a' * 1000)
+        second = store.store(b'b' * 1000)
+
+        self.assertFalse(first.loaded)
+        self.assertTrue(second.loaded)
+        self.assertEqual(first.value, b'a' * 1000)
+        self.assertFalse(second.loaded)
+        self.assertLessEqual(cache.size, 1500)
+
+
+class TestContextOffloading(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = plumpy.DirectoryBlobStore(self.directory)
+        BigContextWorkChain.CONTEXT_OFFLOADER = plumpy.ContextOffloader(self.store, threshold=100)
+
+    def tearDown(self):
+        BigContextWorkChain.CONTEXT_OFFLOADER = None
+        shutil.rmtree(self.directory)
+
+    def test_offload(self):
+        workchain = BigContextWorkChain()
+        workchain.ctx.big = list(range(1000))
+        workchain.ctx.small = 1
+
+        # Saving does not offload anything by itself
+        plumpy.Bundle(workchain)
+        self.assertNotIsInstance(workchain.ctx.__dict__['big'], plumpy.BlobHandle)
+
+        workchain.offload_context()
+        bundle = plumpy.Bundle(workchain)
+        self.assertIsInstance(workchain.ctx.__dict__['big'], plumpy.BlobHandle)
+        self.assertEqual(workchain.ctx.small, 1)
+        self.assertEqual(workchain.ctx.big, list(range(1000)))
+        self.assertEqual(workchain.ctx.get('big'), list(range(1000)))
+        self.assertLess(len(pickle.dumps(bundle)), len(pickle.dumps(list(range(1000)))))
+
+        loaded = pickle.loads(pickle.dumps(bundle)).unbundle()
+        self.assertEqual(loaded.ctx.big, list(range(1000)))
+
+    def test_replace_and_delete(self):
+        workchain = BigContextWorkChain()
+        workchain.ctx.big = list(range(1000))
+        workchain.ctx.other = list(range(1000, 2000))
+        workchain.offload_context()
+        big = workchain.ctx.__dict__['big']
+        other = workchain.ctx.__dict__['other']
+        self.assertEqual(self.store.cache.size, big.size + other.size)
+
+        # The cache does not hold on to values that are no longer in the context
+        workchain.ctx.big = 1
+        self.assertFalse(big.loaded)
+        del workchain.ctx.other
+        self.assertFalse(other.loaded)
+        self.assertEqual(self.store.cache.size, 0)
+
+    def test_change_in_place(self):
+        store = plumpy.DirectoryBlobStore(self.directory, cache=plumpy.BlobCache(max_size=100))
+        BigContextWorkChain.CONTEXT_OFFLOADER = plumpy.ContextOffloader(store, threshold=100)
+        workchain = BigContextWorkChain()
+        workchain.ctx.big = list(range(1000))
+        workchain.ctx.other = list(range(1000, 2000))
+        workchain.offload_context()
+        big = workchain.ctx.__dict__['big']
+
+        # The changed value stays loaded even though the cache is full
+        workchain.ctx.big.append(-1)
+        self.assertEqual(workchain.ctx.other[0], 1000)
+        self.assertTrue(big.loaded)
+
+        # Offloading stores the changed value anew, an unchanged one keeps its blob
+        other = workchain.ctx.__dict__['other']
+        workchain.offload_context()
+        self.assertIsNot(workchain.ctx.__dict__['big'], big)
+        self.assertIs(workchain.ctx.__dict__['other'], other)
+        self.assertFalse(other.held)
+
+        loaded = pickle.loads(pickle.dumps(plumpy.Bundle(workchain))).unbundle()
+        self.assertEqual(loaded.ctx.big[-1], -1)
+
+    def test_namespace(self):
+        store = MemoryBlobStore('test_namespace')
+        first = store.store(list(range(1000)), namespace='first')
+        second = store.store(list(range(1000)), namespace='second')
+        self.assertNotEqual(first.blob_id, second.blob_id)
+
+        store.delete_namespace('first')
+        self.assertFalse(store.has_blob(first.blob_id))
+        self.assertTrue(store.has_blob(second.blob_id))
+
+    def test_estimate_size(self):
+        BigContextWorkChain.CONTEXT_OFFLOADER = plumpy.ContextOffloader(self.store, threshold=1000)
+        workchain = BigContextWorkChain()
+        CountingList.pickled = 0
+        workchain.ctx.values = CountingList(range(10))
+        workchain.offload_context()
+        self.assertEqual(CountingList.pickled, 1)
+
+        # A value that did not grow much is not pickled again
+        workchain.ctx.values.append(10)
+        workchain.ctx.touch('values')
+        workchain.offload_context()
+        self.assertEqual(CountingList.pickled, 1)
+
+        workchain.ctx.values.extend(range(1000))
+        workchain.ctx.touch('values')
+        workchain.offload_context()
+        self.assertEqual(CountingList.pickled, 2)
+        self.assertIsInstance(workchain.ctx.__dict__['values'], plumpy.BlobHandle)
+
+    def test_execute(self):
+        offloaded = []
+
+        class StepsWorkChain(BigContextWorkChain):
+
+            def result(self):
+                offloaded.append(self.ctx.__dict__['big'])
+                super(StepsWorkChain, self).result()
+
+        workchain = StepsWorkChain()
+        workchain.execute()
+        self.assertEqual(workchain.outputs['total'], sum(range(1000)) + 1)
+        # The big value was offloaded in the namespace of the process after the step that put it in the context
+        self.assertIsInstance(offloaded[0], plumpy.BlobHandle)
+        self.assertTrue(offloaded[0].blob_id.startswith('{}/'.format(workchain.pid)))
+        # and deleted once the process terminated
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,139 @@
+from tornado import gen, testing
+
+import plumpy
+from plumpy import communications, test_utils
+
+
+class TestInProcessCommunicator(testing.AsyncTestCase):
+
+    def setUp(self):
+        super(TestInProcessCommunicator, self).setUp()
+        self.loop = self.io_loop
+        self.communicator = communications.InProcessCommunicator(self.loop)
+        self.process_controller = plumpy.RemoteProcessController(self.communicator)
+
+    def test_wrap_communicator(self):
+        self.assertIs(communications.wrap_communicator(self.communicator, self.loop), self.communicator)
+        self.assertIsInstance(
+            communications.wrap_communicator(self.communicator, plumpy.new_event_loop()),
+            communications.LoopCommunicator)
+
+    @testing.gen_test
+    def test_rpc_send(self):
+        messages = []
+
+        def subscriber(_comm, msg):
+            messages.append(msg)
+            return 'pong'
+
+        identifier = self.communicator.add_rpc_subscriber(subscriber)
+        response_future = yield self.communicator.rpc_send(identifier, 'ping')
+        result = yield response_future
+        self.assertEqual(result, 'pong')
+        self.assertListEqual(messages, ['ping'])
+
+    @testing.gen_test
+    def test_rpc_send_unroutable(self):
+        with self.assertRaises(plumpy.communications.kiwipy.UnroutableError):
+            yield self.communicator.rpc_send('nobody', 'ping')
+
+    @testing.gen_test
+    def test_task_send_rejected(self):
+        tasks = []
+
+        def rejecting(_comm, task):
+            raise communications.TaskRejected()
+
+        @gen.coroutine
+        def rejecting_coroutine(_comm, task):
+            raise communications.TaskRejected()
+
+        def accepting(_comm, task):
+            tasks.append(task)
+            return task * 2
+
+        self.communicator.add_task_subscriber(rejecting)
+        self.communicator.add_task_subscriber(rejecting_coroutine)
+        self.communicator.add_task_subscriber(accepting)
+
+        result_future = yield self.communicator.task_send(4)
+        result = yield result_future
+        self.assertEqual(result, 8)
+        self.assertListEqual(tasks, [4])
+
+        self.communicator.remove_task_subscriber(accepting)
+        with self.assertRaises(communications.TaskRejected):
+            yield self.communicator.task_send(4)
+
+    @testing.gen_test
+    def test_task_send_exception(self):
+
+        def failing(_comm, task):
+            raise RuntimeError('sync')
+
+        @gen.coroutine
+        def failing_coroutine(_comm, task):
+            raise RuntimeError('coroutine')
+
+        # Both kinds of subscriber fail the outcome of the task rather than its delivery
+        for subscriber in (failing, failing_coroutine):
+            self.communicator.add_task_subscriber(subscriber)
+            result_future = yield self.communicator.task_send(4)
+            with self.assertRaises(RuntimeError):
+                yield result_future
+            self.communicator.remove_task_subscriber(subscriber)
+
+    @testing.gen_test
+    def test_broadcast_subscriber_exception(self):
+        received = plumpy.Future()
+
+        def failing(_comm, body, **kwargs):
+            raise RuntimeError('Failed to handle {}'.format(body))
+
+        self.communicator.add_broadcast_subscriber(failing)
+        self.communicator.add_broadcast_subscriber(lambda _comm, body, **kwargs: received.set_result(body))
+        self.communicator.broadcast_send('hello')
+        result = yield received
+        self.assertEqual(result, 'hello')
+
+    @testing.gen_test
+    def test_broadcast_send(self):
+        received = plumpy.Future()
+
+        def subscriber(_comm, body, sender=None, subject=None, correlation_id=None):
+            received.set_result((body, sender, subject, correlation_id))
+
+        self.communicator.add_broadcast_subscriber(subscriber)
+        self.assertTrue(self.communicator.broadcast_send('hello', sender='me', subject='greeting'))
+        result = yield received
+        self.assertEqual(result, ('hello', 'me', 'greeting', None))
+
+    @testing.gen_test
+    def test_control_process(self):
+        process = test_utils.WaitForSignalProcess(loop=self.loop, communicator=self.communicator)
+        self.assertIs(process._communicator, self.communicator)
+        # Run the process in the background
+        self.loop.add_callback(process.step_until_terminated)
+
+        status = yield self.process_controller.get_status(process.pid)
+        self.assertIsNotNone(status)
+
+        result = yield self.process_controller.pause_process(process.pid)
+        self.assertTrue(result)
+        self.assertTrue(process.paused)
+
+        result = yield self.process_controller.play_process(process.pid)
+        self.assertTrue(result)
+        self.assertFalse(process.paused)
+
+        result = yield self.process_controller.kill_process(process.pid)
+        self.assertTrue(result)
+        self.assertTrue(process.killed())
+
+    @testing.gen_test
+    def test_launch(self):
+        launcher = plumpy.ProcessLauncher(self.loop)
+        self.communicator.add_task_subscriber(launcher)
+
+        result = yield self.process_controller.launch_process(test_utils.DummyProcessWithOutput)
+        self.assertEqual(result, test_utils.DummyProcessWithOutput.EXPECTED_OUTPUTS)
@@ -73,6 +73,96 @@ class TestExposeProcess(utils.TestCaseWithLoop):
         self.assertEqual(self.BaseProcess.spec().inputs['a'].default, 'c')
         self.assertEqual(exposed_inputs['a'].default, 'a')
 
+    def test_expose_mutable_default(self):
+        """
+        Test that a mutable default of an exposed port is deepcopied when either port is changed
+        """
+
+        class DefaultProcess(NewLoopProcess):
+
+            @classmethod
+            def define(cls, spec):
+                super(DefaultProcess, cls).define(spec)
+                spec.input('options', valid_type=dict, default={'x': 1})
+
+        class ExposeDefaultProcess(NewLoopProcess):
+
+            @classmethod
+            def define(cls, spec):
+                super(ExposeDefaultProcess, cls).define(spec)
+                spec.expose_inputs(DefaultProcess)
+
+        exposed_inputs = ExposeDefaultProcess.spec().inputs
+        DefaultProcess.spec().inputs['options'].default['x'] = 2
+        self.assertEqual(DefaultProcess.spec().inputs['options'].default, {'x': 2})
+        self.assertEqual(exposed_inputs['options'].default, {'x': 1})
+
+    def test_expose_shares_ports(self):
+        """
+        Test that exposed ports are shared until they are accessed in order to be changed
+        """
+        base_inputs = self.BaseProcess.spec().inputs
+        exposed_inputs = self.ExposeProcess.spec().inputs.get_port('base.name.space')
+
+        self.assertIs(exposed_inputs.ports['a'], base_inputs.ports['a'])
+        self.assertTrue(base_inputs.ports['a'].frozen)
+        with self.assertRaises(RuntimeError):
+            base_inputs.ports['a'].default = 'c'
+
+        exposed_inputs['a'].required = True
+        self.assertIsNot(exposed_inputs.ports['a'], base_inputs.ports['a'])
+        self.assertFalse(base_inputs['a'].required)
+
+    def test_expose_nested_namespaces_lazily(self):
+        """
+        Test that the nested namespaces of exposed ports are only copied, level by level, when they are accessed
+        in order to be changed
+        """
+
+        class ChainProcess(NewLoopProcess):
+
+            @classmethod
+            def define(cls, spec):
+                super(ChainProcess, cls).define(spec)
+                spec.expose_inputs(self.ExposeProcess, namespace='chain')
+
+        class ChangeProcess(NewLoopProcess):
+
+            @classmethod
+            def define(cls, spec):
+                super(ChangeProcess, cls).define(spec)
+                spec.expose_inputs(ChainProcess)
+                spec.inputs['chain']['base'].help = 'changed'
+
+        expose_inputs = self.ExposeProcess.spec().inputs
+        chain_inputs = ChainProcess.spec().inputs
+        change_inputs = ChangeProcess.spec().inputs
+        ChangeProcess.spec().seal()
+
+        # Exposing a namespace shares it as a whole, however deeply it is nested
+        self.assertIs(chain_inputs.ports['chain'].ports['base'], expose_inputs.ports['base'])
+
+        # Changing a namespace copies it and those above it, the namespaces below are still shared
+        self.assertEqual(change_inputs.get_port('chain.base').help, 'changed')
+        self.assertIsNone(expose_inputs.ports['base'].help)
+        self.assertIsNot(change_inputs.ports['chain'], chain_inputs.ports['chain'])
+        changed_base = change_inputs.ports['chain'].ports['base']
+        self.assertIsNot(changed_base, expose_inputs.ports['base'])
+        self.assertIs(changed_base.ports['name'], expose_inputs.ports['base'].ports['name'])
+
+    def test_sealed_spec_frozen(self):
+        """
+        Test that the ports of a sealed spec can no longer be changed
+        """
+        spec = self.ExposeProcess.spec()
+        spec.seal()
+
+        with self.assertRaises(RuntimeError):
+            spec.inputs['c'].default = 5
+        with self.assertRaises(RuntimeError):
+            spec.inputs['base']['other'] = PortNamespace('other')
+        self.assertIs(spec.inputs.get_port('base.name.space.a'), spec.inputs.get_port('base.name.space.a'))
+
     def test_expose_attributes(self):
         """
         Test that the attributes of the exposed PortNamespace are maintained and properly deepcopied
@@ -0,0 +1,59 @@
+import unittest
+
+import plumpy
+
+
+class TestBarrier(unittest.TestCase):
+
+    def test_resolves_when_all_done(self):
+        awaitables = [plumpy.Future() for _ in range(3)]
+        done = []
+        barrier = plumpy.Barrier(enumerate(awaitables), lambda key, awaitable: done.append(key))
+
+        awaitables[2].set_result(None)
+        awaitables[0].set_result(None)
+        self.assertFalse(barrier.done())
+        self.assertEqual(barrier.remaining, 1)
+
+        awaitables[1].set_result(None)
+        self.assertTrue(barrier.done())
+        self.assertEqual(done, [2, 0, 1])
+
+    def test_already_done(self):
+        awaitable = plumpy.Future()
+        awaitable.set_result(5)
+        self.assertTrue(plumpy.Barrier([('a', awaitable)]).done())
+        self.assertTrue(plumpy.Barrier([]).done())
+
+    def test_exception(self):
+        awaitables = [plumpy.Future() for _ in range(2)]
+        barrier = plumpy.Barrier(enumerate(awaitables))
+
+        awaitables[0].set_exception(RuntimeError('failed'))
+        self.assertIsInstance(barrier.exception(), RuntimeError)
+        # Awaitables that are done after the barrier has resolved are ignored
+        awaitables[1].set_result(None)
+
+    def test_close(self):
+        awaitable = plumpy.Future()
+        done = []
+        barrier = plumpy.Barrier([('a', awaitable)], lambda key, awaitable: done.append(key))
+        barrier.close()
+
+        awaitable.set_result(None)
+        self.assertFalse(barrier.done())
+        self.assertEqual(done, [])
+
+    def test_more_awaitables(self):
+        """The callback can hand the barrier more awaitables to wait for"""
+        first, second, third = plumpy.Future(), plumpy.Future(), plumpy.Future()
+        third.set_result(None)
+        more = {'first': [('second', second), ('third', third)]}
+        barrier = plumpy.Barrier([('first', first)], lambda key, awaitable: more.get(key, None))
+
+        first.set_result(None)
+        self.assertFalse(barrier.done())
+        self.assertEqual(barrier.remaining, 1)
+
+        second.set_result(None)
+        self.assertTrue(barrier.done())
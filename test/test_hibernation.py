@@ -0,0 +1,156 @@
+import gc
+import time
+import weakref
+
+from tornado import gen, testing
+
+import plumpy
+from plumpy import communications, process_comms, test_utils
+from plumpy.workchains import ToContext, sleep_
+
+
+class AwaitFutureWorkChain(plumpy.WorkChain):
+    """A work chain that waits for a future that is handed to it from outside"""
+    awaited = None
+
+    @classmethod
+    def define(cls, spec):
+        super(AwaitFutureWorkChain, cls).define(spec)
+        spec.outline(cls.wait_for_it, cls.result)
+        spec.output('value')
+
+    def wait_for_it(self):
+        return ToContext(value=self.awaited)
+
+    def result(self):
+        self.out('value', self.ctx.value)
+
+
+class SleepWorkChain(plumpy.WorkChain):
+
+    @classmethod
+    def define(cls, spec):
+        super(SleepWorkChain, cls).define(spec)
+        spec.outline(sleep_(0.2), cls.result)
+        spec.output('slept_until')
+
+    def result(self):
+        self.out('slept_until', time.time())
+
+
+class TestHibernator(testing.AsyncTestCase):
+
+    def setUp(self):
+        super(TestHibernator, self).setUp()
+        self.communicator = communications.InProcessCommunicator(self.io_loop)
+        self.persister = plumpy.InMemoryPersister()
+        load_context = plumpy.LoadSaveContext(loop=self.io_loop, communicator=self.communicator)
+        self.hibernator = plumpy.Hibernator(self.persister, loop=self.io_loop, load_context=load_context)
+
+    def tearDown(self):
+        self.hibernator.stop()
+        super(TestHibernator, self).tearDown()
+
+    @gen.coroutine
+    def _wait_until_waiting(self, process):
+        while process.state != plumpy.ProcessState.WAITING or not process._stepping:
+            yield gen.moment
+
+    @gen.coroutine
+    def _hibernate(self, process):
+        yield self._wait_until_waiting(process)
+        yield self.hibernator.hibernate(process.pid)
+        while not self.hibernator.is_hibernating(process.pid):
+            yield gen.moment
+
+    @testing.gen_test
+    def test_hibernate_and_wake(self):
+        process = test_utils.WaitForSignalProcess(loop=self.io_loop, communicator=self.communicator)
+        pid = process.pid
+        outcome = self.hibernator.run(process)
+
+        yield self._hibernate(process)
+        self.assertEqual(self.hibernator.num_hibernating, 1)
+        self.assertEqual(self.hibernator.num_resident, 0)
+
+        # Nothing should be holding on to the evicted process
+        process_ref = weakref.ref(process)
+        del process
+        gc.collect()
+        self.assertIsNone(process_ref())
+
+        process = self.hibernator.wake(pid)
+        self.assertEqual(process.pid, pid)
+        self.assertFalse(self.hibernator.is_hibernating(pid))
+        yield self._wait_until_waiting(process)
+        process.resume()
+
+        yield outcome
+        self.assertEqual(process.state, plumpy.ProcessState.FINISHED)
+
+    @testing.gen_test
+    def test_wake_on_rpc(self):
+        process = test_utils.WaitForSignalProcess(loop=self.io_loop, communicator=self.communicator)
+        pid = process.pid
+        self.hibernator.run(process)
+        yield self._hibernate(process)
+
+        controller = process_comms.RemoteProcessController(self.communicator)
+        status = yield controller.get_status(pid)
+
+        self.assertFalse(self.hibernator.is_hibernating(pid))
+        self.assertEqual(status['state'], plumpy.ProcessState.WAITING)
+
+        result = yield controller.kill_process(pid)
+        self.assertTrue(result)
+
+    @testing.gen_test
+    def test_wake_on_awaited(self):
+        AwaitFutureWorkChain.awaited = plumpy.Future()
+        process = AwaitFutureWorkChain(loop=self.io_loop, communicator=self.communicator)
+        outcome = self.hibernator.run(process)
+        yield self._hibernate(process)
+
+        AwaitFutureWorkChain.awaited.set_result(5)
+        outputs = yield outcome
+
+        self.assertEqual(outputs, {'value': 5})
+        self.assertEqual(self.hibernator.num_resident, 0)
+
+    @testing.gen_test
+    def test_max_resident(self):
+        hibernator = plumpy.Hibernator(self.persister, loop=self.io_loop, max_resident=1)
+        procs = [test_utils.WaitForSignalProcess(loop=self.io_loop) for _ in range(3)]
+        for proc in procs:
+            hibernator.run(proc)
+        for proc in procs:
+            yield self._wait_until_waiting(proc)
+
+        self.assertEqual(hibernator.collect(), 2)
+        while hibernator.num_resident > 1:
+            yield gen.moment
+
+        # The process that has been waiting for the shortest time stays resident
+        self.assertFalse(hibernator.is_hibernating(procs[-1].pid))
+        self.assertTrue(hibernator.is_hibernating(procs[0].pid))
+
+    @testing.gen_test
+    def test_idle_timeout(self):
+        hibernator = plumpy.Hibernator(self.persister, loop=self.io_loop, idle_timeout=0.)
+        proc = test_utils.WaitForSignalProcess(loop=self.io_loop)
+        hibernator.run(proc)
+        yield self._wait_until_waiting(proc)
+
+        self.assertEqual(hibernator.collect(), 1)
+        # Processes that are already on their way out aren't counted again
+        self.assertEqual(hibernator.collect(), 0)
+
+    @testing.gen_test
+    def test_wake_on_deadline(self):
+        process = SleepWorkChain(loop=self.io_loop, communicator=self.communicator)
+        start = time.time()
+        outcome = self.hibernator.run(process)
+        yield self._hibernate(process)
+
+        outputs = yield outcome
+        self.assertGreaterEqual(outputs['slept_until'], start + 0.2)
@@ -23,6 +23,9 @@ class A(object):
         self.protected_fn()
         self.protected_property
 
+    def test_closure(self):
+        return (lambda: self.protected_fn())()
+
 
 class B(A):
     def testB(self):
@@ -49,6 +52,20 @@ class TestProtected(TestCase):
         B().testB()
         C().testC()
 
+    def test_closure(self):
+        A().test_closure()
+        C().test_closure()
+
+    def test_other_instance(self):
+        # Protected access is granted to the code of the class hierarchy, not just the same instance
+        other = A()
+        B.testB = lambda self: other.protected_fn()
+        try:
+            with self.assertRaises(RuntimeError):
+                B().testB()
+        finally:
+            del B.testB
+
     def test_incorrect_usage(self):
         # I shouldn't be able to call the protected function from any of them
         a = A()
@@ -123,6 +140,28 @@ class TestOverride(TestCase):
                 def test(self):
                     return None
 
+    def test_checked_at_class_creation(self):
+        class Derived(Superclass):
+            @override(check=True)
+            def test(self):
+                return True
+
+        # Nothing is left to check when the method is called
+        self.assertFalse(hasattr(Derived.__dict__['test'], '__wrapped__'))
+
+    def test_mixin(self):
+        class Mixin(object):
+            @override(check=True)
+            def test(self):
+                return True
+
+        class Combined(Mixin, Superclass):
+            pass
+
+        self.assertTrue(Combined().test())
+        with self.assertRaises(RuntimeError):
+            Mixin().test()
+
 #
 #
 # class A(object):
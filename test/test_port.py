@@ -1,7 +1,9 @@
 from __future__ import absolute_import
 from .utils import TestCase
 
-from plumpy.ports import InputPort, PortNamespace
+from plumpy.ports import InputPort, OutputPort, PortNamespace, UNSPECIFIED, compile_input_parser, compile_output_checks, \
+    compile_validator
+from plumpy.utils import wrap_dict
 
 
 class TestInputPort(TestCase):
@@ -117,3 +119,129 @@ class TestPortNamespace(TestCase):
 
         self.assertFalse(self.port_namespace.dynamic)
         self.assertIsNone(self.port_namespace.valid_type)
+
+
+class TestCompiledValidator(TestCase):
+
+    def setUp(self):
+        self.namespace = PortNamespace('inputs')
+        self.namespace['a'] = InputPort('a', valid_type=int)
+        self.namespace['b'] = InputPort('b', required=False, validator=lambda value: value != 'bad')
+        self.namespace['c'] = InputPort('c', default=1)
+        sub = self.namespace.create_port_namespace('sub', valid_type=str)
+        sub['d'] = InputPort('d', valid_type=float)
+        self.namespace.create_port_namespace('optional', required=False)['e'] = OutputPort('e')
+
+    def test_same_results(self):
+        """The compiled validator should give the same results and messages as the port namespace"""
+        compiled = compile_validator(self.namespace)
+        cases = [
+            None,
+            {},
+            {'a': 1, 'sub': {'d': 1.}},
+            {'a': 'x', 'sub': {'d': 1.}},
+            {'a': 1, 'b': 'bad', 'sub': {'d': 1.}},
+            {'a': 1, 'sub': {'d': 1., 'dynamic': 'x'}},
+            {'a': 1, 'sub': {'d': 1., 'dynamic': 5}},
+            {'a': 1, 'sub': {'d': 1.}, 'unexpected': 5},
+            {'a': 1, 'sub': {'d': 1.}, 'optional': {}},
+            {'a': 1, 'sub': {'d': 1.}, 'optional': {'f': 1}},
+        ]
+        for port_values in cases:
+            self.assertEqual(compiled(port_values), self.namespace.validate(port_values), port_values)
+
+    def test_namespace_validator(self):
+        seen = []
+
+        def validator(namespace, port_values):
+            seen.append(port_values)
+            return ('a' in port_values), 'no a'
+
+        self.namespace.validator = validator
+        port_values = {'sub': {'d': 1.}}
+        self.assertEqual(compile_validator(self.namespace)(port_values), (False, 'no a'))
+        self.assertEqual(seen, [port_values])
+
+    def test_overridden_validate(self):
+
+        class CustomPort(InputPort):
+
+            def validate(self, value):
+                return False, 'custom'
+
+        self.namespace['custom'] = CustomPort('custom')
+        self.assertEqual(compile_validator(self.namespace)({'a': 1, 'sub': {'d': 1.}}), (False, 'custom'))
+
+
+class TestCompiledInputParser(TestCase):
+
+    def setUp(self):
+        self.namespace = PortNamespace('inputs')
+        self.namespace['a'] = InputPort('a')
+        self.namespace['b'] = InputPort('b', default=2)
+        self.namespace['c'] = InputPort('c', required=False)
+        sub = self.namespace.create_port_namespace('sub', default={'e': 4})
+        sub['d'] = InputPort('d', default=3)
+        sub['e'] = InputPort('e')
+        self.parse = compile_input_parser(self.namespace)
+
+    def test_defaults(self):
+        parsed = self.parse({'a': 1, 'extra': 5})
+        self.assertEqual(parsed, {'a': 1, 'b': 2, 'extra': 5, 'sub': {'d': 3, 'e': 4}})
+        self.assertEqual(parsed.sub.d, 3)
+
+        parsed = self.parse({'a': 1, 'b': 0, 'sub': {'e': 0}})
+        self.assertEqual(parsed, {'a': 1, 'b': 0, 'sub': {'d': 3, 'e': 0}})
+
+    def test_required(self):
+        with self.assertRaises(ValueError):
+            self.parse({})
+        with self.assertRaises(ValueError):
+            self.parse({'a': 1, 'sub': {}})
+
+
+class TestCompiledOutputChecks(TestCase):
+
+    def setUp(self):
+        self.namespace = PortNamespace('outputs')
+        self.namespace['a'] = OutputPort('a')
+        self.namespace['b'] = OutputPort('b', required=False)
+        optional = self.namespace.create_port_namespace('optional', required=False, dynamic=True)
+        optional['c'] = OutputPort('c')
+        optional['d'] = OutputPort('d', required=False)
+        optional['d'].validator = lambda value: value is not UNSPECIFIED
+        self.namespace.create_port_namespace('required')['e'] = OutputPort('e')
+        self.checks = compile_output_checks(self.namespace)
+
+    def test_same_results(self):
+        for outputs in ({}, {
+                'a': 1
+        }, {
+                'a': 1,
+                'required.e': 2
+        }, {
+                'a': 1,
+                'required.e': 2,
+                'optional.x': 3
+        }, {
+                'a': 1,
+                'required.e': 2,
+                'optional.c': 3
+        }, {
+                'a': 1,
+                'required.e': 2,
+                'optional.c': 3,
+                'optional.d': 4
+        }, {
+                'a': 1,
+                'required': {
+                    'e': 2
+                }
+        }):
+            wrapped = wrap_dict(outputs)
+            expected = all(port.validate(wrapped.get(name, UNSPECIFIED))[0] for name, port in self.namespace.items())
+            self.assertEqual(self.checks.check(self.checks.emitted(outputs))[0], expected, outputs)
+
+    def test_namespace_validator(self):
+        self.namespace['required'].validator = lambda namespace, values: (True, None)
+        self.assertIsNone(compile_output_checks(self.namespace))
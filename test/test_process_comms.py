@@ -1,5 +1,9 @@
+import gc
+import threading
+import time
+
 from kiwipy import rmq
-from tornado import testing
+from tornado import gen, testing
 
 import plumpy
 from plumpy import communications, test_utils, process_comms
@@ -10,6 +14,29 @@ class Process(plumpy.Process):
         pass
 
 
+class ThreadRecordingProcess(plumpy.Process):
+
+    @classmethod
+    def define(cls, spec):
+        super(ThreadRecordingProcess, cls).define(spec)
+        spec.output('thread')
+
+    def run(self):
+        self.out('thread', threading.current_thread().name)
+
+
+class GatedProcess(plumpy.Process):
+    """A process that waits until it is resumed, keeping track of the instances that are running"""
+    running = []
+
+    def run(self):
+        self.running.append(self)
+        return plumpy.Wait(self.finish)
+
+    def finish(self):
+        self.running.remove(self)
+
+
 class CustomObjectLoader(plumpy.DefaultObjectLoader):
     def load_object(self, identifier):
         if identifier == "jimmy":
@@ -55,3 +82,203 @@ class TestProcessLauncher(testing.AsyncTestCase):
 
         continue_task = plumpy.create_continue_body(proc.pid)
         yield launcher._continue(None, **continue_task[process_comms.TASK_ARGS])
+
+
+class TestProcessLauncherAdmission(testing.AsyncTestCase):
+
+    def setUp(self):
+        super(TestProcessLauncherAdmission, self).setUp()
+        self.loop = self.io_loop
+        del GatedProcess.running[:]
+
+    @gen.coroutine
+    def _wait_for_running(self, *pids):
+        while {process.pid for process in GatedProcess.running} != set(pids):
+            yield gen.sleep(0.01)
+
+    @testing.gen_test
+    def test_queue(self):
+        launcher = plumpy.ProcessLauncher(self.loop, max_running=1)
+        body = plumpy.create_launch_body(GatedProcess)
+
+        pids = []
+        for _ in range(2):
+            pids.append((yield launcher(None, body)))
+        self.assertEqual(len(set(pids)), 2)
+        yield self._wait_for_running(pids[0])
+        self.assertEqual(launcher.num_running, 1)
+        self.assertEqual(launcher.queue_depth, 1)
+
+        GatedProcess.running[0].resume()
+        yield self._wait_for_running(pids[1])
+        self.assertEqual(launcher.queue_depth, 0)
+
+        GatedProcess.running[0].resume()
+        yield self._wait_for_running()
+        stats = launcher.get_stats()
+        self.assertEqual(stats['admitted'], 2)
+        self.assertEqual(stats['queued'], 1)
+        self.assertGreater(stats['max_wait'], 0.)
+
+    @testing.gen_test
+    def test_reject(self):
+        launcher = plumpy.ProcessLauncher(self.loop, max_running=1, policy=plumpy.AdmissionPolicy.REJECT)
+        body = plumpy.create_launch_body(GatedProcess)
+
+        pid = yield launcher(None, body)
+        with self.assertRaises(plumpy.TaskRejected):
+            yield launcher(None, body)
+        self.assertEqual(launcher.get_stats()['rejected'], 1)
+
+        yield self._wait_for_running(pid)
+        GatedProcess.running[0].resume()
+        yield self._wait_for_running()
+        pid = yield launcher(None, body)
+        yield self._wait_for_running(pid)
+        GatedProcess.running[0].resume()
+
+    @testing.gen_test
+    def test_defer(self):
+        launcher = plumpy.ProcessLauncher(self.loop, max_running=1, policy=plumpy.AdmissionPolicy.DEFER)
+        body = plumpy.create_launch_body(GatedProcess)
+
+        pid = yield launcher(None, body)
+        deferred = launcher(None, body)
+        yield self._wait_for_running(pid)
+        self.assertFalse(deferred.done())
+
+        GatedProcess.running[0].resume()
+        pid = yield deferred
+        yield self._wait_for_running(pid)
+        GatedProcess.running[0].resume()
+
+    @testing.gen_test
+    def test_max_continues(self):
+        persister = plumpy.InMemoryPersister()
+        load_context = plumpy.LoadSaveContext(loop=self.loop)
+        launcher = plumpy.ProcessLauncher(
+            self.loop, persister=persister, load_context=load_context, max_continues=1, max_queued=1)
+
+        pids = []
+        for _ in range(3):
+            process = GatedProcess(loop=self.loop)
+            persister.save_checkpoint(process)
+            pids.append(process.pid)
+        del process
+
+        yield launcher(None, plumpy.create_continue_body(pids[0], nowait=True))
+        yield launcher(None, plumpy.create_continue_body(pids[1], nowait=True))
+        # Launches are not held up by the continue limit
+        launched = yield launcher(None, plumpy.create_launch_body(GatedProcess))
+        # but the queue is full
+        with self.assertRaises(plumpy.TaskRejected):
+            yield launcher(None, plumpy.create_continue_body(pids[2], nowait=True))
+
+        yield self._wait_for_running(pids[0], launched)
+        self.assertEqual(launcher.queue_depth, 1)
+        for process in list(GatedProcess.running):
+            process.resume()
+        yield self._wait_for_running(pids[1])
+        GatedProcess.running[0].resume()
+        yield self._wait_for_running()
+        self.assertEqual(launcher.num_running, 0)
+
+    @testing.gen_test
+    def test_queued_launch_not_held(self):
+        persister = plumpy.InMemoryPersister()
+        load_context = plumpy.LoadSaveContext(loop=self.loop)
+        launcher = plumpy.ProcessLauncher(self.loop, persister=persister, load_context=load_context, max_running=1)
+        body = plumpy.create_launch_body(GatedProcess, persist=True)
+
+        first = yield launcher(None, body)
+        queued = yield launcher(None, body)
+        yield self._wait_for_running(first)
+
+        # The queued process was checkpointed and let go of
+        gc.collect()
+        self.assertFalse([obj for obj in gc.get_objects() if isinstance(obj, GatedProcess) and obj.pid == queued])
+
+        GatedProcess.running[0].resume()
+        yield self._wait_for_running(queued)
+        GatedProcess.running[0].resume()
+        yield self._wait_for_running()
+
+    @testing.gen_test
+    def test_burst_memory_reads(self):
+        reads = []
+
+        def memory_usage():
+            reads.append(None)
+            return 0
+
+        original, process_comms._memory_usage = process_comms._memory_usage, memory_usage
+        try:
+            launcher = plumpy.ProcessLauncher(self.loop, max_running=1, max_memory=1)
+            body = plumpy.create_launch_body(GatedProcess)
+            burst = 50
+            for _ in range(burst):
+                yield launcher(None, body)
+            self.assertEqual(launcher.queue_depth, burst - 1)
+            # Waiting tasks are not looked at once the running limit is reached
+            self.assertLessEqual(len(reads), 2 * burst)
+
+            while GatedProcess.running or launcher.queue_depth:
+                if GatedProcess.running:
+                    GatedProcess.running[0].resume()
+                yield gen.sleep(0.001)
+            self.assertLessEqual(len(reads), 4 * burst)
+        finally:
+            process_comms._memory_usage = original
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            plumpy.ProcessLauncher(self.loop, policy='panic')
+
+
+class TestShardedProcessLauncher(testing.AsyncTestCase):
+
+    def setUp(self):
+        super(TestShardedProcessLauncher, self).setUp()
+        self.persister = plumpy.InMemoryPersister()
+        self.launcher = plumpy.ShardedProcessLauncher(2, persister=self.persister)
+
+    def tearDown(self):
+        self.launcher.close()
+        super(TestShardedProcessLauncher, self).tearDown()
+
+    @testing.gen_test
+    def test_launch(self):
+        result = yield self.launcher(None, plumpy.create_launch_body(test_utils.DummyProcessWithOutput, nowait=False))
+        self.assertEqual(test_utils.DummyProcessWithOutput.EXPECTED_OUTPUTS, result)
+
+    @testing.gen_test
+    def test_launch_many(self):
+        body = plumpy.create_launch_body(ThreadRecordingProcess, nowait=False)
+        results = yield [self.launcher(None, body) for _ in range(10)]
+        threads = {result['thread'] for result in results}
+        self.assertTrue(all(thread.startswith('plumpy-shard-') for thread in threads))
+
+    @testing.gen_test
+    def test_continue(self):
+        process = test_utils.DummyProcessWithOutput()
+        self.persister.save_checkpoint(process)
+        pid = process.pid
+        del process
+
+        result = yield self.launcher(None, plumpy.create_continue_body(pid))
+        self.assertEqual(test_utils.DummyProcessWithOutput.EXPECTED_OUTPUTS, result)
+
+    @testing.gen_test
+    def test_unknown_task(self):
+        with self.assertRaises(plumpy.TaskRejected):
+            self.launcher(None, {process_comms.TASK_KEY: 'unknown'})
+
+    @testing.gen_test
+    def test_work_stealing(self):
+        """Tasks queued on a busy shard should be picked up by the idle one"""
+        busy, idle = self.launcher.shards
+        busy.loop.add_callback(time.sleep, 0.5)
+
+        body = plumpy.create_launch_body(ThreadRecordingProcess, nowait=False)
+        results = yield [self.launcher._submit(busy, None, body) for _ in range(4)]
+        self.assertIn('plumpy-shard-{}'.format(idle.index), [result['thread'] for result in results])
@@ -1,3 +1,4 @@
+import plumpy
 from plumpy.ports import PortNamespace, InputPort
 from plumpy import ProcessSpec
 from .utils import TestCase
@@ -71,6 +72,24 @@ class TestProcessSpec(TestCase):
         self.assertTrue(isinstance(self.spec.inputs.get_port('some.name.space'), PortNamespace))
         self.assertTrue(isinstance(self.spec.inputs.get_port('some.name.space.a'), InputPort))
 
+    def test_validate_inputs_batch(self):
+        self.spec.input('a', valid_type=int)
+        self.spec.input('b', valid_type=(str, float), required=False, validator=lambda value: value != 'bad')
+        self.spec.inputs.dynamic = True
+        self.spec.seal()
+
+        batch = [{'a': 1}, {'a': 'x'}, {'a': 1, 'b': 'bad'}, {'a': 1, 'b': StrSubtype('s')}, {'b': 2.}] * 3
+        expected = [self.spec.validate_inputs(inputs) for inputs in batch]
+        self.assertEqual(list(self.spec.validate_inputs_batch(iter(batch))), expected)
+
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+        except ImportError:
+            return
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = self.spec.validate_inputs_batch(batch, executor=executor, max_pending=4)
+            self.assertEqual(list(results), expected)
+
     def test_validate(self):
         """
         Test the global spec validator functionality.
@@ -95,4 +114,50 @@ class TestProcessSpec(TestCase):
         self.assertTrue(valid, msg)
 
         valid, msg = self.spec.validate_inputs(inputs={'b': 'b'})
-        self.assertTrue(valid, msg)
\ No newline at end of file
+        self.assertTrue(valid, msg)
+    def test_seal(self):
+        """
+        Test that sealing the spec freezes its ports, after which they can no longer be changed
+        """
+        self.spec.input('a', default=1)
+        self.spec.input('some.name.space.b', valid_type=int)
+        self.spec.seal()
+        self.assertTrue(self.spec.sealed)
+        self.assertTrue(self.spec.inputs['a'].frozen)
+        self.assertTrue(self.spec.inputs.get_port('some.name.space').frozen)
+
+        with self.assertRaises(RuntimeError):
+            self.spec.inputs['a'].default = 2
+        with self.assertRaises(RuntimeError):
+            self.spec.inputs.get_port('some.name.space.b').valid_type = str
+        with self.assertRaises(RuntimeError):
+            self.spec.inputs['some']['c'] = InputPort('c')
+        with self.assertRaises(RuntimeError):
+            self.spec.input('d')
+        self.assertEqual(self.spec.inputs['a'].default, 1)
+
+        # Sealing again changes nothing
+        self.spec.seal()
+        self.assertIs(self.spec.inputs['a'], self.spec.inputs['a'])
+
+    def test_spec_built_once(self):
+        """
+        Test that the spec of a process class is built on first use only, and not for every instance
+        """
+        defined = []
+
+        class Proc(plumpy.Process):
+
+            @classmethod
+            def define(cls, spec):
+                super(Proc, cls).define(spec)
+                defined.append(cls)
+                spec.input('a', default=1)
+
+        self.assertEqual(defined, [])
+        spec = Proc.spec()
+        for _ in range(3):
+            Proc()
+        self.assertEqual(defined, [Proc])
+        self.assertIs(Proc.spec(), spec)
+        self.assertTrue(spec.sealed)
@@ -1,4 +1,6 @@
 from __future__ import absolute_import
+import time
+
 import kiwipy
 import plumpy
 from plumpy import Process, ProcessState, test_utils, BundleKeys
@@ -40,6 +42,16 @@ class ForgetToCallParent(plumpy.Process):
             super(ForgetToCallParent, self).on_kill(msg)
 
 
+class WaitWithDeadlineProcess(plumpy.Process):
+    """Waits for a signal that never comes, until a deadline"""
+
+    def run(self):
+        return plumpy.Wait(self.last_step, deadline=time.time() + 0.05)
+
+    def last_step(self):
+        pass
+
+
 class TestProcess(testing.AsyncTestCase):
 
     def setUp(self):
@@ -155,6 +167,19 @@ class TestProcess(testing.AsyncTestCase):
             proc.kill()
             proc.execute()
 
+    def test_lightweight_states(self):
+        """States and commands are slotted so that parked processes stay small"""
+        proc = test_utils.WaitForSignalProcess()
+        proc.loop().run_sync(proc.step)
+        proc.loop().run_sync(proc.step)
+        self.assertEqual(proc.state, ProcessState.WAITING)
+        self.assertFalse(hasattr(proc._state, '__dict__'))
+        self.assertFalse(hasattr(plumpy.Wait(), '__dict__'))
+
+        # Without listeners no container is created
+        self.assertIsNone(proc._Process__event_helper)
+        self.assertIsNone(proc._event_callbacks)
+
     def test_pid(self):
         # Test auto generation of pid
         process = test_utils.DummyProcessWithOutput()
@@ -238,6 +263,25 @@ class TestProcess(testing.AsyncTestCase):
         self.assertTrue(proc.done())
         self.assertEqual(proc.state, ProcessState.FINISHED)
 
+    @testing.gen_test
+    def test_wait_deadline(self):
+        proc = WaitWithDeadlineProcess()
+        yield proc.step_until_terminated()
+        self.assertEqual(proc.state, ProcessState.FINISHED)
+
+    def test_wait_deadline_persistence(self):
+        proc = WaitWithDeadlineProcess()
+        while proc.state != ProcessState.WAITING:
+            self.io_loop.run_sync(proc.step)
+
+        bundle = plumpy.Bundle(proc)
+        self.assertIn('deadline', bundle['_state'])
+        loaded = bundle.unbundle(plumpy.LoadSaveContext(loop=self.io_loop))
+        # Loading alone doesn't set a timer, only carrying on does
+        self.assertIsNone(loaded._state._timer)  # pylint: disable=protected-access
+        self.io_loop.run_sync(loaded.step_until_terminated)
+        self.assertEqual(loaded.state, ProcessState.FINISHED)
+
     def test_exc_info(self):
         proc = test_utils.ExceptionProcess()
         try:
@@ -404,6 +448,100 @@ class TestProcess(testing.AsyncTestCase):
         with self.assertRaises(TypeError):
             proc.execute()
 
+    def test_out_many(self):
+
+        class ManyOutputs(plumpy.Process):
+
+            @classmethod
+            def define(cls, spec):
+                super(ManyOutputs, cls).define(spec)
+                spec.output('a', valid_type=int)
+                spec.output_namespace('sub', dynamic=True, valid_type=str)
+
+            def run(self):
+                self.out_many({'a': 1, 'sub.b': 'b', 'sub.c': 'c'})
+
+        class BatchListener(plumpy.ProcessListener):
+
+            def __init__(self):
+                self.batches = []
+
+            def on_outputs_emitted(self, process, outputs):
+                self.batches.append(sorted(outputs))
+
+        proc = ManyOutputs()
+        listener = BatchListener()
+        proc.add_process_listener(listener)
+        proc.execute()
+
+        self.assertDictEqual(proc.outputs, {'a': 1, 'sub.b': 'b', 'sub.c': 'c'})
+        self.assertListEqual(listener.batches, [[('a', 1, False), ('sub.b', 'b', True), ('sub.c', 'c', True)]])
+
+    def test_out_many_invalid(self):
+
+        class InvalidOutputs(plumpy.Process):
+
+            @classmethod
+            def define(cls, spec):
+                super(InvalidOutputs, cls).define(spec)
+                spec.output('a', valid_type=int)
+                spec.output('b', valid_type=int)
+
+            def run(self):
+                self.out_many({'a': 1, 'b': 'two'})
+
+            def on_output_emitting(self, output_port, value):
+                super(InvalidOutputs, self).on_output_emitting(output_port, value)
+                emitting.append(output_port)
+
+        emitting = []
+        proc = InvalidOutputs()
+        with self.assertRaises(TypeError):
+            proc.execute()
+        # Nothing of the batch was recorded, or announced
+        self.assertDictEqual(proc.outputs, {})
+        self.assertListEqual(emitting, [])
+
+    def test_out_many_overridden_emitted(self):
+        """Subclasses that act on each output see the batch one by one, listeners are notified once"""
+
+        class EachOutput(plumpy.Process):
+
+            @classmethod
+            def define(cls, spec):
+                super(EachOutput, cls).define(spec)
+                spec.output('a', valid_type=int)
+                spec.output('b', valid_type=int)
+
+            def run(self):
+                self.out_many({'a': 1, 'b': 2})
+
+            def on_output_emitted(self, output_port, value, dynamic):
+                super(EachOutput, self).on_output_emitted(output_port, value, dynamic)
+                emitted.append(output_port)
+
+        class Listener(plumpy.ProcessListener):
+
+            def __init__(self):
+                self.batches = []
+                self.single = []
+
+            def on_output_emitted(self, process, output_port, value, dynamic):
+                self.single.append(output_port)
+
+            def on_outputs_emitted(self, process, outputs):
+                self.batches.append(sorted(outputs))
+
+        emitted = []
+        proc = EachOutput()
+        listener = Listener()
+        proc.add_process_listener(listener)
+        proc.execute()
+
+        self.assertListEqual(sorted(emitted), ['a', 'b'])
+        self.assertListEqual(listener.batches, [[('a', 1, False), ('b', 2, False)]])
+        self.assertListEqual(listener.single, [])
+
     def test_missing_output(self):
         proc = test_utils.MissingOutputProcess()
 
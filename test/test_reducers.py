@@ -0,0 +1,23 @@
+import functools
+import unittest
+
+import plumpy
+
+
+def _reduce(reducer, results, initial=None):
+    return functools.reduce(reducer, results, initial)
+
+
+class TestReducers(unittest.TestCase):
+
+    def test_sum(self):
+        self.assertEqual(_reduce(plumpy.Sum(), [1, 2, 3], 0), 6)
+        self.assertEqual(_reduce(plumpy.Sum('x'), [{'x': 1}, {'x': 2}], 0), 3)
+
+    def test_histogram(self):
+        self.assertEqual(_reduce(plumpy.Histogram(2.), [0.5, 1.5, 2.5, 7.]), {0: 2, 1: 1, 3: 1})
+
+    def test_top_k(self):
+        self.assertEqual(_reduce(plumpy.TopK(3), [5, 1, 9, 3, 7, 2]), [5, 7, 9])
+        with self.assertRaises(ValueError):
+            plumpy.TopK(0)
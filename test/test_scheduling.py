@@ -0,0 +1,111 @@
+from tornado import gen, testing
+
+import plumpy
+from plumpy import test_utils
+
+
+class ClassA(object):
+    pass
+
+
+class ClassB(object):
+    pass
+
+
+class Countdown(plumpy.Process):
+    """A process that takes a number of steps, recording each one"""
+    steps = []
+
+    def run(self):
+        return plumpy.Continue(self.count, 3)
+
+    def count(self, remaining):
+        self.steps.append(self.pid)
+        if remaining > 1:
+            return plumpy.Continue(self.count, remaining - 1)
+
+
+class TestScheduler(testing.AsyncTestCase):
+
+    def setUp(self):
+        super(TestScheduler, self).setUp()
+        self.scheduler = plumpy.Scheduler(self.io_loop, batch_size=4)
+
+    def tearDown(self):
+        self.scheduler.uninstall()
+        super(TestScheduler, self).tearDown()
+
+    @gen.coroutine
+    def _drain(self):
+        while self.scheduler.pending:
+            yield gen.moment
+
+    @testing.gen_test
+    def test_priority(self):
+        order = []
+        low, high = ClassA(), ClassB()
+        self.scheduler.set_priority(high, 1)
+
+        for _ in range(3):
+            self.scheduler.call_soon(low, order.append, 'low')
+        for _ in range(3):
+            self.scheduler.call_soon(high, order.append, 'high')
+
+        yield self._drain()
+        self.assertListEqual(order, ['high'] * 3 + ['low'] * 3)
+
+    @testing.gen_test
+    def test_class_priority(self):
+        self.scheduler.set_priority(ClassA, 2)
+        self.assertEqual(self.scheduler.get_priority(ClassA()), 2)
+        self.assertEqual(self.scheduler.get_priority(ClassB()), plumpy.Scheduler.DEFAULT_PRIORITY)
+
+    @testing.gen_test
+    def test_weighted_fair_share(self):
+        order = []
+        self.scheduler.set_weight(ClassA, 3)
+
+        for _ in range(40):
+            self.scheduler.call_soon(ClassA(), order.append, 'a')
+        for _ in range(40):
+            self.scheduler.call_soon(ClassB(), order.append, 'b')
+
+        yield self._drain()
+        self.assertEqual(order[:40].count('a'), 30)
+
+    @testing.gen_test
+    def test_control_lane(self):
+        order = []
+        for i in range(20):
+            self.scheduler.call_soon(ClassA(), order.append, i)
+        result = yield self.scheduler.run_control(lambda: 'control')
+
+        self.assertEqual(result, 'control')
+        self.assertLess(len(order), 20)
+
+    @testing.gen_test
+    def test_processes(self):
+        self.scheduler.install()
+        self.assertIs(plumpy.get_scheduler(self.io_loop), self.scheduler)
+        del Countdown.steps[:]
+
+        processes = [Countdown(loop=self.io_loop) for _ in range(3)]
+        self.scheduler.set_priority(processes[2], 1)
+        yield [process.step_until_terminated() for process in processes]
+
+        self.assertTrue(all(process.successful() for process in processes))
+        # Whenever the processes are all runnable, the high priority one goes first
+        self.assertListEqual(Countdown.steps[::3], [processes[2].pid] * 3)
+
+    @testing.gen_test
+    def test_control_message(self):
+        self.scheduler.install()
+        communicator = plumpy.InProcessCommunicator(self.io_loop)
+        controller = plumpy.RemoteProcessController(communicator)
+
+        process = test_utils.WaitForSignalProcess(loop=self.io_loop, communicator=communicator)
+        self.io_loop.add_callback(process.step_until_terminated)
+        result = yield controller.kill_process(process.pid)
+
+        self.assertTrue(result)
+        self.assertTrue(process.killed())
@@ -0,0 +1,46 @@
+import time
+
+from tornado import gen, testing
+
+import plumpy
+
+
+class TestTimerWheel(testing.AsyncTestCase):
+
+    @testing.gen_test
+    def test_fires_in_order(self):
+        # A small wheel so that timers cascade and go round the last wheel
+        wheel = plumpy.TimerWheel(self.io_loop, resolution=0.01, slots=4, levels=2)
+        fired = []
+
+        def record(delay, deadline):
+            self.assertGreaterEqual(time.time(), deadline)
+            fired.append(delay)
+
+        start = time.time()
+        delays = [0.25, 0.005, 0.1, 0.03, 0.17]
+        for delay in delays:
+            wheel.call_at(start + delay, record, delay, start + delay)
+        cancelled = wheel.call_later(0.05, fired.append, 'cancelled')
+        cancelled.cancel()
+
+        while len(fired) < len(delays):
+            yield gen.sleep(0.01)
+
+        self.assertEqual(fired, sorted(delays))
+        yield gen.sleep(0.05)
+        self.assertEqual(len(wheel), 0)
+
+    @testing.gen_test
+    def test_future_at(self):
+        wheel = plumpy.get_timer_wheel(self.io_loop)
+        self.assertIs(plumpy.get_timer_wheel(self.io_loop), wheel)
+
+        deadline = time.time() + 0.05
+        yield wheel.future_at(deadline)
+        self.assertGreaterEqual(time.time(), deadline)
+
+    @testing.gen_test
+    def test_past_deadline(self):
+        wheel = plumpy.TimerWheel(self.io_loop, resolution=0.01)
+        yield wheel.future_at(time.time() - 10.)
@@ -0,0 +1,55 @@
+import copy
+import pickle
+
+from .utils import TestCase
+from plumpy.utils import TrackedAttributesDict, TrackedDict, TrackedList
+
+
+class TestTrackedAttributesDict(TestCase):
+
+    def test_set_and_delete(self):
+        d = TrackedAttributesDict(a=1, b=2)
+        self.assertEqual(d.get_changes(), ({}, set()))
+
+        d.a = 3
+        d['c'] = 4
+        del d.b
+        self.assertEqual(d.get_changes(), ({'a': 3, 'c': 4}, {'b'}))
+
+        d.mark_saved()
+        self.assertEqual(d.get_changes(), ({}, set()))
+        self.assertEqual(d, TrackedAttributesDict(a=3, c=4))
+
+    def test_setdefault(self):
+        d = TrackedAttributesDict(a=1)
+        self.assertEqual(d.setdefault('a', 2), 1)
+        self.assertEqual(d.setdefault('b', 2), 2)
+        self.assertEqual(d.get_changes(), ({'b': 2}, set()))
+
+    def test_mutation(self):
+        d = TrackedAttributesDict(plain=[], tracked=TrackedList())
+        d.plain.append(1)
+        d.tracked.append(1)
+        self.assertEqual(d.get_changes(), ({'tracked': [1]}, set()))
+
+        d.touch('plain')
+        self.assertIn('plain', d.get_changes()[0])
+
+        d.mark_saved()
+        d.mapping = TrackedDict()
+        d.mark_saved()
+        d.mapping['a'] = 1
+        self.assertEqual(d.get_changes(), ({'mapping': {'a': 1}}, set()))
+
+    def test_untracked(self):
+        d = TrackedAttributesDict(number=1, text='a', pair=(1, 'b'), tracked=TrackedList(), plain=[], nested=([],))
+        self.assertEqual(d.get_untracked(), {'plain', 'nested'})
+
+    def test_copy_tracked(self):
+        d = TrackedAttributesDict(tracked=TrackedList([1, 2]))
+        for copied in (copy.deepcopy(d.tracked), pickle.loads(pickle.dumps(d.tracked))):
+            self.assertIsInstance(copied, TrackedList)
+            self.assertEqual(copied, [1, 2])
+            # The copy doesn't belong to the original
+            copied.append(3)
+        self.assertEqual(d.get_changes(), ({}, set()))
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 import inspect
+import time
 import six
 from tornado import gen
 
@@ -111,6 +112,160 @@ class DummyWc(WorkChain):
         pass
 
 
+class FanOutChild(plumpy.Process):
+    pass
+
+
+class FanOut(WorkChain):
+    """Waits for a child process and any number of futures"""
+    awaitables = ()
+
+    @classmethod
+    def define(cls, spec):
+        super(FanOut, cls).define(spec)
+        spec.outline(cls.fan_out, cls.check)
+
+    def fan_out(self):
+        self.to_context(child=self.launch(FanOutChild))
+        return ToContext(**{'r{}'.format(i): awaitable for i, awaitable in enumerate(self.awaitables)})
+
+    def check(self):
+        assert self.ctx.child == {}
+        assert [self.ctx['r{}'.format(i)] for i in range(len(self.awaitables))] == list(range(len(self.awaitables)))
+
+
+class ParallelWf(WorkChain):
+    """Records the order in which the steps of its parallel branches are carried out"""
+
+    @classmethod
+    def define(cls, spec):
+        super(ParallelWf, cls).define(spec)
+        spec.outline(
+            cls.start,
+            parallel_(
+                (cls.a1, cls.a2, cls.a3),
+                cls.b1,
+                while_(cls.c_more)(cls.c),
+            ),
+            cls.end,
+        )
+
+    def _record(self, step):
+        self.ctx.steps = self.ctx.steps + [step]
+
+    def start(self):
+        self.ctx.steps = ['start']
+        self.ctx.c_count = 0
+
+    def a1(self):
+        self._record('a1')
+        return ToContext(a=self.launch(FanOutChild))
+
+    def a2(self):
+        self._record('a2')
+
+    def a3(self):
+        self._record('a3')
+
+    def b1(self):
+        self._record('b1')
+        return ToContext(b=self.launch(FanOutChild))
+
+    def c_more(self):
+        return self.ctx.c_count < 2
+
+    def c(self):
+        self.ctx.c_count += 1
+        self._record('c')
+
+    def end(self):
+        self._record('end')
+
+
+class Double(plumpy.Process):
+
+    @classmethod
+    def define(cls, spec):
+        super(Double, cls).define(spec)
+        spec.input('value')
+        spec.output('value')
+
+    def run(self):
+        self.out('value', 2 * self.inputs.value)
+
+
+class MapWf(WorkChain):
+    """Doubles each of its values using a child process, at most three at a time"""
+
+    @classmethod
+    def define(cls, spec):
+        super(MapWf, cls).define(spec)
+        spec.input('n', default=10)
+        spec.outline(map_(cls.get_values, cls.double, to='doubled', max_concurrency=3), cls.result)
+        spec.output('doubled')
+
+    def get_values(self):
+        return list(range(self.inputs.n))
+
+    def double(self, value):
+        return self.launch(Double, inputs={'value': value})
+
+    def result(self):
+        self.out('doubled', [outputs['value'] for outputs in self.ctx.doubled])
+
+
+class ReduceWf(WorkChain):
+    """Sums the doubled values of its children, as well as keeping the two largest using a map"""
+
+    @classmethod
+    def define(cls, spec):
+        super(ReduceWf, cls).define(spec)
+        spec.outline(
+            cls.launch_children,
+            map_(cls.get_values, cls.double, to='top', max_concurrency=2, reducer=plumpy.TopK(2, 'value')),
+        )
+
+    def get_values(self):
+        return [3, 1, 4, 1, 5]
+
+    def double(self, value):
+        return self.launch(Double, inputs={'value': value})
+
+    def launch_children(self):
+        children = [self.double(value) for value in self.get_values()]
+        return ToContext(total=reduce_(children, plumpy.Sum('value'), 0))
+
+
+class SleepWf(WorkChain):
+    """Sleeps in one of two parallel branches and then until a point in time"""
+
+    @classmethod
+    def define(cls, spec):
+        super(SleepWf, cls).define(spec)
+        spec.outline(
+            cls.start,
+            parallel_((sleep_(0.05), cls.slept), cls.other),
+            wait_until_(cls.until),
+            cls.end,
+        )
+
+    def start(self):
+        self.ctx.start = time.time()
+        self.ctx.steps = []
+
+    def slept(self):
+        self.ctx.steps = self.ctx.steps + ['slept']
+
+    def other(self):
+        self.ctx.steps = self.ctx.steps + ['other']
+
+    def until(self):
+        return self.ctx.start + 0.1
+
+    def end(self):
+        self.ctx.end = time.time()
+
+
 class TestContext(unittest.TestCase):
 
     def test_attributes(self):
@@ -478,12 +633,182 @@ class TestWorkchain(utils.TestCaseWithLoop):
             workchain.execute()
         self.assertNotEqual(workchain.exception(), my_exception)
 
+    def test_to_context_fan_out(self):
+        """Wait for many awaitables at once, only their keys and pids should be saved while waiting"""
+        num_awaitables = 1000
+        awaitables = FanOut.awaitables = [plumpy.Future() for _ in range(num_awaitables)]
+
+        workchain = FanOut()
+
+        @gen.coroutine
+        def run_async():
+            while workchain.state != plumpy.ProcessState.WAITING:
+                yield workchain.step()
+            stepping = workchain.step()
+            # Wait for the child to finish
+            while workchain.ctx.get('child', None) is None:
+                yield gen.moment
+
+            saved_awaiting = plumpy.Bundle(workchain)['_state']['_awaiting']
+            self.assertEqual(len(saved_awaiting), num_awaitables)
+            self.assertIn(('r0', None), saved_awaiting.values())
+
+            for i, awaitable in enumerate(awaitables):
+                awaitable.set_result(i)
+            yield stepping
+            yield workchain.step_until_terminated()
+
+        self.loop.run_sync(run_async)
+        self.assertTrue(workchain.successful)
+
+    def test_to_context_reload(self):
+        """A work chain that is reloaded while waiting waits for its children again by their pid"""
+        FanOut.awaitables = ()
+        workchain = FanOut()
+        while workchain.state != plumpy.ProcessState.WAITING:
+            self.loop.run_sync(workchain.step)
+
+        reloaded = plumpy.Bundle(workchain).unbundle(plumpy.LoadSaveContext(loop=self.loop))
+        # Loading it doesn't wait for anything yet, stepping it does
+        self.assertIsNone(reloaded._state._barrier)
+        self.loop.run_sync(reloaded.step_until_terminated, timeout=5.)
+        self.assertTrue(reloaded.successful)
+
     def _run_with_checkpoints(self, wf_class, inputs=None):
         # TODO: Actually save at each point!
         proc = wf_class(inputs=inputs)
         proc.execute()
         return wf_class.finished_steps
 
+    def test_program_stepper_state(self):
+        """The position within the outline is saved as a program counter, old nested stepper states can still be loaded"""
+        program = Wf.spec().get_program()
+        workchain = Wf(inputs={'value': 'B'})
+
+        stepper = program.create_stepper(workchain)
+        stepper.step()
+        saved_state = stepper.save()
+        self.assertIn('_pc', saved_state)
+        self.assertNotIn('stepper_state', saved_state)
+        self.assertEqual(str(program.recreate_stepper(saved_state, workchain)), '1:if_(isA)')
+
+        nested_states = [
+            ({'_pos': 0, 'stepper_state': {'_fn': 's1'}}, '0:s1'),
+            ({'_pos': 1, 'stepper_state': {'_pos': 1, 'stepper_state': {'_pos': 0, 'stepper_state': {'_fn': 's3'}}}},
+             '1:elif_(isB)(0:s3)'),
+            ({'_pos': 3, 'stepper_state': {}}, '3:while_(ltN)'),
+            ({'_pos': 3, 'stepper_state': {'stepper_state': {'_pos': 0, 'stepper_state': {'_fn': 's6'}}}},
+             '3:while_(ltN)(0:s6)'),
+        ]
+        for nested_state, description in nested_states:
+            self.assertEqual(str(program.recreate_stepper(nested_state, workchain)), description)
+
+        stepper = program.recreate_stepper(nested_states[1][0], workchain)
+        self.assertEqual(stepper.step(), (False, None))
+        self.assertEqual(str(stepper), '2:s5')
+
+    def test_parallel(self):
+        workchain = ParallelWf()
+        workchain.execute()
+
+        self.assertTrue(workchain.successful)
+        self.assertListEqual(workchain.ctx.steps, ['start', 'a1', 'b1', 'c', 'a2', 'c', 'a3', 'end'])
+        self.assertEqual(workchain.ctx.a, {})
+        self.assertEqual(workchain.ctx.b, {})
+
+    def test_parallel_persistence(self):
+        """Save and reload the work chain between steps, the branches should carry on where they were"""
+        workchain = ParallelWf()
+        stepper_strings = []
+        while not workchain.has_terminated():
+            self.loop.run_sync(workchain.step)
+            # Awaited children can't be reloaded, so only save between steps that are running
+            if workchain.state == plumpy.ProcessState.RUNNING:
+                stepper_strings.append(str(workchain._stepper))
+                workchain = plumpy.Bundle(workchain).unbundle(plumpy.LoadSaveContext(loop=self.loop))
+
+        self.assertTrue(workchain.successful)
+        self.assertListEqual(workchain.ctx.steps, ['start', 'a1', 'b1', 'c', 'a2', 'c', 'a3', 'end'])
+        self.assertIn('1:parallel_(1:a2, finished, while_(c_more))', stepper_strings)
+
+    def test_map(self):
+        workchain = MapWf()
+
+        @gen.coroutine
+        def run_async():
+            while workchain.state != plumpy.ProcessState.WAITING:
+                yield workchain.step()
+            # Only the first three children are launched, the rest as these finish
+            self.assertEqual(len(workchain._state._awaiting), 3)
+            self.assertEqual(plumpy.Bundle(workchain)['stepper_state']['maps'], {0: 3})
+
+            # The children that are done are let go of
+            stepping = workchain.step_until_terminated()
+            while not stepping.done():
+                if workchain.state == plumpy.ProcessState.WAITING:
+                    self.assertLessEqual(len(workchain._state._awaitables), 3)
+                yield gen.moment
+            yield stepping
+
+        self.loop.run_sync(run_async)
+        self.assertEqual(workchain.outputs['doubled'], [2 * value for value in range(10)])
+
+    def test_map_persistence(self):
+        """A map that is checkpointed and reloaded while waiting carries on where it was"""
+        persister = plumpy.InMemoryPersister()
+        workchain = MapWf()
+        while workchain.state != plumpy.ProcessState.WAITING:
+            self.loop.run_sync(workchain.step)
+        persister.save_checkpoint(workchain)
+        # Make sure it is the reloaded work chain that carries on with the map
+        workchain.kill()
+
+        reloaded = persister.load_checkpoint(workchain.pid).unbundle(plumpy.LoadSaveContext(loop=self.loop))
+        self.loop.run_sync(reloaded.step_until_terminated, timeout=5.)
+        self.assertEqual(reloaded.outputs['doubled'], [2 * value for value in range(10)])
+
+    def test_map_no_items(self):
+        workchain = MapWf(inputs={'n': 0})
+        workchain.execute()
+        self.assertEqual(workchain.outputs['doubled'], [])
+
+    def test_reduce(self):
+        workchain = ReduceWf()
+
+        @gen.coroutine
+        def run_async():
+            while workchain.state != plumpy.ProcessState.WAITING:
+                yield workchain.step()
+            # Only the accumulator is kept in the context
+            self.assertEqual(workchain.ctx.total, 0)
+            yield workchain.step_until_terminated()
+
+        self.loop.run_sync(run_async)
+        self.assertEqual(workchain.ctx.total, 28)
+        self.assertEqual(workchain.ctx.top, [8, 10])
+
+    def test_sleep(self):
+        workchain = SleepWf()
+        workchain.execute()
+        self.assertTrue(workchain.successful)
+        self.assertListEqual(workchain.ctx.steps, ['other', 'slept'])
+        self.assertGreaterEqual(workchain.ctx.end, workchain.ctx.start + 0.1)
+
+    def test_sleep_persistence(self):
+        workchain = SleepWf()
+        while workchain.state != plumpy.ProcessState.WAITING:
+            self.loop.run_sync(workchain.step)
+
+        bundle = plumpy.Bundle(workchain)
+        deadline = bundle['_state']['deadline']
+        self.assertEqual(bundle['stepper_state']['sleeps'], {2: deadline})
+
+        workchain = bundle.unbundle(plumpy.LoadSaveContext(loop=self.loop))
+        self.loop.run_sync(workchain.step_until_terminated)
+        self.assertTrue(workchain.successful)
+        self.assertGreaterEqual(time.time(), deadline)
+        self.assertGreaterEqual(workchain.ctx.end, workchain.ctx.start + 0.1)
+
     def test_stepper_info(self):
         """Check status information provided by steppers"""
 
@@ -0,0 +1,186 @@
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import unittest
+
+import kiwipy
+
+import plumpy
+from plumpy import test_utils, worker_pool
+
+TIMEOUT = 10.
+
+
+class ExitingProcess(plumpy.Process):
+    """Takes the worker that runs it down with it"""
+
+    def run(self):
+        os._exit(1)  # pylint: disable=protected-access
+
+
+class TestWorkerPoolMessaging(unittest.TestCase):
+    """Messaging between communicators of a pool without any workers"""
+
+    def setUp(self):
+        super(TestWorkerPoolMessaging, self).setUp()
+        self.pool = plumpy.WorkerPool(0)
+        self.sender = self.pool.communicator
+        self.receiver = self.pool.create_communicator()
+
+    def tearDown(self):
+        self.pool.close()
+        super(TestWorkerPoolMessaging, self).tearDown()
+
+    def test_rpc(self):
+        self.receiver.add_rpc_subscriber(lambda _comm, msg: msg * 2, 'doubler')
+        result = plumpy.futures.unwrap_kiwi_future(self.sender.rpc_send('doubler', 4)).result(TIMEOUT)
+        self.assertEqual(result, 8)
+
+    def test_rpc_unroutable(self):
+        response = plumpy.futures.unwrap_kiwi_future(self.sender.rpc_send('nobody', None))
+        with self.assertRaises(kiwipy.UnroutableError):
+            response.result(TIMEOUT)
+
+    def test_task(self):
+        self.receiver.add_task_subscriber(lambda _comm, task: task + 1)
+
+        result = plumpy.futures.unwrap_kiwi_future(self.sender.task_send(1)).result(TIMEOUT)
+        self.assertEqual(result, 2)
+
+    def test_task_rejected(self):
+
+        def reject(_comm, _task):
+            raise kiwipy.TaskRejected()
+
+        self.receiver.add_task_subscriber(reject)
+
+        response = plumpy.futures.unwrap_kiwi_future(self.sender.task_send(1))
+        with self.assertRaises(kiwipy.TaskRejected):
+            response.result(TIMEOUT)
+
+    def test_task_exception(self):
+
+        def fail(_comm, _task):
+            raise RuntimeError('Great scott!')
+
+        self.receiver.add_task_subscriber(fail)
+
+        response = plumpy.futures.unwrap_kiwi_future(self.sender.task_send(1))
+        with self.assertRaises(kiwipy.RemoteException):
+            response.result(TIMEOUT)
+
+    def test_broadcast(self):
+        received = kiwipy.Future()
+        self.receiver.add_broadcast_subscriber(lambda _comm, **msg: received.set_result(msg))
+
+        self.sender.broadcast_send('hello', sender='me', subject='greeting')
+        message = received.result(TIMEOUT)
+        self.assertEqual(message['body'], 'hello')
+        self.assertEqual(message['subject'], 'greeting')
+
+
+class TestHub(unittest.TestCase):
+
+    def _send_task(self, hub):
+        hub.queue.put(worker_pool._dumps({  # pylint: disable=protected-access
+            worker_pool.TYPE_KEY: worker_pool.TASK,
+            worker_pool.SENDER_KEY: 'sender',
+            worker_pool.ID_KEY: 0,
+            worker_pool.BODY_KEY: 'task'
+        }))
+
+    def test_held_tasks_rejected_when_workers_exit(self):
+        """Tasks held for workers that exit before they subscribe are rejected"""
+        hub = worker_pool._Hub()  # pylint: disable=protected-access
+        hub.add_participant('worker', worker=True)
+        sender_inbox = hub.add_participant('sender')
+        hub.start()
+        try:
+            self._send_task(hub)
+            hub.worker_exited('worker')
+            message = worker_pool._loads(sender_inbox.get(timeout=TIMEOUT))  # pylint: disable=protected-access
+            self.assertEqual(message[worker_pool.OUTCOME_KEY][0], worker_pool.REJECTED)
+        finally:
+            hub.stop()
+
+    def test_in_flight_tasks_fail_when_worker_exits(self):
+        hub = worker_pool._Hub()  # pylint: disable=protected-access
+        worker_inbox = hub.add_participant('worker', worker=True)
+        sender_inbox = hub.add_participant('sender')
+        hub.start()
+        try:
+            hub.queue.put(worker_pool._dumps({  # pylint: disable=protected-access
+                worker_pool.TYPE_KEY: worker_pool.SUBSCRIBE_TASKS,
+                worker_pool.SENDER_KEY: 'worker'
+            }))
+            self._send_task(hub)
+            worker_inbox.get(timeout=TIMEOUT)
+            hub.worker_exited('worker')
+            message = worker_pool._loads(sender_inbox.get(timeout=TIMEOUT))  # pylint: disable=protected-access
+            self.assertEqual(message[worker_pool.OUTCOME_KEY][0], worker_pool.EXCEPTION)
+        finally:
+            hub.stop()
+
+    def test_tasks_held_for_starting_workers(self):
+        """Tasks sent before the workers have subscribed are held rather than rejected"""
+        hub = worker_pool._Hub()  # pylint: disable=protected-access
+        worker_inbox = hub.add_participant('worker', worker=True)
+        hub.add_participant('sender')
+        hub.start()
+        try:
+            hub.queue.put(worker_pool._dumps({  # pylint: disable=protected-access
+                worker_pool.TYPE_KEY: worker_pool.TASK,
+                worker_pool.SENDER_KEY: 'sender',
+                worker_pool.ID_KEY: 0,
+                worker_pool.BODY_KEY: 'task'
+            }))
+            hub.queue.put(worker_pool._dumps({  # pylint: disable=protected-access
+                worker_pool.TYPE_KEY: worker_pool.SUBSCRIBE_TASKS,
+                worker_pool.SENDER_KEY: 'worker'
+            }))
+            message = worker_pool._loads(worker_inbox.get(timeout=TIMEOUT))  # pylint: disable=protected-access
+            self.assertEqual(message[worker_pool.TYPE_KEY], worker_pool.TASK)
+            self.assertEqual(message[worker_pool.BODY_KEY], 'task')
+        finally:
+            hub.stop()
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        super(TestWorkerPool, self).setUp()
+        self._tmppath = tempfile.mkdtemp()
+        self.persister = plumpy.PicklePersister(self._tmppath)
+        self.pool = plumpy.WorkerPool(2, persister=self.persister)
+        self.controller = plumpy.RemoteProcessThreadController(self.pool.communicator)
+
+    def tearDown(self):
+        self.pool.close(timeout=TIMEOUT)
+        shutil.rmtree(self._tmppath)
+        super(TestWorkerPool, self).tearDown()
+
+    def test_launch(self):
+        result = self.controller.launch_process(test_utils.DummyProcessWithOutput).result(TIMEOUT)
+        self.assertEqual(result, test_utils.DummyProcessWithOutput.EXPECTED_OUTPUTS)
+
+    def test_launch_many(self):
+        launched = [self.controller.launch_process(test_utils.DummyProcessWithOutput) for _ in range(6)]
+        for future in launched:
+            self.assertEqual(future.result(TIMEOUT), test_utils.DummyProcessWithOutput.EXPECTED_OUTPUTS)
+
+    def test_worker_exits(self):
+        """A task fails rather than hanging if the worker carrying it out exits"""
+        with self.assertRaises(kiwipy.RemoteException):
+            self.controller.launch_process(ExitingProcess).result(TIMEOUT)
+
+        # The other worker is still there
+        result = self.controller.launch_process(test_utils.DummyProcessWithOutput).result(TIMEOUT)
+        self.assertEqual(result, test_utils.DummyProcessWithOutput.EXPECTED_OUTPUTS)
+
+    def test_continue(self):
+        process = test_utils.DummyProcessWithOutput()
+        self.persister.save_checkpoint(process)
+
+        result = self.controller.continue_process(process.pid).result(TIMEOUT)
+        self.assertEqual(result, test_utils.DummyProcessWithOutput.EXPECTED_OUTPUTS)